@@ -0,0 +1,106 @@
+"""
+Porównanie dwóch raportów benchmarków (run.py lub micro.py).
+
+Metryki z przyrostkiem _per_s są "im więcej, tym lepiej"; czasy, percentyle,
+pamięć, bajty i liczba wywołań API na zdarzenie - "im mniej, tym lepiej".
+Pozostałe liczby są wypisywane informacyjnie. Kod wyjścia 1 oznacza regresję
+większą niż --tolerance.
+
+Przykład:
+    python compare.py results/baseline.json results/current.json --tolerance 0.1
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Any, Optional
+
+HIGHER_IS_BETTER = ("_per_s",)
+LOWER_IS_BETTER_SUFFIXES = ("_ms", "_us", "_mb", "_bytes")
+LOWER_IS_BETTER_KEYS = ("p50", "p90", "p99", "max", "mean")
+
+
+def flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    """Spłaszcza zagnieżdżony raport do {"a.b.c": liczba}"""
+    flat: Dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix] = float(data)
+    return flat
+
+
+def direction(key: str) -> Optional[int]:
+    """+1 gdy wyższa wartość jest lepsza, -1 gdy niższa, None gdy metryka jest informacyjna"""
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf.endswith(HIGHER_IS_BETTER):
+        return 1
+    if leaf.endswith(LOWER_IS_BETTER_SUFFIXES) or leaf in LOWER_IS_BETTER_KEYS or leaf.startswith("calls_per_"):
+        return -1
+    return None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """
+    Porównuje sekcje "results" dwóch raportów
+
+    Returns:
+        {"regressions": [...], "improvements": [...], "unchanged": int}
+    """
+    before = flatten(baseline.get("results", {}))
+    after = flatten(current.get("results", {}))
+    regressions, improvements = [], []
+    unchanged = 0
+
+    for key in sorted(set(before) & set(after)):
+        sign = direction(key)
+        if sign is None:
+            continue
+        old, new = before[key], after[key]
+        if old == 0:
+            unchanged += old == new
+            continue
+        change = (new - old) / abs(old)
+        entry = {"metric": key, "baseline": old, "current": new, "change": round(change, 4)}
+        if change * sign < -tolerance:
+            regressions.append(entry)
+        elif change * sign > tolerance:
+            improvements.append(entry)
+        else:
+            unchanged += 1
+    return {"regressions": regressions, "improvements": improvements, "unchanged": unchanged}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Porównanie raportów benchmarków")
+    parser.add_argument("baseline", help="Raport bazowy (JSON)")
+    parser.add_argument("current", help="Raport bieżący (JSON)")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Dopuszczalna względna zmiana na niekorzyść (domyślnie 0.1 = 10%%)")
+    parser.add_argument("--json", action="store_true", help="Wynik jako JSON")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline.get("benchmark") != current.get("benchmark"):
+        parser.error(f"Raporty różnych benchmarków: {baseline.get('benchmark')} vs {current.get('benchmark')}")
+
+    report = compare(baseline, current, args.tolerance)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for title, entries in (("REGRESJE", report["regressions"]), ("POPRAWY", report["improvements"])):
+            if not entries:
+                continue
+            print(f"{title}:")
+            for entry in entries:
+                print(f"  {entry['metric']}: {entry['baseline']:g} -> {entry['current']:g} ({entry['change']:+.1%})")
+        print(f"Bez istotnych zmian: {report['unchanged']} metryk (tolerancja {args.tolerance:.0%})")
+
+    sys.exit(1 if report["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+"""
+Lokalny, fałszywy API server Kubernetes do benchmarków webhooka.
+
+Obsługuje tylko wywołania używane przez RemediationEngine i informery (pody,
+ReplicaSety, deploymenty, subresource /scale). Obiekty są wirtualne - każdy pod
+i deployment "istnieje", a pamiętany jest jedynie stan zmieniany przez akcje
+(repliki, resourceVersion, adnotacje). Opóźnienie i odsetek błędów są
+konfigurowalne, a każde wywołanie jest liczone per trasa.
+
+Konwencja nazw: pod "<deployment>-<hash>-<sufiks>" należy do ReplicaSetu
+"<deployment>-<hash>", a ten do deploymentu "<deployment>". Każdy deployment
+ma dwie rewizje (ReplicaSety "-5d8f7" bieżący i "-4b7c6" poprzedni); rollback
+JSON patchem szablonu przełącza bieżący ReplicaSet i nadaje mu nową rewizję.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Hashe szablonów ReplicaSetów: bieżąca i poprzednia rewizja każdego deploymentu
+CURRENT_HASH = "5d8f7"
+PREVIOUS_HASH = "4b7c6"
+
+# Maksymalny czas trzymania pustego strumienia watch (informery łączą się ponownie)
+WATCH_HOLD_SECONDS = 1.0
+
+ROUTES: List[Tuple[str, str, "re.Pattern"]] = [
+    (method, name, re.compile(pattern))
+    for method, name, pattern in (
+        ("GET", "version", r"^/version/?$"),
+        ("GET", "list_pods", r"^/api/v1/pods$"),
+        ("GET", "read_pod", r"^/api/v1/namespaces/(?P<ns>[^/]+)/pods/(?P<name>[^/]+)$"),
+        ("DELETE", "delete_pod", r"^/api/v1/namespaces/(?P<ns>[^/]+)/pods/(?P<name>[^/]+)$"),
+        ("POST", "evict_pod", r"^/api/v1/namespaces/(?P<ns>[^/]+)/pods/(?P<name>[^/]+)/eviction$"),
+        ("GET", "list_replicasets", r"^/apis/apps/v1/replicasets$"),
+        ("GET", "list_namespaced_replicasets", r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/replicasets$"),
+        ("GET", "list_deployments", r"^/apis/apps/v1/deployments$"),
+        ("GET", "list_namespaced_deployments", r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/deployments$"),
+        ("GET", "read_deployment", r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/deployments/(?P<name>[^/]+)$"),
+        ("PATCH", "patch_deployment", r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/deployments/(?P<name>[^/]+)$"),
+        ("GET", "read_scale", r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/deployments/(?P<name>[^/]+)/scale$"),
+        ("PATCH", "patch_scale", r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/deployments/(?P<name>[^/]+)/scale$"),
+    )
+]
+
+
+def deployment_of_pod(pod_name: str) -> Tuple[str, str]:
+    """Zwraca (deployment, replicaset) dla nazwy poda zgodnej z konwencją"""
+    parts = pod_name.rsplit("-", 2)
+    if len(parts) < 3:
+        return pod_name, f"{pod_name}-0"
+    return parts[0], f"{parts[0]}-{parts[1]}"
+
+
+def container_id(namespace: str, pod_name: str) -> str:
+    """Deterministyczne ID kontenera poda (64 znaki hex, jak w containerd)"""
+    return hashlib.sha256(f"{namespace}/{pod_name}".encode()).hexdigest()
+
+
+class FakeCluster:
+    """Stan fałszywego klastra i liczniki wywołań"""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_codes: Tuple[int, ...] = (500,),
+        seed: int = 0,
+        inventory: Optional[Dict[str, List[str]]] = None,
+        retry_after: Optional[float] = None
+    ):
+        """
+        Args:
+            latency_ms: Stałe opóźnienie każdej odpowiedzi
+            jitter_ms: Losowy dodatek do opóźnienia (0..jitter_ms)
+            error_rate: Odsetek żądań kończonych błędem (0..1)
+            error_codes: Kody błędów losowane przy wstrzykiwaniu
+            seed: Ziarno generatora (powtarzalność)
+            inventory: {namespace: [deploymenty]} zwracane przez listowania (informery)
+            retry_after: Wartość nagłówka Retry-After (sekundy) w odpowiedziach 429/503
+        """
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.inventory = inventory or {}
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._resource_version = 1000
+        self.deployments: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.calls: Counter = Counter()
+        # Wywołania per namespace - weryfikacja, że akcje trafiają do właściwego klastra
+        self.namespaces: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.conflicts = 0
+        self.rollbacks = 0
+        self.bytes_received = 0
+        # Nowe połączenia TCP - przy działającym keep-alive rosną wolniej niż liczba wywołań
+        self.connections = 0
+
+    def _next_version(self) -> str:
+        self._resource_version += 1
+        return str(self._resource_version)
+
+    def deployment_state(self, namespace: str, name: str) -> Dict[str, Any]:
+        """Stan deploymentu (tworzony przy pierwszym odwołaniu)"""
+        key = (namespace, name)
+        state = self.deployments.get(key)
+        if state is None:
+            state = self.deployments[key] = {
+                "replicas": 3,
+                "resourceVersion": self._next_version(),
+                "current": CURRENT_HASH,
+                # Historia rewizji: hash szablonu -> rewizja, obraz i adnotacje szablonu ReplicaSetu
+                "history": {
+                    PREVIOUS_HASH: {"revision": 1, "image": f"{name}:previous", "annotations": {}},
+                    CURRENT_HASH: {"revision": 2, "image": f"{name}:latest", "annotations": {}}
+                }
+            }
+        return state
+
+    def _template(self, app: str, entry: Dict[str, Any], template_hash: Optional[str] = None) -> Dict[str, Any]:
+        labels = {"app": app}
+        if template_hash is not None:
+            labels["pod-template-hash"] = template_hash
+        return {
+            "metadata": {"labels": labels, "annotations": dict(entry["annotations"])},
+            "spec": {"containers": [{"name": "app", "image": entry["image"]}]}
+        }
+
+    def _rollback(self, state: Dict[str, Any], operations: List[Dict[str, Any]]) -> Optional[int]:
+        """JSON patch szablonu deploymentu (rollback); zwraca 409 przy nieaktualnym resourceVersion"""
+        for op in operations:
+            if op.get("path") == "/metadata/resourceVersion" and op.get("value") != state["resourceVersion"]:
+                self.conflicts += 1
+                return 409
+        for op in operations:
+            if op.get("path") != "/spec/template":
+                continue
+            image = op["value"]["spec"]["containers"][0]["image"]
+            history = state["history"]
+            target = next((h for h, entry in history.items() if entry["image"] == image), None)
+            if target is None:
+                target = hashlib.sha256(image.encode()).hexdigest()[:5]
+                history[target] = {"image": image}
+            # Przywrócony ReplicaSet dostaje kolejny numer rewizji (jak w kontrolerze deploymentów)
+            history[target]["revision"] = max(entry.get("revision", 0) for entry in history.values()) + 1
+            history[target]["annotations"] = dict((op["value"].get("metadata") or {}).get("annotations") or {})
+            state["current"] = target
+            self.rollbacks += 1
+        state["resourceVersion"] = self._next_version()
+        return None
+
+    def delay(self) -> Optional[int]:
+        """Odczekuje skonfigurowane opóźnienie i zwraca kod wstrzykniętego błędu (lub None)"""
+        with self._lock:
+            pause = self.latency + (self._random.random() * self.jitter if self.jitter else 0.0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+            code = self._random.choice(self.error_codes) if failed else None
+        if pause:
+            time.sleep(pause)
+        return code
+
+    # Reprezentacje obiektów
+
+    @staticmethod
+    def _meta(namespace: str, name: str, version: str, **extra) -> Dict[str, Any]:
+        meta = {"name": name, "namespace": namespace, "uid": f"uid-{namespace}-{name}", "resourceVersion": version}
+        meta.update(extra)
+        return meta
+
+    def pod(self, namespace: str, name: str) -> Dict[str, Any]:
+        deployment, replicaset = deployment_of_pod(name)
+        return {
+            "apiVersion": "v1",
+            "kind": "Pod",
+            "metadata": self._meta(
+                namespace, name, "1",
+                labels={"app": deployment},
+                ownerReferences=[{
+                    "apiVersion": "apps/v1", "kind": "ReplicaSet", "name": replicaset,
+                    "uid": f"uid-{namespace}-{replicaset}", "controller": True
+                }]
+            ),
+            "spec": {"containers": [{"name": "app", "image": f"{deployment}:latest"}]},
+            "status": {
+                "phase": "Running",
+                "containerStatuses": [{
+                    "name": "app",
+                    "image": f"{deployment}:latest",
+                    "imageID": f"sha256:{deployment}",
+                    "containerID": f"containerd://{container_id(namespace, name)}",
+                    "ready": True,
+                    "restartCount": 0,
+                    "state": {"running": {}}
+                }]
+            }
+        }
+
+    def replicaset(self, namespace: str, name: str) -> Dict[str, Any]:
+        deployment, _ = deployment_of_pod(f"{name}-x")
+        state = self.deployment_state(namespace, deployment)
+        template_hash = name.rsplit("-", 1)[-1]
+        entry = state["history"].get(template_hash) or state["history"][state["current"]]
+        revision = str(entry["revision"])
+        return {
+            "apiVersion": "apps/v1",
+            "kind": "ReplicaSet",
+            "metadata": self._meta(
+                namespace, name, "1",
+                labels={"app": deployment},
+                annotations={"deployment.kubernetes.io/revision": revision},
+                ownerReferences=[{
+                    "apiVersion": "apps/v1", "kind": "Deployment", "name": deployment,
+                    "uid": f"uid-{namespace}-{deployment}", "controller": True
+                }]
+            ),
+            "spec": {
+                "replicas": 3,
+                "selector": {"matchLabels": {"app": deployment}},
+                "template": self._template(deployment, entry, template_hash)
+            }
+        }
+
+    def deployment(self, namespace: str, name: str) -> Dict[str, Any]:
+        state = self.deployment_state(namespace, name)
+        current = state["history"][state["current"]]
+        return {
+            "apiVersion": "apps/v1",
+            "kind": "Deployment",
+            "metadata": self._meta(
+                namespace, name, state["resourceVersion"],
+                labels={"app": name},
+                annotations={"deployment.kubernetes.io/revision": str(current["revision"])}
+            ),
+            "spec": {
+                "replicas": state["replicas"],
+                "selector": {"matchLabels": {"app": name}},
+                "template": self._template(name, current)
+            },
+            "status": {"replicas": state["replicas"]}
+        }
+
+    def scale(self, namespace: str, name: str) -> Dict[str, Any]:
+        state = self.deployment_state(namespace, name)
+        return {
+            "apiVersion": "autoscaling/v1",
+            "kind": "Scale",
+            "metadata": self._meta(namespace, name, state["resourceVersion"]),
+            "spec": {"replicas": state["replicas"]},
+            "status": {"replicas": state["replicas"]}
+        }
+
+    def _list(self, kind: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "apiVersion": "v1",
+            "kind": kind,
+            "metadata": {"resourceVersion": str(self._resource_version)},
+            "items": items
+        }
+
+    # Obsługa tras
+
+    def handle(self, method: str, route: str, params: Dict[str, str], query: Dict[str, str], body: Any):
+        """Zwraca (kod, odpowiedź) dla trasy"""
+        ns, name = params.get("ns"), params.get("name")
+        inventory = [(n, d) for n, deployments in self.inventory.items() for d in deployments]
+        with self._lock:
+            if ns is not None:
+                self.namespaces[ns] += 1
+            if route == "version":
+                return 200, {
+                    "major": "1", "minor": "29", "gitVersion": "v1.29.0-fake", "gitCommit": "fake",
+                    "gitTreeState": "clean", "buildDate": "2024-01-01T00:00:00Z", "goVersion": "go1.21",
+                    "compiler": "gc", "platform": "linux/amd64"
+                }
+            if route == "list_pods":
+                return 200, self._list("PodList", [self.pod(n, f"{d}-{CURRENT_HASH}-a{i}") for n, d in inventory for i in range(3)])
+            if route in ("list_replicasets", "list_namespaced_replicasets"):
+                selector = query.get("labelSelector", "")
+                app = selector.partition("=")[2] if selector.startswith("app=") else None
+                selected = [(n, d) for n, d in inventory if (ns is None or n == ns) and app in (None, d)]
+                return 200, self._list("ReplicaSetList", [
+                    self.replicaset(n, f"{d}-{h}") for n, d in selected for h in self.deployment_state(n, d)["history"]
+                ])
+            if route == "list_deployments":
+                return 200, self._list("DeploymentList", [self.deployment(n, d) for n, d in inventory])
+            if route == "list_namespaced_deployments":
+                selector = query.get("labelSelector", "")
+                app = selector.partition("=")[2] if selector.startswith("app=") else None
+                names = [app] if app else [d for n, d in inventory if n == ns]
+                return 200, self._list("DeploymentList", [self.deployment(ns, d) for d in names])
+            if route in ("read_pod", "delete_pod"):
+                return 200, self.pod(ns, name)
+            if route == "evict_pod":
+                return 201, {"kind": "Status", "status": "Success", "code": 201}
+            if route == "read_deployment":
+                return 200, self.deployment(ns, name)
+            if route == "patch_deployment":
+                state = self.deployment_state(ns, name)
+                if isinstance(body, list):
+                    code = self._rollback(state, body)
+                    if code is not None:
+                        return code, {"kind": "Status", "status": "Failure", "reason": "Conflict", "code": code}
+                    return 200, self.deployment(ns, name)
+                spec = (body or {}).get("spec", {}) if isinstance(body, dict) else {}
+                template = spec.get("template") or {}
+                state["history"][state["current"]]["annotations"].update((template.get("metadata") or {}).get("annotations") or {})
+                # Pełny obiekt (stara ścieżka read-modify-write) niesie też repliki
+                state["replicas"] = spec.get("replicas") or state["replicas"]
+                state["resourceVersion"] = self._next_version()
+                return 200, self.deployment(ns, name)
+            if route == "read_scale":
+                return 200, self.scale(ns, name)
+            if route == "patch_scale":
+                state = self.deployment_state(ns, name)
+                expected = (body.get("metadata") or {}).get("resourceVersion")
+                if expected and expected != state["resourceVersion"]:
+                    self.conflicts += 1
+                    return 409, {"kind": "Status", "status": "Failure", "reason": "Conflict", "code": 409}
+                state["replicas"] = body.get("spec", {}).get("replicas", state["replicas"])
+                state["resourceVersion"] = self._next_version()
+                return 200, self.scale(ns, name)
+        return 404, {"kind": "Status", "status": "Failure", "reason": "NotFound", "code": 404}
+
+    def stats(self) -> Dict[str, Any]:
+        """Liczniki wywołań"""
+        return {
+            "calls": dict(self.calls),
+            "total_calls": sum(self.calls.values()),
+            "namespaces": dict(self.namespaces),
+            "errors": dict(self.errors),
+            "conflicts": self.conflicts,
+            "rollbacks": self.rollbacks,
+            "bytes_received": self.bytes_received,
+            "connections": self.connections
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Nagłówki i treść idą osobnymi zapisami - bez TCP_NODELAY każda odpowiedź
+    # na połączeniu keep-alive czeka ~40 ms na opóźniony ACK klienta
+    disable_nagle_algorithm = True
+    cluster: FakeCluster = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.cluster._lock:
+            self.cluster.connections += 1
+
+    def _respond(self, code: int, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if code in (429, 503) and self.cluster.retry_after is not None:
+            self.send_header("Retry-After", f"{self.cluster.retry_after:g}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        cluster = self.cluster
+
+        for method, route, pattern in ROUTES:
+            match = pattern.match(url.path) if method == self.command else None
+            if match is None:
+                continue
+            if query.get("watch", "").lower() in ("true", "1"):
+                # Pusty strumień watch - informer po zamknięciu połączy się ponownie
+                time.sleep(min(float(query.get("timeoutSeconds", WATCH_HOLD_SECONDS)), WATCH_HOLD_SECONDS))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            with cluster._lock:
+                cluster.calls[route] += 1
+                cluster.bytes_received += len(raw)
+            code = cluster.delay()
+            if code is not None:
+                with cluster._lock:
+                    cluster.errors[route] += 1
+                self._respond(code, {"kind": "Status", "status": "Failure", "code": code})
+                return
+            body = json.loads(raw) if raw else None
+            code, payload = cluster.handle(self.command, route, match.groupdict(), query, body)
+            self._respond(code, payload)
+            return
+
+        with cluster._lock:
+            cluster.calls["unknown"] += 1
+        self._respond(404, {"kind": "Status", "status": "Failure", "reason": "NotFound", "code": 404})
+
+    do_GET = do_DELETE = do_PATCH = do_POST = do_PUT = _dispatch
+
+
+class FakeApiServer:
+    """Serwer HTTP fałszywego API w wątku w tle"""
+
+    def __init__(self, cluster: FakeCluster, host: str = "127.0.0.1", port: int = 0):
+        handler = type("Handler", (_Handler,), {"cluster": cluster})
+        self.cluster = cluster
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-k8s-api", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def kubeconfig(self) -> str:
+        """Kubeconfig wskazujący na ten serwer (YAML)"""
+        return (
+            "apiVersion: v1\n"
+            "kind: Config\n"
+            "clusters:\n"
+            f"- name: fake\n  cluster:\n    server: {self.url}\n"
+            "users:\n"
+            "- name: fake\n  user:\n    token: bench\n"
+            "contexts:\n"
+            "- name: fake\n  context:\n    cluster: fake\n    user: fake\n"
+            "current-context: fake\n"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fałszywy API server Kubernetes")
+    parser.add_argument("--port", type=int, default=18443)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeApiServer(
+        FakeCluster(args.latency_ms, args.jitter_ms, args.error_rate),
+        port=args.port
+    )
+    print(f"Fałszywy API server: {server.url}")
+    server.httpd.serve_forever()
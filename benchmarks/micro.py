@@ -0,0 +1,495 @@
+"""
+Mikrobenchmarki pojedynczych komponentów webhooka (bez HTTP; rollback i patch_payload
+przeciw fałszywemu API serverowi).
+
+    rules          - dopasowanie zdarzeń przy tysiącach reguł (µs na dopasowanie)
+    ndjson         - strumieniowe przyjmowanie NDJSON (zdarzeń/s, szczyt pamięci)
+    journal        - dziennik akcji przy różnych rozmiarach paczek group commit
+    metrics        - narzut InstrumentedApi na wywołanie API
+    patch_payload  - rozmiar ciał zapisów i opóźnienie akcji: dawny read-modify-write
+                     (odczyt + pełny obiekt) vs minimalny patch / subresource /scale
+    sharding       - rozkład kluczy na repliki i oczekiwane skalowanie przepustowości
+    priority       - pozycja akcji CRITICAL w kolejce zalanej akcjami WARNING
+    correlation    - przepustowość okna korelacji
+    rollback       - równoczesne rollbacki przeciw fałszywemu API serverowi:
+                     poprawność (jedna rewizja wstecz), listowania i konflikty
+    shadow         - ocena reguł: decide_action po jednym zdarzeniu vs paczki
+                     decide_actions (zdarzeń/s), pełny ShadowEvaluator i koszt ShadowMode.offer
+
+Przykład:
+    python micro.py --only rules,journal --output results/micro.json
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Dict, Any, Callable
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "python"))
+
+from fake_k8s import PREVIOUS_HASH, FakeApiServer, FakeCluster  # noqa: E402
+from traffic import TrafficGenerator, Workloads  # noqa: E402
+from run import SCHEMA_VERSION, git_revision, percentiles  # noqa: E402
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Dict[str, Any]]] = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__.replace("bench_", "")] = func
+    return func
+
+
+def timed(func: Callable[[], Any], repeat: int) -> float:
+    """Średni czas jednego wywołania w sekundach"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+@benchmark
+def bench_rules(args) -> Dict[str, Any]:
+    from rules import compile_rules
+
+    results = {}
+    rng = random.Random(args.seed)
+    for size in (6, 500, 4000):
+        specs = []
+        for i in range(size):
+            kind = i % 3
+            spec = {"source": "falco", "action": "delete_pod", "priority_threshold": "WARNING"}
+            if kind == 0:
+                spec["name"] = f"Rule {i}"
+            elif kind == 1:
+                spec["pattern"] = f"Glob {i} *"
+            else:
+                spec["regex"] = f"^Regex {i} (a|b)$"
+                spec["namespaces"] = ["prod-*"]
+            specs.append(spec)
+        specs.append({"name": "Container Escape Attempt", "source": "falco", "action": "delete_pod",
+                      "priority_threshold": "CRITICAL"})
+        rule_set = compile_rules(specs)
+        names = [f"Rule {rng.randrange(size)}", f"Glob {rng.randrange(size)} x", "Container Escape Attempt", "Unknown"]
+        repeat = max(1000, args.iterations)
+
+        def match():
+            for name in names:
+                rule_set.match("falco", name, "CRITICAL", "prod-a", ["container"], {})
+
+        results[f"rules_{size}"] = {"match_us": round(timed(match, repeat) / len(names) * 1e6, 3)}
+    return results
+
+
+@benchmark
+def bench_ndjson(args) -> Dict[str, Any]:
+    from ingest import iter_ndjson_lines, parse_line, prefilter
+    from rules import compile_rules, load_rules_config
+
+    rng = random.Random(args.seed)
+    generator = TrafficGenerator(Workloads(20, 10, 3, rng), rng)
+    events = [generator.falco_event() for _ in range(args.iterations)]
+    body = "\n".join(json.dumps(e) for e in events).encode()
+    rule_set = compile_rules(load_rules_config())
+    results = {}
+
+    for compressed in (False, True):
+        payload = gzip.compress(body) if compressed else body
+
+        async def chunks():
+            for i in range(0, len(payload), 65536):
+                yield payload[i:i + 65536]
+
+        async def consume():
+            passed = 0
+            async for line in iter_ndjson_lines(chunks(), compressed):
+                raw = parse_line(line)
+                if raw is not None and prefilter(rule_set, "falco", raw) is not None:
+                    passed += 1
+            return passed
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        passed = asyncio.run(consume())
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results["gzip" if compressed else "plain"] = {
+            "events": len(events),
+            "body_bytes": len(payload),
+            "events_per_s": round(len(events) / elapsed, 1),
+            "passed_prefilter": passed,
+            "tracemalloc_peak_mb": round(peak / (1024.0 * 1024.0), 2)
+        }
+    return results
+
+
+@benchmark
+def bench_journal(args) -> Dict[str, Any]:
+    from journal import ActionJournal
+
+    results = {}
+    count = min(args.iterations, 5000)
+    for batch_size in (1, 8, 64, 256):
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = ActionJournal(os.path.join(tmp, "journal.db"), batch_size=batch_size, max_delay_ms=2)
+            journal.start()
+
+            async def append_all():
+                await asyncio.gather(*(
+                    journal.append(f"event-{i}", {"type": "delete_pod", "namespace": "ns", "pod_name": f"p{i}"})
+                    for i in range(count)
+                ))
+
+            start = time.perf_counter()
+            asyncio.run(append_all())
+            elapsed = time.perf_counter() - start
+            stats = journal.stats()
+            journal.close()
+        results[f"batch_{batch_size}"] = {
+            "appends_per_s": round(count / elapsed, 1),
+            "commits": stats["commits"],
+            "appends_per_commit": round(count / max(stats["commits"], 1), 1)
+        }
+    return results
+
+
+@benchmark
+def bench_metrics(args) -> Dict[str, Any]:
+    from metrics import InstrumentedApi
+
+    class Api:
+        def read_namespaced_pod(self, name, namespace):
+            return name
+
+    raw = Api()
+    wrapped = InstrumentedApi(Api())
+    repeat = max(10000, args.iterations * 10)
+    raw_s = timed(lambda: raw.read_namespaced_pod("p", "ns"), repeat)
+    wrapped_s = timed(lambda: wrapped.read_namespaced_pod("p", "ns"), repeat)
+    return {
+        "raw_call_us": round(raw_s * 1e6, 3),
+        "instrumented_call_us": round(wrapped_s * 1e6, 3),
+        "overhead_us": round((wrapped_s - raw_s) * 1e6, 3)
+    }
+
+
+@benchmark
+def bench_patch_payload(args) -> Dict[str, Any]:
+    from kubernetes import client
+    from kube_client import build_api_client
+    from remediation import RemediationEngine
+
+    cluster = FakeCluster()
+    deployment = cluster.deployment("ns", "app")
+    restart_patch = {"spec": {"template": {"metadata": {"annotations": {
+        "kubectl.kubernetes.io/restartedAt": str(int(time.time()))
+    }}}}}
+    scale_patch = {"metadata": {"resourceVersion": "12345"}, "spec": {"replicas": 4}}
+
+    def size(body) -> int:
+        return len(json.dumps(body, separators=(",", ":")).encode())
+
+    results: Dict[str, Any] = {
+        "full_deployment_bytes": size(deployment),
+        "restart_patch_bytes": size(restart_patch),
+        "scale_patch_bytes": size(scale_patch)
+    }
+
+    # Opóźnienie akcji na fałszywym API serverze: dawny read-modify-write
+    # (odczyt całego Deploymentu i patch pełnym obiektem) vs minimalny patch
+    cluster = FakeCluster(latency_ms=1.0, seed=args.seed, inventory={"bench": ["app"]})
+    server = FakeApiServer(cluster)
+    server.start()
+    configuration = client.Configuration()
+    configuration.host = server.url
+    engine = RemediationEngine(api_client=build_api_client(configuration, make_default=False))
+    repeat = 200
+
+    def read_modify_write(action_type: str):
+        deployment = engine.apps_v1.read_namespaced_deployment(name="app", namespace="bench")
+        if action_type == "restart_deployment":
+            if deployment.spec.template.metadata.annotations is None:
+                deployment.spec.template.metadata.annotations = {}
+            deployment.spec.template.metadata.annotations["kubectl.kubernetes.io/restartedAt"] = str(int(time.time()))
+        else:
+            deployment.spec.replicas = min(10, (deployment.spec.replicas or 1) + 1)
+        engine.apps_v1.patch_namespaced_deployment(name="app", namespace="bench", body=deployment)
+
+    def patch(action_type: str):
+        outcome = engine.execute_action({"type": action_type, "namespace": "bench", "deployment_name": "app"})
+        assert outcome["status"] == "success", outcome
+
+    try:
+        for action_type in ("restart_deployment", "scale_up", "scale_down"):
+            for path, func in (("read_modify_write", read_modify_write), ("patch", patch)):
+                func(action_type)
+                stats_before = cluster.stats()
+                samples = []
+                for _ in range(repeat):
+                    # Repliki poza granicami, żeby każde skalowanie było zapisem
+                    cluster.deployment_state("bench", "app")["replicas"] = 5
+                    start = time.perf_counter()
+                    func(action_type)
+                    samples.append(time.perf_counter() - start)
+                stats_after = cluster.stats()
+                results[f"{action_type}_{path}"] = dict(
+                    percentiles(samples),
+                    api_calls_per_action=round((stats_after["total_calls"] - stats_before["total_calls"]) / repeat, 2),
+                    request_bytes_per_action=round((stats_after["bytes_received"] - stats_before["bytes_received"]) / repeat)
+                )
+    finally:
+        server.stop()
+    return results
+
+
+@benchmark
+def bench_sharding(args) -> Dict[str, Any]:
+    from sharding import HashRing
+
+    keys = [f"tenant-{i}/app-{j}" for i in range(200) for j in range(25)]
+    results = {}
+    previous = None
+    for replicas in (1, 2, 4, 8):
+        members = [f"replica-{i}" for i in range(replicas)]
+        ring = HashRing(members)
+        owners = {key: ring.owner(key) for key in keys}
+        load = {member: 0 for member in members}
+        for owner in owners.values():
+            load[owner] += 1
+        mean = len(keys) / replicas
+        entry = {
+            "max_share": round(max(load.values()) / len(keys), 4),
+            # Najbardziej obciążona replika ogranicza przepustowość całości
+            "expected_speedup": round(len(keys) / max(load.values()), 2),
+            "imbalance": round(max(load.values()) / mean, 3)
+        }
+        if previous is not None:
+            moved = sum(1 for key in keys if previous[key] != owners[key])
+            entry["keys_moved_share"] = round(moved / len(keys), 4)
+        results[f"replicas_{replicas}"] = entry
+        previous = owners
+    return results
+
+
+@benchmark
+def bench_priority(args) -> Dict[str, Any]:
+    from action_queue import ActionQueue
+
+    order = []
+
+    class Executor:
+        async def run(self, action):
+            order.append(action["priority"])
+            await asyncio.sleep(0.001)
+            return {"status": "success"}
+
+    async def scenario():
+        queue = ActionQueue(Executor(), maxsize=100000, workers=4, critical_budget_ms=50)
+        queue.start()
+        for i in range(min(args.iterations, 5000)):
+            queue.submit({"type": "restart_pod", "priority": "WARNING", "namespace": f"noisy-{i % 3}"})
+        await asyncio.sleep(0.02)
+        queue.submit({"type": "delete_pod", "priority": "CRITICAL", "namespace": "victim"})
+        await asyncio.sleep(0.05)
+        stats = queue.stats()
+        await queue.shutdown()
+        return stats
+
+    stats = asyncio.run(scenario())
+    return {
+        "warning_flood": order.count("WARNING"),
+        "critical_dequeued_after": order.index("CRITICAL") if "CRITICAL" in order else None,
+        "critical_wait_ms": stats["max_critical_wait_ms"],
+        "critical_budget_exceeded": stats["critical_budget_exceeded"]
+    }
+
+
+@benchmark
+def bench_correlation(args) -> Dict[str, Any]:
+    from correlation import CorrelationWindow
+
+    async def dispatch(action):
+        return {"status": "success"}
+
+    async def scenario():
+        window = CorrelationWindow(dispatch, window=0.05, max_keys=10000)
+        types = ("delete_pod", "restart_deployment", "scale_down")
+        start = time.perf_counter()
+        for i in range(args.iterations):
+            window.offer({
+                "type": types[i % 3], "priority": "WARNING", "namespace": f"ns-{i % 50}",
+                "deployment_name": f"app-{i % 20}", "rule": "bench"
+            })
+        elapsed = time.perf_counter() - start
+        await window.flush()
+        return elapsed, window.stats()
+
+    elapsed, stats = asyncio.run(scenario())
+    return {
+        "offers_per_s": round(args.iterations / elapsed, 1),
+        "dispatched": stats["dispatched"],
+        "superseded": stats["superseded"]
+    }
+
+
+@benchmark
+def bench_rollback(args) -> Dict[str, Any]:
+    from concurrent.futures import ThreadPoolExecutor
+    from kubernetes import client
+    from informer import ClusterCache
+    from kube_client import build_api_client
+    from remediation import RemediationEngine
+
+    deployments = [f"app-{i}" for i in range(20)]
+    concurrent = 8
+    results = {}
+    for mode in ("list", "cache"):
+        cluster = FakeCluster(latency_ms=2.0, seed=args.seed, inventory={"bench": deployments})
+        server = FakeApiServer(cluster)
+        server.start()
+        configuration = client.Configuration()
+        configuration.host = server.url
+        engine = RemediationEngine(api_client=build_api_client(configuration))
+        cache = None
+        if mode == "cache":
+            cache = ClusterCache(engine.core_v1, engine.apps_v1)
+            cache.start()
+            cache.wait_for_sync()
+            engine.cache = cache
+        calls_before = cluster.stats()["calls"]
+
+        # Kilka równoczesnych rollbacków "do poprzedniej" każdego deploymentu
+        barrier = threading.Barrier(concurrent * len(deployments))
+
+        def rollback(name):
+            barrier.wait()
+            return engine.execute_action({"type": "rollback", "namespace": "bench", "deployment_name": name})
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrent * len(deployments)) as pool:
+            outcomes = list(pool.map(rollback, [d for d in deployments for _ in range(concurrent)]))
+        elapsed = time.perf_counter() - start
+        if cache is not None:
+            cache.stop()
+        server.stop()
+
+        calls = cluster.stats()["calls"]
+        counts: Dict[str, int] = {}
+        for outcome in outcomes:
+            key = outcome.get("action") or outcome["status"]
+            counts[key] = counts.get(key, 0) + 1
+        results[mode] = {
+            "rollbacks": len(outcomes),
+            "duration_ms": round(elapsed * 1000.0, 2),
+            "outcomes": counts,
+            "replicaset_lists": calls.get("list_namespaced_replicasets", 0)
+            - calls_before.get("list_namespaced_replicasets", 0),
+            "patches": calls.get("patch_deployment", 0) - calls_before.get("patch_deployment", 0),
+            "conflicts": cluster.conflicts,
+            # Każdy deployment cofnięty dokładnie o jedną rewizję mimo równoczesnych akcji
+            "correct": cluster.rollbacks == len(deployments) and all(
+                cluster.deployment_state("bench", d)["current"] == PREVIOUS_HASH for d in deployments
+            )
+        }
+    return results
+
+
+@benchmark
+def bench_shadow(args) -> Dict[str, Any]:
+    import logging
+    from remediation import RemediationEngine
+    import yaml
+    from shadow import ShadowEvaluator, ShadowMode, batched
+
+    logging.getLogger("remediation").setLevel(logging.WARNING)
+    rng = random.Random(args.seed)
+    generator = TrafficGenerator(Workloads(20, 10, 3, rng), rng)
+    records = list(generator.stream(args.iterations, 0.3, 5))
+    events = [event for batch in batched(records, args.iterations * 10) for event in batch]
+    # Paczki podzielone według źródła przed pomiarem - obie ścieżki mierzą samą decyzję, bez normalizacji rekordów
+    splits = {
+        batch_size: [
+            (source, [event[1:] for event in batch if event[0] == source])
+            for batch in batched(records, batch_size) for source in ("falco", "prometheus")
+        ]
+        for batch_size in (100, 5000)
+    }
+    # Te same reguły z selektorem namespace - ścieżka z pełnym match()
+    with open(os.path.join(os.path.dirname(HERE), "python", "rules.yaml")) as f:
+        selector_rules = [dict(spec, namespaces=["tenant-*"]) for spec in yaml.safe_load(f)["rules"]]
+    engine = RemediationEngine()
+
+    results: Dict[str, Any] = {"events": len(events)}
+    for name, subject in (("", engine), ("selectors_", RemediationEngine(rules_config=selector_rules))):
+        started = time.perf_counter()
+        for source, rule, priority, metadata, tags in events:
+            subject.decide_action(source, rule, priority, metadata, tags)
+        results[f"{name}single_events_per_s"] = round(len(events) / (time.perf_counter() - started))
+        for batch_size, split in splits.items():
+            started = time.perf_counter()
+            for source, batch in split:
+                subject.decide_actions(source, batch)
+            results[f"{name}batch_{batch_size}_events_per_s"] = round(len(events) / (time.perf_counter() - started))
+
+    # Pełna ocena: reguły kandydackie i bieżące na każdym zdarzeniu plus raport różnic
+    evaluator = ShadowEvaluator(RemediationEngine(), engine)
+    evaluator.run(batched(records, 5000))
+    results["evaluator_events_per_s"] = round(evaluator.events / evaluator.seconds)
+
+    mode = ShadowMode(ShadowEvaluator(engine, engine), buffer_size=len(records) + 1)
+    started = time.perf_counter()
+    for record in records:
+        mode.offer(record["source"], record["payload"])
+    results["offer_us"] = round((time.perf_counter() - started) / len(records) * 1e6, 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mikrobenchmarki webhooka auto-heal")
+    parser.add_argument("--only", help=f"Lista benchmarków oddzielona przecinkami ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Plik wynikowy JSON (domyślnie stdout)")
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Nieznane benchmarki: {', '.join(unknown)}")
+
+    results = {}
+    for name in selected:
+        print(f"micro: {name}", file=sys.stderr)
+        results[name] = BENCHMARKS[name](args)
+
+    report = {
+        "benchmark": "micro",
+        "schema": SCHEMA_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"iterations": args.iterations, "seed": args.seed},
+        "results": results
+    }
+    data = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Benchmark webhooka obsługującego kilka klastrów (CLUSTERS_CONFIG).
+
+Każdy klaster to osobny fałszywy API server: klaster lokalny (KUBECONFIG
+procesu) i --clusters dodatkowych z własnym kubeconfig. Ostatni dodatkowy
+klaster może być wolny (--slow-latency-ms). Ruch każdego klastra jest wysyłany
+niezależnie (jak z osobnego Alertmanagera/Falcosidekick) z namespace
+poprzedzonymi nazwą klastra; klaster zdarzenia wskazuje hostname Falco
+(wzorzec `hosts`), etykieta alertu `cluster` albo nagłówek X-Autoheal-Cluster.
+
+Mierzone są: przepustowość łączna i per klaster, opóźnienia alertów Prometheus
+(wykonanie akcji przed odpowiedzią) per klaster oraz poprawność routingu -
+każdy API server musi dostać wywołania wyłącznie dla namespace swojego klastra.
+Izolacja: opóźnienia szybkich klastrów nie powinny rosnąć przez wolny klaster.
+
+Przykłady:
+    python multicluster.py --clusters 3 --events 3000 --output results/multicluster.json
+    python multicluster.py --clusters 4 --slow-latency-ms 0      # bez wolnego klastra
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "python"))
+
+from fake_k8s import FakeApiServer, FakeCluster  # noqa: E402
+from run import BENCH_ENV, SCHEMA_VERSION, git_revision, percentiles  # noqa: E402
+from traffic import TrafficGenerator, Workloads  # noqa: E402
+
+LOCAL = "local"
+ROUTING = ("hostname", "label", "header")
+
+
+def cluster_records(name: str, args, rng: random.Random) -> List[Dict[str, Any]]:
+    """Ruch jednego klastra: zdarzenia Falco i alerty z namespace '<klaster>-...'"""
+    generator = TrafficGenerator(Workloads(args.namespaces, args.deployments, 3, rng), rng)
+    records = []
+    for i in range(args.events):
+        via = ROUTING[i % len(ROUTING)]
+        if rng.random() < args.prometheus_share:
+            payload = generator.alert()
+            labels = payload["labels"]
+            labels["namespace"] = f"{name}-{labels['namespace']}"
+            # Alerty nie mają hostname - routing po hostname zastępuje etykieta
+            if via != "header" and name != LOCAL:
+                labels["cluster"] = name
+            records.append({"source": "prometheus", "payload": payload, "via": via})
+        else:
+            payload = generator.falco_event()
+            fields = payload["output_fields"]
+            if "k8s.ns.name" in fields:
+                fields["k8s.ns.name"] = f"{name}-{fields['k8s.ns.name']}"
+            else:
+                # Bez pól k8s.* i bez cache informerów zdarzenie nie ma celu
+                fields["k8s.ns.name"] = f"{name}-tenant-0"
+                fields["k8s.pod.name"] = "app-0-5d8f7-a0"
+            payload["hostname"] = f"{name}-node-{rng.randrange(8)}"
+            records.append({"source": "falco", "payload": payload, "via": via})
+    return records
+
+
+async def drive_cluster(app, name: str, records: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    """Wysyła ruch jednego klastra z własnym limitem współbieżności"""
+    import httpx
+
+    latencies: Dict[str, List[float]] = {"falco": [], "prometheus": []}
+    statuses: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def send(client, record):
+        headers = {"X-Autoheal-Cluster": name} if record["via"] == "header" and name != LOCAL else {}
+        path = "/webhook/prometheus" if record["source"] == "prometheus" else "/webhook/falco"
+        async with semaphore:
+            t0 = time.perf_counter()
+            response = await client.post(path, json=record["payload"], headers=headers)
+            latencies[record["source"]].append(time.perf_counter() - t0)
+        body = response.json()
+        key = f"{response.status_code}/{body.get('status')}"
+        statuses[key] = statuses.get(key, 0) + 1
+
+    started = time.perf_counter()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await asyncio.gather(*(send(client, record) for record in records))
+    duration = time.perf_counter() - started
+    return {
+        "requests": len(records),
+        "duration_s": round(duration, 3),
+        "requests_per_s": round(len(records) / duration, 1) if duration else None,
+        "statuses": statuses,
+        "falco_ms": percentiles(latencies["falco"]),
+        "prometheus_ms": percentiles(latencies["prometheus"])
+    }
+
+
+async def wait_for_drain(w, timeout: float) -> bool:
+    """Czeka na opróżnienie kolejek wszystkich klastrów"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        queues = [w.action_queue.stats()] + [c["queue"] for c in w.clusters.stats()["clusters"].values()]
+        if all(q["enqueued"] <= q["processed"] + q["failed"] for q in queues):
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    names = [LOCAL] + [f"cluster-{i}" for i in range(1, args.clusters + 1)]
+    slow = names[-1] if args.slow_latency_ms and args.clusters else None
+
+    servers: Dict[str, FakeApiServer] = {}
+    files: List[str] = []
+    specs = []
+    for name in names:
+        cluster = FakeCluster(latency_ms=args.slow_latency_ms if name == slow else args.api_latency_ms, seed=args.seed)
+        server = servers[name] = FakeApiServer(cluster)
+        server.start()
+        kubeconfig = tempfile.NamedTemporaryFile("w", suffix=".kubeconfig", delete=False)
+        kubeconfig.write(server.kubeconfig())
+        kubeconfig.close()
+        files.append(kubeconfig.name)
+        if name == LOCAL:
+            os.environ["KUBECONFIG"] = kubeconfig.name
+        else:
+            specs.append({"name": name, "kubeconfig": kubeconfig.name, "hosts": [f"{name}-node-*"]})
+
+    config = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    json.dump({"clusters": specs}, config)
+    config.close()
+    files.append(config.name)
+    os.environ["CLUSTERS_CONFIG"] = config.name
+    os.environ["CLUSTER_NAME"] = LOCAL
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+
+    traffic = {name: cluster_records(name, args, rng) for name in names}
+
+    import auto_heal_webhook as w
+    logging.getLogger().setLevel(logging.WARNING)
+
+    await w.app.router.startup()
+    await asyncio.get_running_loop().run_in_executor(None, w.warm_up.wait, 30.0)
+    calls_before = {name: server.cluster.stats()["total_calls"] for name, server in servers.items()}
+
+    started = time.perf_counter()
+    sent = await asyncio.gather(*(drive_cluster(w.app, name, traffic[name], args) for name in names))
+    drained = await wait_for_drain(w, args.drain_timeout)
+    total = time.perf_counter() - started
+    router = w.clusters.stats()
+    await w.app.router.shutdown()
+
+    per_cluster = {}
+    misrouted = 0
+    for name, result in zip(names, sent):
+        api = servers[name].cluster.stats()
+        # Każde wywołanie z namespace innego klastra to błąd routingu
+        foreign = sum(count for ns, count in api["namespaces"].items() if not ns.startswith(f"{name}-"))
+        misrouted += foreign
+        per_cluster[name] = dict(
+            result,
+            slow=name == slow,
+            api_calls=api["total_calls"] - calls_before[name],
+            misrouted_calls=foreign
+        )
+        servers[name].stop()
+    for path in files:
+        os.unlink(path)
+
+    requests = sum(r["requests"] for r in sent)
+    fast = [c["prometheus_ms"].get("p99") for n, c in per_cluster.items() if n != slow and c["prometheus_ms"].get("count")]
+    return {
+        "clusters": len(names),
+        "requests": requests,
+        "drained": drained,
+        "duration_s": round(total, 3),
+        "requests_per_s": round(requests / total, 1) if total else None,
+        "routing_correct": misrouted == 0 and router["unrouted"] == 0,
+        "unrouted": router["unrouted"],
+        # Izolacja: p99 szybkich klastrów poniżej mediany wolnego klastra
+        "isolated": bool(slow) and bool(fast) and max(fast) < per_cluster[slow]["prometheus_ms"].get("p50", 0),
+        "per_cluster": per_cluster
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark webhooka auto-heal dla wielu klastrów")
+    parser.add_argument("--clusters", type=int, default=3, help="Liczba dodatkowych klastrów (poza lokalnym)")
+    parser.add_argument("--events", type=int, default=1000, help="Liczba żądań na klaster")
+    parser.add_argument("--prometheus-share", type=float, default=0.3)
+    parser.add_argument("--namespaces", type=int, default=5)
+    parser.add_argument("--deployments", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=32, help="Współbieżność wysyłania per klaster")
+    parser.add_argument("--api-latency-ms", type=float, default=2.0)
+    parser.add_argument("--slow-latency-ms", type=float, default=200.0, help="Opóźnienie API ostatniego klastra (0 = brak)")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--env", action="append", default=[], help="Dodatkowa zmienna KEY=VALUE (wielokrotnie)")
+    parser.add_argument("--output", help="Plik wynikowy JSON (domyślnie stdout)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    report = {
+        "benchmark": "multicluster",
+        "schema": SCHEMA_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": asyncio.run(run_benchmark(args))
+    }
+    data = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
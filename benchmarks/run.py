@@ -0,0 +1,371 @@
+"""
+Benchmark obciążeniowy webhooka auto-heal.
+
+Uruchamia aplikację FastAPI w procesie (ASGI, bez sieci) przeciwko lokalnemu
+fałszywemu API serverowi Kubernetes, wysyła syntetyczny lub nagrany ruch Falco
+i Alertmanagera, czeka na wykonanie wszystkich akcji i zapisuje wynik jako JSON:
+przepustowość, percentyle opóźnień, wywołania API na zdarzenie i pamięć.
+
+Przykłady:
+    python run.py --scenario mixed --events 5000 --output results/mixed.json
+    python run.py --scenario falco --api-latency-ms 20 --api-error-rate 0.05
+    python run.py --record capture.ndjson --events 1000
+    python run.py --replay capture.ndjson --speed 1
+    python run.py --scenario prometheus --group-size 20 --split-alerts
+    python run.py --scenario falco --sweep REMEDIATION_MAX_CONCURRENCY=1,4,16,64
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "python"))
+
+from fake_k8s import FakeApiServer, FakeCluster  # noqa: E402
+from traffic import TrafficGenerator, Workloads, read_capture, write_capture  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+# Limity i cooldown wyłączone - mierzymy przepustowość, a nie tłumienie akcji
+BENCH_ENV = {
+    "REMEDIATION_COOLDOWN_SECONDS": "0",
+    "REMEDIATION_GLOBAL_RATE": "1000000/1000000",
+    "REMEDIATION_NAMESPACE_RATE": "1000000/1000000",
+    "REMEDIATION_ACTION_TYPE_RATE": "1000000/1000000",
+    "REMEDIATION_RULES_RELOAD_INTERVAL": "0",
+}
+
+SCENARIOS = ("falco", "falco-bulk", "prometheus", "mixed")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Percentyle w milisekundach"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000.0, 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * 1000.0, 3),
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p99": at(0.99),
+        "max": round(ordered[-1] * 1000.0, 3)
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def action_outcomes(metrics) -> Dict[str, int]:
+    """Liczniki autoheal_actions_total zsumowane per wynik"""
+    outcomes: Dict[str, int] = {}
+    for family in metrics.ACTIONS.collect():
+        for sample in family.samples:
+            if sample.name.endswith("_total"):
+                outcome = sample.labels["outcome"]
+                outcomes[outcome] = outcomes.get(outcome, 0) + int(sample.value)
+    return outcomes
+
+
+def api_retries(metrics) -> Dict[str, int]:
+    """Ponowienia żądań Kubernetes API według przyczyny"""
+    retries = {}
+    for family in metrics.KUBERNETES_API_RETRIES.collect():
+        for sample in family.samples:
+            if sample.name.endswith("_total"):
+                retries[sample.labels["reason"]] = int(sample.value)
+    return retries
+
+
+def build_records(args, generator: TrafficGenerator) -> List[Dict[str, Any]]:
+    if args.replay:
+        return read_capture(args.replay)
+    share = {"falco": 0.0, "falco-bulk": 0.0, "prometheus": 1.0, "mixed": args.prometheus_share}[args.scenario]
+    return list(generator.stream(args.events, share, args.group_size, args.rate))
+
+
+async def drive(app, records: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    """Wysyła rekordy do aplikacji z ograniczoną współbieżnością i mierzy opóźnienia"""
+    import httpx
+
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    started = time.perf_counter()
+
+    async def send(client, kind: str, path: str, **kwargs):
+        async with semaphore:
+            t0 = time.perf_counter()
+            response = await client.post(path, **kwargs)
+            latencies.setdefault(kind, []).append(time.perf_counter() - t0)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    async def paced(record):
+        # Odtwarzanie w czasie rzeczywistym (speed=1) lub przyspieszonym
+        if args.speed and record.get("t"):
+            delay = record["t"] / args.speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        tasks = []
+        if args.scenario == "falco-bulk" and not args.replay:
+            falco = [r["payload"] for r in records if r["source"] == "falco"]
+            for i in range(0, len(falco), args.bulk_size):
+                body = "\n".join(json.dumps(e) for e in falco[i:i + args.bulk_size]).encode()
+                tasks.append(asyncio.ensure_future(send(client, "falco_bulk", "/webhook/falco/bulk", content=body)))
+        else:
+            for record in records:
+                await paced(record)
+                if record["source"] == "prometheus" and args.split_alerts:
+                    # Te same alerty, ale każdy w osobnym żądaniu - porównanie z obsługą całej grupy
+                    for alert in record["payload"]["alerts"]:
+                        tasks.append(asyncio.ensure_future(
+                            send(client, "prometheus_alert", "/webhook/prometheus", json=alert)
+                        ))
+                    continue
+                if record["source"] == "prometheus":
+                    coro = send(client, "prometheus", "/webhook/prometheus", json=record["payload"])
+                else:
+                    coro = send(client, "falco", "/webhook/falco", json=record["payload"])
+                tasks.append(asyncio.ensure_future(coro))
+                # Ograniczenie liczby oczekujących zadań przy bardzo długich nagraniach
+                if len(tasks) >= args.concurrency * 4:
+                    await asyncio.gather(*tasks)
+                    tasks = []
+        await asyncio.gather(*tasks)
+
+    return {
+        "duration": time.perf_counter() - started,
+        "latencies": latencies,
+        "statuses": statuses,
+        "requests": sum(len(v) for v in latencies.values())
+    }
+
+
+async def wait_for_drain(w, timeout: float) -> bool:
+    """Czeka, aż wszystkie przyjęte akcje zostaną wykonane"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        queue = w.action_queue.stats()
+        correlation_open = w.correlator.stats()["open_windows"] if w.correlator.enabled else 0
+        if queue["enqueued"] <= queue["processed"] + queue["failed"] and correlation_open == 0:
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    workloads = Workloads(args.namespaces, args.deployments, args.pods, rng)
+    generator = TrafficGenerator(workloads, rng, container_ids_only=args.container_id_share)
+
+    if args.record:
+        count = write_capture(args.record, generator.stream(args.events, args.prometheus_share, args.group_size, args.rate))
+        return {"recorded": count, "path": args.record}
+
+    cluster = FakeCluster(
+        latency_ms=args.api_latency_ms,
+        jitter_ms=args.api_jitter_ms,
+        error_rate=args.api_error_rate,
+        error_codes=tuple(int(c) for c in args.api_error_codes.split(",")),
+        seed=args.seed,
+        inventory=workloads.inventory(),
+        retry_after=args.api_retry_after
+    )
+    server = FakeApiServer(cluster)
+    server.start()
+
+    kubeconfig = tempfile.NamedTemporaryFile("w", suffix=".kubeconfig", delete=False)
+    kubeconfig.write(server.kubeconfig())
+    kubeconfig.close()
+    os.environ["KUBECONFIG"] = kubeconfig.name
+    if not args.production_limits:
+        for key, value in BENCH_ENV.items():
+            os.environ.setdefault(key, value)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+
+    records = build_records(args, generator)
+    events = sum(
+        len(r["payload"].get("alerts", [r["payload"]])) if r["source"] == "prometheus" else 1
+        for r in records
+    )
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    import auto_heal_webhook as w
+    import metrics
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    await w.app.router.startup()
+    ready = await asyncio.get_running_loop().run_in_executor(None, w.warm_up.wait, 30.0)
+    if not ready:
+        print(f"Ostrzeżenie: webhook nie osiągnął gotowości w 30s ({w.warm_up.status()})", file=sys.stderr)
+    calls_before = cluster.stats()["total_calls"]
+
+    sent = await drive(w.app, records, args)
+    drain_started = time.perf_counter()
+    drained = await wait_for_drain(w, args.drain_timeout)
+    total = sent["duration"] + (time.perf_counter() - drain_started)
+
+    queue_stats = w.action_queue.stats()
+    executor_stats = w.action_executor.stats()
+    pool = w.kube_client.pool_stats()
+    await w.app.router.shutdown()
+    server.stop()
+    os.unlink(kubeconfig.name)
+
+    api = cluster.stats()
+    api_calls = api["total_calls"] - calls_before
+    outcomes = action_outcomes(metrics)
+    executed = sum(v for k, v in outcomes.items() if k not in ("suppressed", "rate_limited", "circuit_open"))
+
+    memory = {"max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)}
+    memory["rss_growth_mb"] = round(memory["max_rss_mb"] - rss_before / 1024.0, 1)
+    if args.tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        memory["tracemalloc_peak_mb"] = round(peak / (1024.0 * 1024.0), 2)
+        tracemalloc.stop()
+
+    return {
+        "requests": sent["requests"],
+        "events": events,
+        "drained": drained,
+        "duration_s": round(total, 3),
+        "send_duration_s": round(sent["duration"], 3),
+        "throughput": {
+            "requests_per_s": round(sent["requests"] / sent["duration"], 1) if sent["duration"] else None,
+            "events_per_s": round(events / sent["duration"], 1) if sent["duration"] else None,
+            "actions_per_s": round(executed / total, 1) if total else None
+        },
+        "latency_ms": {kind: percentiles(samples) for kind, samples in sent["latencies"].items()},
+        "http_status": sent["statuses"],
+        "actions": outcomes,
+        "kubernetes_api": {
+            "calls": api["calls"],
+            "total_calls": api_calls,
+            "errors": api["errors"],
+            "conflicts": api["conflicts"],
+            "bytes_sent_by_webhook": api["bytes_received"],
+            "connections": api["connections"],
+            "retries": api_retries(metrics),
+            "pool": pool,
+            "calls_per_event": round(api_calls / events, 4) if events else None,
+            "calls_per_action": round(api_calls / executed, 4) if executed else None
+        },
+        "queue": queue_stats,
+        "executor": executor_stats,
+        "memory": memory
+    }
+
+
+def run_sweep(args) -> Dict[str, Any]:
+    """Uruchamia benchmark w osobnym procesie dla każdej wartości zmiennej środowiskowej"""
+    key, _, values = args.sweep.partition("=")
+    argv = [a for a in sys.argv[1:]]
+    index = argv.index("--sweep")
+    del argv[index:index + 2]
+    if "--output" in argv:
+        index = argv.index("--output")
+        del argv[index:index + 2]
+
+    points = []
+    for value in values.split(","):
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), *argv, "--env", f"{key}={value}"]
+        )
+        points.append({"value": value, "result": json.loads(output)["results"]})
+    return {"parameter": key, "points": points}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark obciążeniowy webhooka auto-heal")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    parser.add_argument("--events", type=int, default=2000, help="Liczba rekordów (żądań lub grup alertów)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Równoległe żądania HTTP")
+    parser.add_argument("--prometheus-share", type=float, default=0.2, help="Udział grup Alertmanagera (mixed)")
+    parser.add_argument("--group-size", type=int, default=5, help="Maksymalna liczba alertów w grupie")
+    parser.add_argument("--split-alerts", action="store_true",
+                        help="Wysyłaj alerty z grupy Alertmanagera pojedynczo (jedno żądanie na alert)")
+    parser.add_argument("--bulk-size", type=int, default=500, help="Zdarzeń w jednym żądaniu NDJSON (falco-bulk)")
+    parser.add_argument("--container-id-share", type=float, default=0.0,
+                        help="Odsetek zdarzeń Falco tylko z container.id (rozwiązywanie przez informer)")
+    parser.add_argument("--namespaces", type=int, default=20)
+    parser.add_argument("--deployments", type=int, default=10, help="Deploymentów w namespace")
+    parser.add_argument("--pods", type=int, default=3, help="Podów w deploymencie")
+    parser.add_argument("--rate", type=float, default=0.0, help="Znaczniki czasu rekordów (rekordów/s) przy --record")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--api-latency-ms", type=float, default=2.0)
+    parser.add_argument("--api-jitter-ms", type=float, default=1.0)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--api-error-codes", default="500", help="Kody wstrzykiwanych błędów, np. 500,429")
+    parser.add_argument("--api-retry-after", type=float, help="Nagłówek Retry-After (sekundy) w odpowiedziach 429/503")
+    parser.add_argument("--record", help="Zapisz wygenerowany ruch do pliku NDJSON (bez uruchamiania)")
+    parser.add_argument("--replay", help="Odtwórz nagranie NDJSON zamiast ruchu syntetycznego")
+    parser.add_argument("--speed", type=float, default=0.0, help="Tempo odtwarzania (1 = czas rzeczywisty, 0 = maksymalne)")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--production-limits", action="store_true",
+                        help="Nie wyłączaj cooldownu i limitów szybkości")
+    parser.add_argument("--env", action="append", default=[], help="Dodatkowa zmienna KEY=VALUE (wielokrotnie)")
+    parser.add_argument("--sweep", help="Seria przebiegów dla wartości zmiennej, np. REMEDIATION_MAX_CONCURRENCY=1,4,16")
+    parser.add_argument("--tracemalloc", action="store_true", help="Mierz szczyt alokacji (spowalnia przebieg)")
+    parser.add_argument("--verbose", action="store_true", help="Pozostaw logi INFO webhooka")
+    parser.add_argument("--output", help="Plik wynikowy JSON (domyślnie stdout)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "verbose")}
+    results = run_sweep(args) if args.sweep else asyncio.run(run_benchmark(args))
+
+    report = {
+        "benchmark": "webhook",
+        "schema": SCHEMA_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results
+    }
+    data = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
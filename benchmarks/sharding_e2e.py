@@ -0,0 +1,290 @@
+"""
+Benchmark end-to-end shardingu webhooka (SHARDING_ENABLED) dla 1, 2, 4... replik.
+
+Każda replika to osobny proces uvicorn z Lease we wspólnym pliku
+(SHARD_LEASE_FILE) i kubeconfig wskazującym na jeden fałszywy API server.
+Zdarzenia Falco są wysyłane po HTTP do replik po kolei (round-robin, jak
+Service bez afinicji), więc większość akcji trafia do repliki, która nie jest
+właścicielem, i jest przekazywana przez POST /internal/actions.
+
+Mierzone są: przepustowość i opóźnienia żądań, liczba akcji przekazanych,
+przejętych i wykonanych per replika, wywołania API oraz poprawność - każda
+przyjęta akcja jest wykonana dokładnie raz (suma wykonań wszystkich replik
+równa liczbie przyjętych akcji).
+
+Przykłady:
+    python sharding_e2e.py --replicas 1,2,4 --events 3000 --output results/sharding.json
+    python sharding_e2e.py --replicas 2 --api-latency-ms 20 --env SHARD_KEY=workload
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PYTHON_DIR = os.path.join(os.path.dirname(HERE), "python")
+sys.path.insert(0, HERE)
+
+from fake_k8s import FakeApiServer, FakeCluster  # noqa: E402
+from run import BENCH_ENV, SCHEMA_VERSION, git_revision, percentiles  # noqa: E402
+from traffic import TrafficGenerator, Workloads  # noqa: E402
+
+PEER_TOKEN = "bench-peer-token"
+# Statusy odpowiedzi, po których akcja trafia do kolejki którejś repliki
+QUEUED = ("accepted", "forwarded", "taken_over")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_replicas(count: int, env: Dict[str, str], lease_file: str, log_dir: str = None) -> List[Dict[str, Any]]:
+    """Uruchamia repliki webhooka jako osobne procesy uvicorn (logi do log_dir/replica-N.log)"""
+    replicas = []
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    for i in range(count):
+        port = free_port()
+        address = f"http://127.0.0.1:{port}"
+        replica_env = dict(
+            env,
+            SHARDING_ENABLED="true",
+            SHARD_PEER_TOKEN=PEER_TOKEN,
+            SHARD_IDENTITY=f"replica-{i}",
+            SHARD_ADVERTISE_ADDRESS=address,
+            SHARD_LEASE_FILE=lease_file,
+            PORT=str(port)
+        )
+        log = open(os.path.join(log_dir, f"replica-{i}.log"), "w") if log_dir else subprocess.DEVNULL
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "auto_heal_webhook:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=PYTHON_DIR,
+            env=replica_env,
+            stdout=log,
+            stderr=log
+        )
+        replicas.append({"identity": f"replica-{i}", "address": address, "process": process, "log": log})
+    return replicas
+
+
+def stop_replicas(replicas: List[Dict[str, Any]]):
+    for replica in replicas:
+        replica["process"].terminate()
+    for replica in replicas:
+        try:
+            replica["process"].wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            replica["process"].kill()
+        if replica["log"] is not subprocess.DEVNULL:
+            replica["log"].close()
+
+
+async def wait_for_ring(client, replicas: List[Dict[str, Any]], timeout: float) -> bool:
+    """Czeka na gotowość replik i pełny skład pierścienia w każdej z nich"""
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            members = []
+            for replica in replicas:
+                ready = await client.get(f"{replica['address']}/health/ready")
+                stats = await client.get(f"{replica['address']}/queue")
+                if ready.status_code != 200:
+                    break
+                members.append(len(stats.json()["sharding"]["members"]))
+            if members == [len(replicas)] * len(replicas):
+                return True
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    return False
+
+
+async def queue_stats(client, replicas: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    stats = {}
+    for replica in replicas:
+        response = await client.get(f"{replica['address']}/queue")
+        stats[replica["identity"]] = response.json()
+    return stats
+
+
+async def wait_for_drain(client, replicas: List[Dict[str, Any]], timeout: float) -> bool:
+    """Czeka na opróżnienie kolejek wszystkich replik"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = await queue_stats(client, replicas)
+        queues = [s["queue"] for s in stats.values()]
+        if all(q["enqueued"] <= q["processed"] + q["failed"] for q in queues):
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def drive(client, replicas: List[Dict[str, Any]], events: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    """Wysyła zdarzenia Falco do replik po kolei"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def send(i, event):
+        address = replicas[i % len(replicas)]["address"]
+        async with semaphore:
+            t0 = time.perf_counter()
+            response = await client.post(f"{address}/webhook/falco", json=event)
+            latencies.append(time.perf_counter() - t0)
+        key = f"{response.status_code}/{response.json().get('status')}"
+        statuses[key] = statuses.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(i, event) for i, event in enumerate(events)))
+    duration = time.perf_counter() - started
+    return {
+        "requests": len(events),
+        "duration_s": round(duration, 3),
+        "requests_per_s": round(len(events) / duration, 1) if duration else None,
+        "statuses": statuses,
+        "latency_ms": percentiles(latencies)
+    }
+
+
+async def run_replicas(count: int, server: FakeApiServer, env: Dict[str, str], args) -> Dict[str, Any]:
+    """Jeden przebieg: count replik, ten sam ruch"""
+    import httpx
+
+    rng = random.Random(args.seed)
+    generator = TrafficGenerator(Workloads(args.namespaces, args.deployments, 3, rng), rng)
+    events = [generator.falco_event() for _ in range(args.events)]
+
+    lease_file = tempfile.NamedTemporaryFile("w", suffix=".leases.json", delete=False)
+    lease_file.close()
+    os.unlink(lease_file.name)
+    replicas = start_replicas(count, env, lease_file.name, args.log_dir)
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    try:
+        async with httpx.AsyncClient(timeout=args.drain_timeout, limits=limits) as client:
+            if not await wait_for_ring(client, replicas, args.ready_timeout):
+                raise RuntimeError(f"Repliki nie utworzyły pierścienia {count} członków w {args.ready_timeout}s")
+            calls_before = server.cluster.stats()["total_calls"]
+
+            started = time.perf_counter()
+            sent = await drive(client, replicas, events, args)
+            drained = await wait_for_drain(client, replicas, args.drain_timeout)
+            total = time.perf_counter() - started
+            stats = await queue_stats(client, replicas)
+    finally:
+        stop_replicas(replicas)
+        if os.path.exists(lease_file.name):
+            os.unlink(lease_file.name)
+
+    queued = sum(n for key, n in sent["statuses"].items() if key.split("/")[-1] in QUEUED)
+    per_replica = {}
+    for identity, s in stats.items():
+        per_replica[identity] = {
+            "executed": s["queue"]["processed"] + s["queue"]["failed"],
+            "forwarded": s["sharding"]["forwarded"],
+            "taken_over": s["sharding"]["taken_over"],
+            "dropped": s["sharding"]["dropped"],
+            "forward_rejected": s["sharding"]["forward_rejected"],
+            "forward_unconfirmed": s["sharding"]["forward_unconfirmed"],
+            "rebalances": s["sharding"]["rebalances"]
+        }
+    executed = sum(r["executed"] for r in per_replica.values())
+    api_calls = server.cluster.stats()["total_calls"] - calls_before
+    return dict(
+        sent,
+        replicas=count,
+        drained=drained,
+        total_s=round(total, 3),
+        actions_per_s=round(executed / total, 1) if total else None,
+        queued_actions=queued,
+        executed_actions=executed,
+        # Każda przyjęta akcja wykonana dokładnie raz - bez zgubionych i podwójnych
+        executed_once=drained and executed == queued,
+        api_calls=api_calls,
+        per_replica=per_replica
+    )
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    cluster = FakeCluster(
+        latency_ms=args.api_latency_ms,
+        seed=args.seed,
+        inventory=Workloads(args.namespaces, args.deployments, 3, rng).inventory()
+    )
+    server = FakeApiServer(cluster)
+    server.start()
+    kubeconfig = tempfile.NamedTemporaryFile("w", suffix=".kubeconfig", delete=False)
+    kubeconfig.write(server.kubeconfig())
+    kubeconfig.close()
+
+    env = dict(os.environ, KUBECONFIG=kubeconfig.name)
+    for key, value in BENCH_ENV.items():
+        env.setdefault(key, value)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    runs = []
+    try:
+        for count in args.replicas:
+            runs.append(await run_replicas(count, server, env, args))
+    finally:
+        server.stop()
+        os.unlink(kubeconfig.name)
+    return {"runs": runs}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end shardingu webhooka auto-heal")
+    parser.add_argument("--replicas", type=lambda v: [int(n) for n in v.split(",")], default=[1, 2, 4],
+                        help="Liczby replik, np. 1,2,4")
+    parser.add_argument("--events", type=int, default=2000, help="Liczba zdarzeń Falco na przebieg")
+    parser.add_argument("--namespaces", type=int, default=20)
+    parser.add_argument("--deployments", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--api-latency-ms", type=float, default=2.0)
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-dir", help="Katalog logów replik (domyślnie logi są pomijane)")
+    parser.add_argument("--env", action="append", default=[], help="Dodatkowa zmienna KEY=VALUE (wielokrotnie)")
+    parser.add_argument("--output", help="Plik wynikowy JSON (domyślnie stdout)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    report = {
+        "benchmark": "sharding",
+        "schema": SCHEMA_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": asyncio.run(run_benchmark(args))
+    }
+    data = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
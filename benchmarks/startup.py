@@ -0,0 +1,171 @@
+"""
+Benchmark zimnego startu webhooka auto-heal.
+
+Każdy przebieg to nowy proces Pythona (zimny import) z kubeconfig wskazującym
+na lokalny fałszywy API server. Mierzone są: czas importu aplikacji, czas
+obsługi zdarzenia startup, opóźnienie pierwszego żądania Falco (202) i
+pierwszego alertu Prometheus (wykonanie akcji) zaraz po starcie, czas do
+gotowości (/health/ready) oraz całkowity czas życia procesu.
+
+Przykłady:
+    python startup.py --runs 10 --output results/startup.json
+    python startup.py --runs 5 --env INFORMER_ENABLED=true --api-latency-ms 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "python"))
+
+from fake_k8s import FakeApiServer, FakeCluster  # noqa: E402
+from run import BENCH_ENV, SCHEMA_VERSION, git_revision  # noqa: E402
+from traffic import TrafficGenerator, Workloads  # noqa: E402
+
+METRICS = ("import_s", "startup_s", "first_falco_ms", "first_prometheus_ms", "ready_s", "process_s")
+
+
+async def child(args) -> Dict[str, Any]:
+    """Jeden zimny start - wykonywany w osobnym procesie"""
+    import httpx
+
+    started = time.perf_counter()
+    import auto_heal_webhook as w
+    imported = time.perf_counter()
+
+    await w.app.router.startup()
+    startup_done = time.perf_counter()
+
+    rng = random.Random(args.seed)
+    generator = TrafficGenerator(Workloads(1, 1, 3, rng), rng)
+    result: Dict[str, Any] = {
+        "import_s": imported - started,
+        "startup_s": startup_done - imported
+    }
+    transport = httpx.ASGITransport(app=w.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        t0 = time.perf_counter()
+        response = await client.post("/webhook/falco", json=generator.falco_event())
+        result["first_falco_ms"] = (time.perf_counter() - t0) * 1000.0
+        result["first_falco_status"] = response.status_code
+
+        t0 = time.perf_counter()
+        response = await client.post("/webhook/prometheus", json=generator.alert())
+        result["first_prometheus_ms"] = (time.perf_counter() - t0) * 1000.0
+        result["first_prometheus_status"] = response.status_code
+
+        ready = await asyncio.get_running_loop().run_in_executor(None, w.warm_up.wait, args.ready_timeout)
+        response = await client.get("/health/ready")
+        result["ready"] = ready and response.status_code == 200
+        result["ready_s"] = w.warm_up.ready_in
+
+    await w.app.router.shutdown()
+    return result
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(s for s in samples if s is not None)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "min": round(ordered[0], 4),
+        "p50": round(ordered[len(ordered) // 2], 4),
+        "max": round(ordered[-1], 4),
+        "mean": round(sum(ordered) / len(ordered), 4)
+    }
+
+
+def run_parent(args) -> Dict[str, Any]:
+    cluster = FakeCluster(
+        latency_ms=args.api_latency_ms,
+        seed=args.seed,
+        inventory=Workloads(1, 1, 3, random.Random(args.seed)).inventory()
+    )
+    server = FakeApiServer(cluster)
+    server.start()
+    kubeconfig = tempfile.NamedTemporaryFile("w", suffix=".kubeconfig", delete=False)
+    kubeconfig.write(server.kubeconfig())
+    kubeconfig.close()
+
+    env = dict(os.environ, KUBECONFIG=kubeconfig.name)
+    for key, value in BENCH_ENV.items():
+        env.setdefault(key, value)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    runs = []
+    try:
+        for i in range(args.runs):
+            t0 = time.perf_counter()
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), "--child", "--seed", str(args.seed + i),
+                 "--ready-timeout", str(args.ready_timeout)],
+                env=env
+            )
+            run = json.loads(output.decode().strip().splitlines()[-1])
+            run["process_s"] = time.perf_counter() - t0
+            runs.append(run)
+    finally:
+        server.stop()
+        os.unlink(kubeconfig.name)
+
+    return {
+        "runs": len(runs),
+        "ready": sum(1 for r in runs if r.get("ready")),
+        **{name: summarize([r.get(name) for r in runs]) for name in METRICS},
+        "samples": runs
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark zimnego startu webhooka auto-heal")
+    parser.add_argument("--runs", type=int, default=5, help="Liczba zimnych startów (procesów)")
+    parser.add_argument("--api-latency-ms", type=float, default=2.0)
+    parser.add_argument("--ready-timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--env", action="append", default=[], help="Dodatkowa zmienna KEY=VALUE (wielokrotnie)")
+    parser.add_argument("--output", help="Plik wynikowy JSON (domyślnie stdout)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        import logging
+        logging.disable(logging.WARNING)
+        print(json.dumps(asyncio.run(child(args))))
+        return
+
+    report = {
+        "benchmark": "startup",
+        "schema": SCHEMA_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "child")},
+        "results": run_parent(args)
+    }
+    data = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
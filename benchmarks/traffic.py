@@ -0,0 +1,219 @@
+"""
+Generator syntetycznego ruchu Falco i Alertmanagera oraz zapis/odczyt nagrań.
+
+Reguły Falco (nazwy, priorytety, tagi) pochodzą z falco/rules/custom-rules.yaml,
+a alerty Prometheus z reguł naprawczych python/rules.yaml, więc ruch odpowiada
+temu, co webhook faktycznie dostaje. Rozkład priorytetów jest celowo
+przechylony w stronę szumu (NOTICE/WARNING), z nielicznymi zdarzeniami CRITICAL.
+
+Format nagrania (NDJSON, jedna linia na zdarzenie):
+    {"t": <sekundy od początku>, "source": "falco" | "prometheus", "payload": {...}}
+"""
+import datetime
+import json
+import os
+import random
+from typing import Dict, Any, Iterator, List, Optional
+
+import yaml
+
+from fake_k8s import container_id
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FALCO_RULES_PATH = os.path.join(ROOT, "falco", "rules", "custom-rules.yaml")
+ACTION_RULES_PATH = os.path.join(ROOT, "python", "rules.yaml")
+
+# Udział zdarzeń według priorytetu Falco (szum przeważa)
+PRIORITY_WEIGHTS = {"NOTICE": 40, "WARNING": 40, "ERROR": 15, "CRITICAL": 5}
+
+PROMETHEUS_SEVERITIES = ("warning", "critical")
+
+
+def load_falco_rules(path: str = FALCO_RULES_PATH) -> List[Dict[str, Any]]:
+    """Zwraca reguły Falco: [{"rule", "priority", "tags"}]"""
+    with open(path) as f:
+        documents = yaml.safe_load(f) or []
+    return [
+        {"rule": item["rule"], "priority": item.get("priority", "WARNING"), "tags": item.get("tags", [])}
+        for item in documents
+        if isinstance(item, dict) and "rule" in item
+    ]
+
+
+def load_alert_names(path: str = ACTION_RULES_PATH) -> List[str]:
+    """Zwraca nazwy alertów Prometheus obsługiwane przez reguły naprawcze"""
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    return [
+        rule["name"] for rule in config.get("rules", [])
+        if rule.get("source") == "prometheus" and "name" in rule
+    ]
+
+
+class Workloads:
+    """Syntetyczne workloady: namespace -> deploymenty -> pody (zgodne z fake_k8s)"""
+
+    def __init__(self, namespaces: int, deployments: int, pods: int, rng: random.Random):
+        """
+        Args:
+            namespaces: Liczba namespace
+            deployments: Liczba deploymentów w namespace
+            pods: Liczba podów w deploymencie
+            rng: Generator liczb losowych
+        """
+        self.rng = rng
+        self.namespaces = [f"tenant-{i}" for i in range(namespaces)]
+        self.deployments = [f"app-{i}" for i in range(deployments)]
+        self.pods = pods
+
+    def inventory(self) -> Dict[str, List[str]]:
+        """{namespace: [deploymenty]} dla fałszywego API servera"""
+        return {ns: list(self.deployments) for ns in self.namespaces}
+
+    def pick(self, skew: float = 1.2) -> Dict[str, str]:
+        """Losuje pod; rozkład namespace jest skośny (kilku "hałaśliwych" tenantów)"""
+        index = min(int(self.rng.paretovariate(skew)) - 1, len(self.namespaces) - 1)
+        namespace = self.namespaces[index]
+        deployment = self.rng.choice(self.deployments)
+        pod = f"{deployment}-5d8f7-a{self.rng.randrange(self.pods)}"
+        return {"namespace": namespace, "deployment": deployment, "pod": pod}
+
+
+class TrafficGenerator:
+    """Generator zdarzeń Falco i grup alertów Alertmanagera"""
+
+    def __init__(
+        self,
+        workloads: Workloads,
+        rng: random.Random,
+        falco_rules: Optional[List[Dict[str, Any]]] = None,
+        alert_names: Optional[List[str]] = None,
+        container_ids_only: float = 0.0
+    ):
+        """
+        Args:
+            workloads: Syntetyczne workloady
+            rng: Generator liczb losowych
+            falco_rules: Reguły Falco (domyślnie z custom-rules.yaml)
+            alert_names: Nazwy alertów (domyślnie z rules.yaml)
+            container_ids_only: Odsetek zdarzeń Falco bez pól k8s.* (tylko container.id)
+        """
+        self.workloads = workloads
+        self.rng = rng
+        self.container_ids_only = container_ids_only
+        rules = falco_rules or load_falco_rules()
+        self._rules_by_priority: Dict[str, List[Dict[str, Any]]] = {}
+        for rule in rules:
+            self._rules_by_priority.setdefault(rule["priority"], []).append(rule)
+        self._priorities = [p for p in PRIORITY_WEIGHTS if p in self._rules_by_priority]
+        self._weights = [PRIORITY_WEIGHTS[p] for p in self._priorities]
+        self.alert_names = alert_names or load_alert_names()
+        self._sequence = 0
+
+    def falco_event(self) -> Dict[str, Any]:
+        """Jedno zdarzenie Falco w formacie Falcosidekick"""
+        priority = self.rng.choices(self._priorities, self._weights)[0]
+        rule = self.rng.choice(self._rules_by_priority[priority])
+        target = self.workloads.pick()
+        self._sequence += 1
+        cid = container_id(target["namespace"], target["pod"])
+
+        fields: Dict[str, Any] = {
+            "container.id": cid[:12],
+            "container.name": "app",
+            "proc.name": self.rng.choice(("sh", "bash", "curl", "nc")),
+            "user.name": "root"
+        }
+        if self.rng.random() >= self.container_ids_only:
+            fields.update({
+                "k8s.ns.name": target["namespace"],
+                "k8s.pod.name": target["pod"]
+            })
+        return {
+            "output": f"{rule['rule']} (container_id={cid[:12]} seq={self._sequence})",
+            "priority": priority,
+            "rule": rule["rule"],
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "output_fields": fields,
+            "hostname": f"node-{self.rng.randrange(8)}",
+            "tags": list(rule["tags"])
+        }
+
+    def alert(self, status: str = "firing") -> Dict[str, Any]:
+        """Jeden alert Prometheus"""
+        target = self.workloads.pick()
+        name = self.rng.choice(self.alert_names)
+        self._sequence += 1
+        return {
+            "status": status,
+            "labels": {
+                "alertname": name,
+                "severity": self.rng.choice(PROMETHEUS_SEVERITIES),
+                "namespace": target["namespace"],
+                "deployment": target["deployment"],
+                "pod": target["pod"]
+            },
+            "annotations": {"summary": f"{name} on {target['namespace']}/{target['deployment']}"},
+            "startsAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "fingerprint": f"{self._sequence:016x}"
+        }
+
+    def alert_group(self, size: int) -> Dict[str, Any]:
+        """Grupa alertów w formacie webhooka Alertmanagera (10% rozwiązanych)"""
+        alerts = [self.alert("resolved" if self.rng.random() < 0.1 else "firing") for _ in range(size)]
+        return {
+            "version": "4",
+            "groupKey": f"{{}}:{{alertname=\"{alerts[0]['labels']['alertname']}\"}}",
+            "status": "firing",
+            "receiver": "auto-heal",
+            "groupLabels": {"alertname": alerts[0]["labels"]["alertname"]},
+            "commonLabels": {},
+            "commonAnnotations": {},
+            "externalURL": "http://alertmanager:9093",
+            "alerts": alerts
+        }
+
+    def stream(self, events: int, prometheus_share: float, group_size: int, rate: float = 0.0) -> Iterator[Dict[str, Any]]:
+        """
+        Strumień rekordów w formacie nagrania
+
+        Args:
+            events: Liczba rekordów
+            prometheus_share: Odsetek rekordów z Alertmanagera
+            group_size: Maksymalna liczba alertów w grupie
+            rate: Docelowa liczba rekordów na sekundę (0 = bez znaczników czasu)
+        """
+        for i in range(events):
+            t = i / rate if rate else 0.0
+            if self.rng.random() < prometheus_share:
+                payload = self.alert_group(self.rng.randint(1, group_size))
+                yield {"t": t, "source": "prometheus", "payload": payload}
+            else:
+                yield {"t": t, "source": "falco", "payload": self.falco_event()}
+
+
+def write_capture(path: str, records: Iterator[Dict[str, Any]]) -> int:
+    """Zapisuje rekordy do pliku NDJSON i zwraca ich liczbę"""
+    count = 0
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def read_capture(path: str) -> List[Dict[str, Any]]:
+    """Wczytuje nagranie NDJSON (rekordy bez pola "source" traktowane są jako Falco)"""
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "payload" not in record:
+                # Surowe zdarzenie Falco (np. zrzut z Falcosidekick)
+                record = {"t": 0.0, "source": "falco", "payload": record}
+            records.append(record)
+    return records
@@ -0,0 +1,307 @@
+"""
+Kolejka akcji naprawczych - oddziela przyjmowanie zdarzeń od wykonywania akcji.
+Webhook wrzuca akcję do ograniczonej kolejki i od razu odpowiada, a pula
+workerów w tle opróżnia kolejkę i wykonuje akcje przez ActionExecutor.
+
+Akcje są wydawane według priorytetu zdarzenia (CRITICAL przed WARNING), a w
+obrębie jednego priorytetu sprawiedliwie między namespace (ważone kolejkowanie),
+więc zalew zdarzeń z jednego namespace nie blokuje pozostałych.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import metrics
+from rules import PRIORITY_LEVELS, priority_value
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_WORKERS = 16
+DEFAULT_DRAIN_TIMEOUT = 20.0
+DEFAULT_CRITICAL_BUDGET_MS = 500.0
+
+PRIORITY_NAMES = {value: name for name, value in PRIORITY_LEVELS.items()}
+CRITICAL_LANE = PRIORITY_LEVELS["CRITICAL"]
+
+
+class QueueFullError(Exception):
+    """Kolejka jest pełna - klient powinien ponowić żądanie później"""
+
+
+class FairPriorityQueue(asyncio.Queue):
+    """
+    Kolejka asyncio z pasami priorytetów i ważonym kolejkowaniem namespace
+
+    Pas o wyższym priorytecie jest zawsze opróżniany pierwszy. W pasie każda akcja
+    dostaje znacznik wirtualnego czasu zakończenia (start-time fair queuing):
+    max(czas wirtualny pasa, ostatni znacznik namespace) + 1 / waga namespace,
+    a wydawana jest akcja z najmniejszym znacznikiem.
+
+    Elementy dodawane są jako krotki (akcja, future wyniku lub None), a wydawane
+    jako (akcja, future, pas, moment dodania).
+    """
+
+    def __init__(self, maxsize: int = 0, weights: Optional[Dict[str, float]] = None, clock=time.monotonic):
+        """
+        Args:
+            maxsize: Maksymalna liczba oczekujących akcji (łącznie we wszystkich pasach)
+            weights: Wagi namespace (domyślnie 1.0)
+            clock: Źródło czasu dla pomiaru oczekiwania
+        """
+        self.weights = weights or {}
+        self._clock = clock
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self._lanes: Dict[int, List[Tuple[float, int, str, Tuple, float]]] = {}
+        # Per pas: czas wirtualny oraz {namespace: [ostatni znacznik, liczba oczekujących]}
+        self._virtual_time: Dict[int, float] = {}
+        self._flows: Dict[int, Dict[str, List[float]]] = {}
+        self._lane_order: List[int] = []
+        self._sequence = itertools.count()
+        self._size = 0
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def _put(self, item):
+        action = item[0]
+        lane = priority_value(action.get("priority", ""))
+        namespace = action.get("namespace") or ""
+        heap = self._lanes.get(lane)
+        if heap is None:
+            heap = self._lanes[lane] = []
+            self._virtual_time[lane] = 0.0
+            self._flows[lane] = {}
+            self._lane_order = sorted(self._lanes, reverse=True)
+
+        flow = self._flows[lane].get(namespace)
+        if flow is None:
+            flow = self._flows[lane][namespace] = [0.0, 0]
+        tag = max(self._virtual_time[lane], flow[0]) + 1.0 / self.weights.get(namespace, 1.0)
+        flow[0] = tag
+        flow[1] += 1
+        heapq.heappush(heap, (tag, next(self._sequence), namespace, item, self._clock()))
+        self._size += 1
+
+    def _get(self):
+        for lane in self._lane_order:
+            heap = self._lanes[lane]
+            if heap:
+                break
+        tag, _, namespace, (action, waiter), enqueued_at = heapq.heappop(heap)
+        self._virtual_time[lane] = tag
+        flow = self._flows[lane][namespace]
+        flow[1] -= 1
+        if flow[1] == 0:
+            # Wszystkie akcje namespace wydane - jego znacznik nie wyprzedza czasu pasa
+            del self._flows[lane][namespace]
+        self._size -= 1
+        return action, waiter, lane, enqueued_at
+
+    def lane_depths(self) -> Dict[str, int]:
+        """Zwraca liczbę oczekujących akcji w każdym pasie priorytetu"""
+        return {PRIORITY_NAMES.get(lane, str(lane)): len(heap) for lane, heap in self._lanes.items()}
+
+    def namespace_depths(self) -> Dict[str, int]:
+        """Zwraca liczbę oczekujących akcji per namespace (sumarycznie dla wszystkich pasów)"""
+        depths: Dict[str, int] = {}
+        for flows in self._flows.values():
+            for namespace, (_, pending) in flows.items():
+                depths[namespace] = depths.get(namespace, 0) + pending
+        return depths
+
+
+class ActionQueue:
+    """Ograniczona kolejka akcji z pulą workerów w tle"""
+
+    def __init__(
+        self,
+        executor,
+        maxsize: Optional[int] = None,
+        workers: Optional[int] = None,
+        drain_timeout: Optional[float] = None,
+        journal=None,
+        namespace_weights: Optional[Dict[str, float]] = None,
+        critical_budget_ms: Optional[float] = None
+    ):
+        """
+        Args:
+            executor: Wykonawca akcji (ActionExecutor)
+            maxsize: Maksymalna liczba oczekujących akcji
+            workers: Liczba workerów opróżniających kolejkę
+            drain_timeout: Czas na opróżnienie kolejki przy zamykaniu (sekundy)
+            journal: Opcjonalny dziennik akcji (ActionJournal) - oznacza wykonane akcje
+            namespace_weights: Wagi namespace w kolejkowaniu (domyślnie 1.0)
+            critical_budget_ms: Dopuszczalny czas oczekiwania akcji CRITICAL w kolejce
+        """
+        self.executor = executor
+        self.journal = journal
+        self.maxsize = maxsize or int(os.getenv("REMEDIATION_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+        self.workers = workers or int(os.getenv("REMEDIATION_QUEUE_WORKERS", DEFAULT_WORKERS))
+        self.drain_timeout = drain_timeout or float(
+            os.getenv("REMEDIATION_DRAIN_TIMEOUT", DEFAULT_DRAIN_TIMEOUT)
+        )
+        if namespace_weights is None:
+            # np. REMEDIATION_NAMESPACE_WEIGHTS='{"payments": 4, "batch": 0.5}'
+            namespace_weights = {
+                k: float(v) for k, v in json.loads(os.getenv("REMEDIATION_NAMESPACE_WEIGHTS", "{}")).items()
+            }
+        self.namespace_weights = namespace_weights
+        self.critical_budget = (critical_budget_ms if critical_budget_ms is not None else float(
+            os.getenv("REMEDIATION_CRITICAL_BUDGET_MS", DEFAULT_CRITICAL_BUDGET_MS)
+        )) / 1000.0
+        self._queue: Optional[FairPriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._accepting = False
+        self.enqueued = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.budget_exceeded = 0
+        self.max_critical_wait = 0.0
+
+    def start(self):
+        """Uruchamia workery (wywoływane w działającej pętli zdarzeń)"""
+        if self._tasks:
+            return
+        self._queue = FairPriorityQueue(self.maxsize, self.namespace_weights)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"remediation-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._accepting = True
+        logger.info(f"Uruchomiono {self.workers} workerów kolejki akcji (rozmiar {self.maxsize})")
+
+    def submit(self, action: Dict[str, Any], waiter: Optional["asyncio.Future"] = None) -> int:
+        """
+        Dodaje akcję do kolejki bez czekania
+
+        Args:
+            action: Słownik z akcją do wykonania
+            waiter: Opcjonalny Future, który dostanie wynik wykonania akcji
+
+        Returns:
+            Głębokość kolejki po dodaniu akcji
+
+        Raises:
+            QueueFullError: Gdy kolejka jest pełna lub zamykana
+        """
+        if not self._accepting or self._queue is None:
+            self.rejected += 1
+            raise QueueFullError("Action queue is not accepting new actions")
+        try:
+            self._queue.put_nowait((action, waiter))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"Action queue is full ({self.maxsize})")
+        self.enqueued += 1
+        return self._queue.qsize()
+
+    async def execute(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Kolejkuje akcję i czeka na wynik jej wykonania
+
+        Returns:
+            Wynik akcji; przy pełnej kolejce status "rejected"
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        try:
+            self.submit(action, waiter)
+        except QueueFullError as e:
+            return {"status": "rejected", "message": str(e)}
+        return await waiter
+
+    def depth(self) -> int:
+        """Zwraca liczbę oczekujących akcji"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self, worker_id: int):
+        while True:
+            action, waiter, lane, enqueued_at = await self._queue.get()
+            self._observe_wait(lane, time.monotonic() - enqueued_at)
+            result = None
+            failed = False
+            try:
+                result = await self.executor.run(action)
+                self.processed += 1
+                logger.info(f"Wykonano akcję naprawczą: {action['type']} - {result}")
+            except Exception as e:
+                self.failed += 1
+                failed = True
+                result = {"status": "error", "message": str(e)}
+                logger.error(f"Worker {worker_id}: błąd podczas wykonywania akcji: {e}")
+            finally:
+                # Także po wyjątku - inaczej wpis zostaje "pending" i akcja wraca po restarcie;
+                # bez wyniku (anulowanie przy zamykaniu) wpis czeka na odtworzenie
+                if result is not None and self.journal is not None and "event_id" in action:
+                    self.journal.complete(action["event_id"], result, failed=failed)
+                if waiter is not None and not waiter.done():
+                    # Brak wyniku = worker anulowany przy zamykaniu
+                    if result is None:
+                        waiter.cancel()
+                    else:
+                        waiter.set_result(result)
+                self._queue.task_done()
+
+    def _observe_wait(self, lane: int, waited: float):
+        metrics.QUEUE_WAIT.labels(PRIORITY_NAMES.get(lane, str(lane))).observe(waited)
+        if lane < CRITICAL_LANE:
+            return
+        self.max_critical_wait = max(self.max_critical_wait, waited)
+        if waited > self.critical_budget:
+            self.budget_exceeded += 1
+            metrics.CRITICAL_BUDGET_EXCEEDED.inc()
+            logger.warning(
+                f"Akcja CRITICAL czekała w kolejce {waited * 1000:.1f} ms "
+                f"(budżet {self.critical_budget * 1000:.0f} ms)"
+            )
+
+    async def shutdown(self):
+        """Przestaje przyjmować akcje i opróżnia kolejkę w zadanym czasie"""
+        self._accepting = False
+        if self._queue is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.drain_timeout)
+            logger.info("Kolejka akcji opróżniona")
+        except asyncio.TimeoutError:
+            self.dropped = self._queue.qsize()
+            logger.warning(
+                f"Nie opróżniono kolejki w {self.drain_timeout}s - porzucono {self.dropped} akcji"
+            )
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca statystyki kolejki"""
+        return {
+            "depth": self.depth(),
+            "lanes": self._queue.lane_depths() if self._queue is not None else {},
+            "namespaces": self._queue.namespace_depths() if self._queue is not None else {},
+            "maxsize": self.maxsize,
+            "workers": self.workers,
+            "accepting": self._accepting,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "critical_budget_ms": self.critical_budget * 1000.0,
+            "critical_budget_exceeded": self.budget_exceeded,
+            "max_critical_wait_ms": round(self.max_critical_wait * 1000.0, 3)
+        }
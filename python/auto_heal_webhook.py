@@ -2,13 +2,32 @@
 Auto-Heal Webhook - FastAPI webhook do automatycznego naprawiania problemów
 Odbiera alerty z Falco, Prometheus i innych źródeł i wykonuje akcje naprawcze.
 """
+# Pierwszy import - od niego liczony jest czas startu (readiness.PROCESS_STARTED)
+from readiness import WarmUp
 import os
+import asyncio
 import logging
-from typing import Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
-from kubernetes import client, config
-from remediation import RemediationEngine
+import zlib
+from typing import Dict, Any, Optional, List, Union
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
+from pydantic import BaseModel, ConfigDict, ValidationError, model_validator
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from remediation import POD_ACTIONS, RemediationEngine
+from executor import ActionExecutor
+from action_queue import ActionQueue, QueueFullError
+from informer import ClusterCache
+from rules import ACTION_TYPES, RuleReloader
+from journal import ActionJournal, falco_event_key
+from correlation import CorrelationWindow
+from sharding import (
+    FORWARDED_HEADER, PEER_TOKEN_HEADER, PeerRejectedError, PeerUnconfirmedError, PeerUnreachableError,
+    ShardCoordinator
+)
+from ingest import BodyTooLargeError, LineTooLongError, iter_ndjson_lines, parse_line, prefilter
+from shadow import ShadowMode
+from clusters import CLUSTER_HEADER, ClusterRouter, UnknownClusterError
+import kube_client
+import metrics
 
 # Konfiguracja logowania
 logging.basicConfig(
@@ -23,18 +42,49 @@ app = FastAPI(
     description="Webhook do automatycznego naprawiania problemów w Kubernetes",
     version="1.0.0"
 )
+app.add_middleware(metrics.RequestTimingMiddleware)
 
-# Inicjalizacja Kubernetes client
-try:
-    config.load_incluster_config()
-except config.ConfigException:
-    try:
-        config.load_kube_config()
-    except config.ConfigException:
-        logger.warning("Nie można załadować konfiguracji Kubernetes")
-
-# Inicjalizacja silnika naprawczego
+# Inicjalizacja silnika naprawczego - klient Kubernetes powstaje leniwie (przy rozgrzewaniu w tle)
 remediation_engine = RemediationEngine()
+metrics.KUBERNETES_POOL_IN_USE.set_function(lambda: kube_client.pool_stats().get("in_use", 0))
+
+# Opcjonalny cache informerów (pody, ReplicaSety, deploymenty)
+cluster_cache = None
+if ClusterCache.enabled():
+    cluster_cache = ClusterCache(remediation_engine.core_v1, remediation_engine.apps_v1)
+    remediation_engine.cache = cluster_cache
+
+# Wykonawca akcji - wywołania Kubernetes API poza pętlą zdarzeń
+action_executor = ActionExecutor(remediation_engine)
+
+# Opcjonalny trwały dziennik akcji (JOURNAL_PATH) - odtwarzanie po restarcie i idempotencja
+action_journal = ActionJournal.from_env()
+
+# Kolejka akcji - webhook Falco odpowiada od razu, workery wykonują akcje w tle
+action_queue = ActionQueue(action_executor, journal=action_journal)
+
+# Dodatkowe klastry (CLUSTERS_CONFIG) - własne klienty, cache, limity i kolejki tworzone przy pierwszym zdarzeniu
+clusters = ClusterRouter.from_env(remediation_engine, action_executor, action_queue, journal=action_journal)
+metrics.QUEUE_DEPTH.set_function(clusters.depth)
+
+# Przeładowywanie reguł bez restartu procesu (wspólne reguły wszystkich klastrów)
+rule_reloader = RuleReloader(clusters.apply_rules)
+
+# Korelacja akcji Falco i Prometheus per workload (REMEDIATION_CORRELATION_WINDOW > 0)
+correlator = CorrelationWindow(clusters.execute)
+
+# Opcjonalny podział akcji między repliki (SHARDING_ENABLED) - właściciel według Lease
+shard_coordinator = ShardCoordinator.from_env() if ShardCoordinator.enabled() else None
+
+# Opcjonalny tryb cienia (SHADOW_RULES_PATH) - reguły kandydackie oceniane na żywym ruchu bez wykonywania akcji
+shadow_mode = ShadowMode.from_env(remediation_engine) if ShadowMode.enabled() else None
+
+# Rozgrzewanie w tle: połączenie z API, rejestracja Lease, synchronizacja informerów
+warm_up = WarmUp([("kubernetes_api", kube_client.check_connection)])
+if shard_coordinator is not None:
+    warm_up.add_step("sharding", shard_coordinator.start)
+if cluster_cache is not None:
+    warm_up.add_step("cache", lambda: cluster_cache.start() or cluster_cache.wait_for_sync())
 
 # Modele danych
 class FalcoEvent(BaseModel):
@@ -54,82 +104,649 @@ class PrometheusAlert(BaseModel):
     annotations: Dict[str, str]
     startsAt: str
     endsAt: Optional[str] = None
+    fingerprint: Optional[str] = None
+
+class AlertmanagerWebhook(BaseModel):
+    """Model grupy alertów wysyłanej przez Alertmanager"""
+    version: Optional[str] = None
+    groupKey: Optional[str] = None
+    status: str
+    receiver: Optional[str] = None
+    groupLabels: Dict[str, str] = {}
+    commonLabels: Dict[str, str] = {}
+    commonAnnotations: Dict[str, str] = {}
+    externalURL: Optional[str] = None
+    alerts: List[PrometheusAlert]
+
+class RemediationAction(BaseModel):
+    """Akcja naprawcza w postaci budowanej przez RemediationEngine (przekazywana między replikami)"""
+    model_config = ConfigDict(extra="forbid")
+    
+    type: str
+    source: str
+    rule: str
+    priority: str
+    metadata: Dict[str, Any] = {}
+    namespace: str
+    pod_name: Optional[str] = None
+    container_name: Optional[str] = None
+    deployment_name: Optional[str] = None
+    revision: Optional[Union[int, str]] = None
+    event_id: Optional[str] = None
+    cluster: Optional[str] = None
+    
+    @model_validator(mode="after")
+    def check_target(self) -> "RemediationAction":
+        if self.type not in ACTION_TYPES:
+            raise ValueError(f"Unknown action type '{self.type}'")
+        if self.type in POD_ACTIONS and not self.pod_name:
+            raise ValueError(f"Action '{self.type}' requires pod_name")
+        if not (self.deployment_name or self.pod_name):
+            raise ValueError(f"Action '{self.type}' requires deployment_name or pod_name")
+        return self
+
+class ForwardedActions(BaseModel):
+    """Akcje przekazane przez inną replikę (sharding)"""
+    actions: List[RemediationAction]
+    wait: bool = False
 
 class HealthCheck(BaseModel):
     """Model health check"""
     status: str
     message: str
 
+@app.on_event("startup")
+async def startup():
+    """Uruchamia workery kolejki akcji, informery i obserwację reguł"""
+    action_queue.start()
+    clusters.start()
+    if action_journal is not None:
+        action_journal.start()
+        _replay_journal()
+    rule_reloader.start()
+    if shadow_mode is not None:
+        shadow_mode.start()
+    warm_up.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Opróżnia kolejkę akcji i zamyka pulę wątków wykonawcy"""
+    warm_up.stop()
+    if shard_coordinator is not None:
+        # Zwolnienie Lease - pozostałe repliki przejmują klucze tej repliki
+        shard_coordinator.stop()
+    rule_reloader.stop()
+    if shadow_mode is not None:
+        shadow_mode.stop()
+    await correlator.flush()
+    await action_queue.shutdown()
+    await clusters.shutdown()
+    if action_journal is not None:
+        action_journal.close()
+    action_executor.shutdown(wait=False)
+    if cluster_cache is not None:
+        cluster_cache.stop()
+
+def _replay_journal():
+    """Ponownie kolejkuje akcje przyjęte, ale niewykonane przed restartem"""
+    pending = action_journal.pending()
+    replayed = 0
+    for action in pending:
+        try:
+            clusters.queue_for(action).submit(action)
+            replayed += 1
+        except UnknownClusterError as e:
+            logger.warning(f"Pominięto akcję z dziennika: {e}")
+            action_journal.discard(action["event_id"])
+        except QueueFullError:
+            break
+    if pending:
+        logger.info(f"Odtworzono {replayed}/{len(pending)} niewykonanych akcji z dziennika")
+
 @app.get("/health", response_model=HealthCheck)
+@app.get("/health/live", response_model=HealthCheck)
 async def health_check():
-    """Health check endpoint"""
+    """Liveness - proces działa i obsługuje żądania (bez sprawdzania API servera)"""
     return HealthCheck(status="healthy", message="Auto-heal webhook is running")
 
-@app.post("/webhook/falco")
-async def falco_webhook(event: FalcoEvent):
+@app.get("/health/ready")
+async def readiness_check(response: Response):
+    """Readiness - klient Kubernetes połączony, Lease zarejestrowany i cache zsynchronizowany"""
+    state = warm_up.status()
+    if not state["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return state
+
+@app.post("/webhook/falco", status_code=status.HTTP_202_ACCEPTED)
+async def falco_webhook(event: FalcoEvent, request: Request):
     """
     Webhook do odbierania zdarzeń z Falco
+    Akcja trafia do kolejki i jest wykonywana w tle (202 Accepted).
     """
+    metrics.observe_parse(request)
+    metrics.count_event(remediation_engine.rules, "falco", event.rule, event.priority)
     logger.info(f"Otrzymano zdarzenie Falco: {event.rule} - {event.priority}")
     logger.debug(f"Szczegóły zdarzenia: {event.output_fields}")
+    if shadow_mode is not None:
+        shadow_mode.offer("falco", {
+            "rule": event.rule, "priority": event.priority,
+            "output_fields": event.output_fields, "tags": event.tags
+        })
     
     try:
+        cluster = clusters.route(request.headers.get(CLUSTER_HEADER), hostname=event.hostname)
+        if cluster is None:
+            return {"status": "unrouted", "message": "Event comes from an unknown cluster"}
+        
         # Decyzja o akcji naprawczej na podstawie reguły i priorytetu
-        action = remediation_engine.decide_action(
-            source="falco",
-            rule=event.rule,
-            priority=event.priority,
-            metadata=event.output_fields
-        )
+        with metrics.DECIDE_LATENCY.time():
+            action = clusters.tag(clusters.engine_for(cluster).decide_action(
+                source="falco",
+                rule=event.rule,
+                priority=event.priority,
+                metadata=event.output_fields,
+                tags=event.tags
+            ), cluster)
         
         if action:
-            result = remediation_engine.execute_action(action)
-            logger.info(f"Wykonano akcję naprawczą: {action['type']} - {result}")
-            return {"status": "success", "action": action, "result": result}
+            if action_journal is not None or shard_coordinator is not None:
+                action["event_id"] = falco_event_key(event)
+            if shard_coordinator is not None:
+                owner, address = shard_coordinator.owner(action)
+                if owner != shard_coordinator.identity:
+                    forwarded = await _forward(owner, address, [action])
+                    if forwarded["status"] == "taken_over" and forwarded["results"][0]["status"] == "rejected":
+                        raise QueueFullError(forwarded["results"][0]["message"])
+                    if forwarded.get("code") == status.HTTP_503_SERVICE_UNAVAILABLE:
+                        # Pełna kolejka właściciela - nadawca może ponowić
+                        raise QueueFullError(forwarded["message"])
+                    return forwarded
+            outcome = await _accept(action)
+            if outcome["status"] == "duplicate":
+                logger.info(f"Pominięto powtórzone zdarzenie Falco: {event.rule}")
+            else:
+                logger.info(f"Zakolejkowano akcję naprawczą: {action['type']} (kolejka: {outcome['queue_depth']})")
+            return outcome
         else:
             logger.info("Brak akcji naprawczej dla tego zdarzenia")
             return {"status": "no_action", "message": "No remediation action required"}
     
+    except QueueFullError as e:
+        logger.warning(f"Odrzucono zdarzenie Falco: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         logger.error(f"Błąd podczas przetwarzania zdarzenia Falco: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/webhook/prometheus")
-async def prometheus_webhook(alert: PrometheusAlert):
+@app.post("/webhook/falco/bulk", status_code=status.HTTP_202_ACCEPTED)
+async def falco_bulk_webhook(request: Request):
     """
-    Webhook do odbierania alertów z Prometheus Alertmanager
+    Zbiorczy webhook Falco - zdarzenia w formacie NDJSON, jedno na linię
+    (opcjonalnie z Content-Encoding: gzip). Ciało jest przetwarzane strumieniowo;
+    ciało większe po dekompresji niż BULK_MAX_DECOMPRESSED_BYTES daje 413, a za
+    długa linia lub uszkodzony gzip - 400. Żądanie jest przyjmowane w całości albo
+    wcale: akcje trafiają do kolejki (i do innych replik) dopiero po odczytaniu
+    całego ciała, więc ponowienie odrzuconego żądania nie dubluje akcji.
+    """
+    compressed = request.headers.get("content-encoding", "").lower() == "gzip"
+    # Jeden zbiór reguł dla całego żądania (przeładowanie nie zmienia go w trakcie)
+    rule_set = remediation_engine.rules
+    cluster_header = request.headers.get(CLUSTER_HEADER)
+    counts = {
+        "received": 0, "invalid": 0, "filtered": 0, "no_action": 0, "unrouted": 0,
+        "duplicate": 0, "accepted": 0, "rejected": 0, "forwarded": 0, "dropped": 0, "unconfirmed": 0
+    }
+    local: List[Dict[str, Any]] = []
+    journaled = []
+    remote: Dict[str, List[Dict[str, Any]]] = {}
+    addresses: Dict[str, Optional[str]] = {}
+    complete = False
+    
+    try:
+        async for line in iter_ndjson_lines(request.stream(), compressed):
+            counts["received"] += 1
+            raw = parse_line(line)
+            if raw is None:
+                counts["invalid"] += 1
+                continue
+            # Jak na ścieżce pojedynczej: raz na zdarzenie, przed filtrowaniem
+            if isinstance(raw, dict):
+                metrics.count_event(rule_set, "falco", raw.get("rule"), raw.get("priority"))
+                if shadow_mode is not None:
+                    shadow_mode.offer("falco", raw)
+            
+            # Szybka ścieżka - odrzucenie zdarzeń bez pasującej reguły przed walidacją modelu
+            if prefilter(rule_set, "falco", raw) is None:
+                counts["filtered"] += 1
+                continue
+            
+            try:
+                event = FalcoEvent.model_validate(raw)
+            except ValidationError:
+                counts["invalid"] += 1
+                continue
+            
+            cluster = clusters.route(cluster_header, hostname=event.hostname)
+            if cluster is None:
+                counts["unrouted"] += 1
+                continue
+            with metrics.DECIDE_LATENCY.time():
+                action = clusters.tag(clusters.engine_for(cluster).decide_action(
+                    source="falco",
+                    rule=event.rule,
+                    priority=event.priority,
+                    metadata=event.output_fields,
+                    tags=event.tags
+                ), cluster)
+            if not action:
+                counts["no_action"] += 1
+                continue
+            
+            if action_journal is not None or shard_coordinator is not None:
+                action["event_id"] = falco_event_key(event)
+            if shard_coordinator is not None:
+                # Akcje innych replik są przekazywane jednym żądaniem na właściciela
+                owner, address = shard_coordinator.owner(action)
+                if owner != shard_coordinator.identity:
+                    remote.setdefault(owner, []).append(action)
+                    addresses[owner] = address
+                    continue
+            if action_journal is not None:
+                # Zapisy całej paczki trafiają do dziennika wspólnymi transakcjami
+                journaled.append((action, action_journal.append_nowait(action["event_id"], action)))
+                continue
+            local.append(action)
+        complete = True
+    
+    except BodyTooLargeError as e:
+        logger.error(f"Odrzucono żądanie zbiorcze Falco: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except (LineTooLongError, zlib.error) as e:
+        logger.error(f"Niepoprawne ciało żądania zbiorczego Falco: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if not complete:
+            # Żądanie odrzucone w całości - wpisy dziennika z tego żądania są usuwane,
+            # żeby ponowienie nie zostało uznane za duplikat
+            for action, future in journaled:
+                if await asyncio.wrap_future(future):
+                    action_journal.discard(action["event_id"])
+            logger.warning(
+                f"Pominięto {len(local) + len(journaled) + sum(map(len, remote.values()))} "
+                f"akcji z odrzuconego żądania zbiorczego Falco"
+            )
+    
+    for action in local:
+        _submit_bulk(action, counts)
+    for action, future in journaled:
+        if not await asyncio.wrap_future(future):
+            counts["duplicate"] += 1
+        elif not _submit_bulk(action, counts):
+            action_journal.discard(action["event_id"])
+    for owner, actions in remote.items():
+        forwarded = await _forward(owner, addresses[owner], actions)
+        if forwarded["status"] == "taken_over":
+            for result in forwarded["results"]:
+                counts[result["status"]] += 1
+        else:
+            # forwarded, dropped, rejected (błąd HTTP właściciela) lub unconfirmed (brak odpowiedzi)
+            counts[forwarded["status"]] += len(actions)
+    
+    logger.info(f"Przetworzono paczkę zdarzeń Falco: {counts}")
+    return {"status": "accepted", "counts": counts, "queue_depth": clusters.depth()}
+
+async def _accept(action: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Przyjmuje akcję do wykonania na tej replice (dziennik, korelacja, kolejka)
+    
+    Raises:
+        QueueFullError: Gdy kolejka jest pełna
+    """
+    key = action.get("event_id") if action_journal is not None else None
+    if key is not None and not await action_journal.append(key, action):
+        return {"status": "duplicate", "event_id": key}
+    if correlator.enabled:
+        _correlate(action)
+        return {"status": "accepted", "action": action, "queue_depth": clusters.depth()}
+    try:
+        depth = clusters.queue_for(action).submit(action)
+    except QueueFullError:
+        if key is not None:
+            action_journal.discard(key)
+        raise
+    return {"status": "accepted", "action": action, "queue_depth": depth}
+
+async def _accept_all(actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Przyjmuje akcje na tej replice; pełna kolejka i nieznany klaster dają wynik zamiast wyjątku"""
+    results = []
+    for action in actions:
+        try:
+            results.append(await _accept(action))
+        except QueueFullError as e:
+            results.append({"status": "rejected", "message": str(e)})
+        except UnknownClusterError as e:
+            # Replika z inną konfiguracją CLUSTERS_CONFIG
+            results.append({"status": "unrouted", "message": str(e)})
+    return results
+
+async def _run_action(action: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Wykonuje akcję na tej replice i zwraca jej wynik - przez kolejkę klastra,
+    więc akcje alertów też trafiają do pasów priorytetów (CRITICAL przed resztą)
+    """
+    if correlator.enabled:
+        return await correlator.offer(action)
+    return await clusters.execute(action)
+
+async def _forward(
+    owner: str,
+    address: Optional[str],
+    actions: List[Dict[str, Any]],
+    wait: bool = False
+) -> Dict[str, Any]:
     """
-    logger.info(f"Otrzymano alert Prometheus: {alert.labels.get('alertname', 'unknown')}")
+    Przekazuje akcje replice-właścicielowi albo je odrzuca (SHARD_NON_OWNER=drop)
     
+    Gdy nie da się połączyć z właścicielem (np. zakończona replika, której Lease
+    jeszcze nie wygasł), akcje przejmuje ta replika - zdarzenie nie ginie
+    ("taken_over"). Odpowiedź z błędem HTTP to odrzucenie ("rejected"), a brak
+    odpowiedzi po wysłaniu żądania ("unconfirmed") oznacza, że akcje mógł już
+    przyjąć właściciel - wykonanie ich tutaj zdublowałoby je.
+    """
+    if shard_coordinator.non_owner == "drop" or not address:
+        shard_coordinator.dropped += len(actions)
+        logger.info(f"Odrzucono {len(actions)} akcji należących do repliki {owner}")
+        return {"status": "dropped", "owner": owner}
     try:
-        # Decyzja o akcji naprawczej na podstawie alertu
-        action = remediation_engine.decide_action(
-            source="prometheus",
-            rule=alert.labels.get("alertname", ""),
-            priority=alert.labels.get("severity", "warning"),
-            metadata={
-                "labels": alert.labels,
-                "annotations": alert.annotations,
-                "status": alert.status
-            }
+        response = await asyncio.get_running_loop().run_in_executor(
+            None, shard_coordinator.forward, address, actions, wait
         )
-        
-        if action:
-            result = remediation_engine.execute_action(action)
-            logger.info(f"Wykonano akcję naprawczą: {action['type']} - {result}")
-            return {"status": "success", "action": action, "result": result}
+    except PeerUnreachableError as e:
+        shard_coordinator.taken_over += len(actions)
+        logger.error(f"Nie udało się połączyć z repliką {owner}: {e} - wykonanie {len(actions)} akcji lokalnie")
+        if wait:
+            results = list(await asyncio.gather(*(_run_action(action) for action in actions)))
         else:
+            results = await _accept_all(actions)
+        return {"status": "taken_over", "owner": owner, "results": results}
+    except PeerRejectedError as e:
+        shard_coordinator.forward_rejected += len(actions)
+        logger.error(f"Replika {owner} odrzuciła {len(actions)} akcji: {e}")
+        return {"status": "rejected", "owner": owner, "code": e.status, "message": str(e)}
+    except PeerUnconfirmedError as e:
+        shard_coordinator.forward_unconfirmed += len(actions)
+        logger.warning(f"Brak odpowiedzi repliki {owner} na {len(actions)} przekazanych akcji: {e}")
+        return {"status": "unconfirmed", "owner": owner, "message": str(e)}
+    logger.info(f"Przekazano {len(actions)} akcji do repliki {owner}")
+    return {"status": "forwarded", "owner": owner, "response": response}
+
+async def _execute_routed(action: Dict[str, Any]) -> Dict[str, Any]:
+    """Wykonuje akcję lokalnie albo u repliki-właściciela i zwraca wynik"""
+    if shard_coordinator is not None:
+        owner, address = shard_coordinator.owner(action)
+        if owner != shard_coordinator.identity:
+            forwarded = await _forward(owner, address, [action], wait=True)
+            if forwarded["status"] == "taken_over":
+                return forwarded["results"][0]
+            if forwarded["status"] != "forwarded":
+                return forwarded
+            return dict(forwarded["response"]["results"][0], owner=owner)
+    return await _run_action(action)
+
+def _correlate(action: Dict[str, Any]):
+    """Przekazuje akcję Falco do okna korelacji bez czekania na wynik"""
+    future = correlator.offer(action)
+    event_id = action.get("event_id")
+    if action_journal is None or event_id is None:
+        return
+
+    def _journal_outcome(done):
+        if done.cancelled():
+            return
+        result = done.result()
+        # Zwycięską akcję oznacza worker kolejki; tu tylko przegrane i odrzucone
+        if result.get("status") == "superseded":
+            action_journal.complete(event_id, result)
+        elif result.get("status") == "rejected":
+            action_journal.discard(event_id)
+
+    future.add_done_callback(_journal_outcome)
+
+def _submit_bulk(action: Dict[str, Any], counts: Dict[str, int]) -> bool:
+    """Kolejkuje akcję z paczki zbiorczej i aktualizuje liczniki"""
+    if correlator.enabled:
+        _correlate(action)
+        counts["accepted"] += 1
+        return True
+    try:
+        clusters.queue_for(action).submit(action)
+    except QueueFullError:
+        counts["rejected"] += 1
+        return False
+    counts["accepted"] += 1
+    return True
+
+@app.post("/webhook/prometheus")
+async def prometheus_webhook(payload: Union[AlertmanagerWebhook, PrometheusAlert], request: Request):
+    """
+    Webhook do odbierania alertów z Prometheus Alertmanager
+    Przyjmuje pojedynczy alert lub natywną grupę alertów Alertmanagera.
+    """
+    metrics.observe_parse(request)
+    if isinstance(payload, PrometheusAlert):
+        logger.info(f"Otrzymano alert Prometheus: {payload.labels.get('alertname', 'unknown')}")
+        try:
+            outcome = (await _handle_alerts([payload], request.headers.get(CLUSTER_HEADER)))[0]
+        except Exception as e:
+            logger.error(f"Błąd podczas przetwarzania alertu Prometheus: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+        
+        if outcome["status"] == "unrouted":
+            return {"status": "unrouted", "message": "Alert comes from an unknown cluster"}
+        if "action" not in outcome:
             return {"status": "no_action", "message": "No remediation action required"}
+        return {
+            "status": "success" if outcome["status"] == "executed" else outcome["status"],
+            "action": outcome["action"],
+            "result": outcome["result"]
+        }
     
+    logger.info(
+        f"Otrzymano grupę alertów Prometheus: {payload.groupKey} ({len(payload.alerts)} alertów)"
+    )
+    try:
+        outcomes = await _handle_alerts(payload.alerts, request.headers.get(CLUSTER_HEADER))
     except Exception as e:
-        logger.error(f"Błąd podczas przetwarzania alertu Prometheus: {str(e)}")
+        logger.error(f"Błąd podczas przetwarzania grupy alertów Prometheus: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "status": "processed",
+        "group_key": payload.groupKey,
+        "alerts": len(payload.alerts),
+        "actions_executed": sum(1 for o in outcomes if o["status"] == "executed"),
+        "outcomes": outcomes
+    }
+
+async def _handle_alerts(alerts: List[PrometheusAlert], cluster_header: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Decyduje o akcjach dla paczki alertów, łączy akcje na ten sam cel
+    i wykonuje akcje dla różnych celów równolegle.
+    
+    Args:
+        alerts: Alerty w kolejności wejściowej
+        cluster_header: Klaster z nagłówka żądania (inaczej z etykiety alertu)
+    
+    Returns:
+        Wynik dla każdego alertu w kolejności wejściowej
+    """
+    rule_set = remediation_engine.rules
+    for alert in alerts:
+        metrics.count_event(
+            rule_set, "prometheus", alert.labels.get("alertname", ""), alert.labels.get("severity", "warning")
+        )
+        if shadow_mode is not None:
+            shadow_mode.offer("prometheus", {
+                "labels": alert.labels, "annotations": alert.annotations, "status": alert.status
+            })
+    
+    # Alerty rozwiązane nie wymagają naprawy; pozostałe - decyzja silnikiem klastra alertu
+    by_cluster: Dict[Optional[str], List[int]] = {}
+    for i, alert in enumerate(alerts):
+        if alert.status != "resolved":
+            by_cluster.setdefault(clusters.route(cluster_header, labels=alert.labels), []).append(i)
+    unrouted = set(by_cluster.pop(None, ()))
+    
+    decided: List[Any] = []
+    with metrics.DECIDE_LATENCY.time():
+        for cluster, indices in by_cluster.items():
+            actions = clusters.engine_for(cluster).decide_actions(
+                source="prometheus",
+                events=[
+                    (
+                        alerts[i].labels.get("alertname", ""),
+                        alerts[i].labels.get("severity", "warning"),
+                        {
+                            "labels": alerts[i].labels,
+                            "annotations": alerts[i].annotations,
+                            "status": alerts[i].status
+                        }
+                    )
+                    for i in indices
+                ]
+            )
+            decided.extend((i, clusters.tag(action, cluster)) for i, action in zip(indices, actions))
+    
+    # Grupowanie alertów według celu akcji - jedna akcja na deployment/pod
+    groups: Dict[Any, List[int]] = {}
+    unique_actions: Dict[Any, Dict[str, Any]] = {}
+    for i, action in decided:
+        if not action:
+            continue
+        key = remediation_engine.target_key(action)
+        if key not in unique_actions:
+            unique_actions[key] = action
+            groups[key] = []
+        groups[key].append(i)
+    
+    keys = list(unique_actions)
+    results = await asyncio.gather(*(_execute_routed(unique_actions[k]) for k in keys))
+    
+    outcomes: List[Dict[str, Any]] = [
+        {
+            "alertname": alert.labels.get("alertname", "unknown"),
+            "fingerprint": alert.fingerprint,
+            "status": "resolved" if alert.status == "resolved" else (
+                "unrouted" if i in unrouted else "no_action"
+            )
+        }
+        for i, alert in enumerate(alerts)
+    ]
+    for action_id, (key, result) in enumerate(zip(keys, results)):
+        action = unique_actions[key]
+        logger.info(f"Wykonano akcję naprawczą: {action['type']} - {result} ({len(groups[key])} alertów)")
+        for n, i in enumerate(groups[key]):
+            # Wykonana jest tylko akcja zakończona sukcesem; pozostałe statusy (error, suppressed,
+            # rate_limited, circuit_open, superseded...) przechodzą do wyniku alertu bez zmian
+            outcomes[i].update({
+                "status": "collapsed" if n else (
+                    "executed" if result.get("status") == "success" else result.get("status", "error")
+                ),
+                "action_id": action_id,
+                "action": action,
+                "result": result
+            })
+    return outcomes
+
+@app.get("/queue")
+async def queue_stats():
+    """Stan kolejki akcji i wykonawcy"""
+    stats = {
+        "queue": action_queue.stats(),
+        "executor": action_executor.stats(),
+        "kubernetes_client": kube_client.pool_stats()
+    }
+    if cluster_cache is not None:
+        stats["cache"] = cluster_cache.stats()
+    if action_journal is not None:
+        stats["journal"] = action_journal.stats()
+    if correlator.enabled:
+        stats["correlation"] = correlator.stats()
+    if shard_coordinator is not None:
+        stats["sharding"] = shard_coordinator.stats()
+    if clusters.enabled:
+        stats["clusters"] = clusters.stats()
+    return stats
+
+def _require_peer(request: Request):
+    """Uwierzytelnia replikę przekazującą akcje wspólnym sekretem SHARD_PEER_TOKEN"""
+    if not shard_coordinator.authorized(request.headers.get(PEER_TOKEN_HEADER)):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid peer token")
+
+async def internal_actions(payload: ForwardedActions, request: Request, _: None = Depends(_require_peer)):
+    """
+    Akcje przekazane przez inną replikę - wykonywane tutaj bez ponownego
+    sprawdzania właściciela (brak pętli przy chwilowo różnych pierścieniach)
+    """
+    logger.info(
+        f"Otrzymano {len(payload.actions)} akcji od repliki {request.headers.get(FORWARDED_HEADER, 'unknown')}"
+    )
+    actions = [action.model_dump(exclude_none=True) for action in payload.actions]
+    if payload.wait:
+        results = await asyncio.gather(*(_run_action(action) for action in actions))
+        return {"status": "processed", "results": results}
+    return {"status": "accepted", "results": await _accept_all(actions), "queue_depth": clusters.depth()}
+
+if shard_coordinator is not None:
+    # Endpoint istnieje tylko przy shardingu - bez niego nikt nie przekazuje akcji
+    app.add_api_route("/internal/actions", internal_actions, methods=["POST"])
+
+@app.get("/limits")
+async def limits_status():
+    """Stan limitów szybkości i circuit breakera"""
+    limits = {
+        "rate_limits": action_executor.limiter.stats(),
+        "circuit_breaker": action_executor.breaker.stats()
+    }
+    if clusters.enabled:
+        # Limity i circuit breakery dodatkowych klastrów są niezależne od lokalnych
+        limits["clusters"] = {
+            name: {"rate_limits": c["rate_limits"], "circuit_breaker": c["circuit_breaker"]}
+            for name, c in clusters.stats()["clusters"].items()
+        }
+    return limits
+
+@app.get("/rules")
+async def rules_status():
+    """Stan aktywnych reguł naprawczych"""
+    return {"rules": len(remediation_engine.rules), "reload": rule_reloader.status()}
+
+@app.get("/shadow")
+async def shadow_report():
+    """Raport trybu cienia - akcje reguł kandydackich względem aktywnych (bez wykonywania)"""
+    if shadow_mode is None:
+        raise HTTPException(status_code=404, detail="Shadow mode is disabled (SHADOW_RULES_PATH)")
+    return {"report": shadow_mode.evaluator.report(), "buffer": shadow_mode.stats()}
+
+@app.post("/rules/reload")
+async def reload_rules():
+    """Wymusza przeładowanie reguł z pliku"""
+    reloaded = await asyncio.get_running_loop().run_in_executor(None, rule_reloader.reload)
+    if not reloaded:
+        raise HTTPException(status_code=422, detail=rule_reloader.last_error)
+    return {"status": "reloaded", "rules": len(remediation_engine.rules), "reload": rule_reloader.status()}
 
 @app.get("/metrics")
-async def metrics():
+async def prometheus_metrics():
     """Endpoint dla Prometheus metrics"""
-    # TODO: Implementacja metryk
-    return {"metrics": "not_implemented_yet"}
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+# Koniec importu aplikacji - czas raportowany w /health/ready i metryce startu
+warm_up.mark_imported()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,328 @@
+"""
+Wiele klastrów w jednym webhooku.
+
+Klaster lokalny (in-cluster albo KUBECONFIG procesu) obsługują dotychczasowe
+obiekty webhooka. Dodatkowe klastry z pliku CLUSTERS_CONFIG dostają własny
+ApiClient (pula połączeń), silnik, opcjonalny cache informerów, wykonawcę
+(pula wątków, limity szybkości, circuit breaker, cooldown) i kolejkę z
+workerami - wolny lub niedostępny klaster zajmuje tylko swoje zasoby.
+Wszystko to powstaje przy pierwszym zdarzeniu dla klastra.
+
+Format pliku:
+
+    clusters:
+      - name: prod-eu
+        kubeconfig: /etc/autoheal/clusters/prod-eu.yaml
+        context: prod-eu          # opcjonalnie (domyślnie current-context)
+        hosts: ["eu-node-*"]      # hostname zdarzeń Falco (glob)
+        informer: false           # cache informerów dla tego klastra
+
+Klaster zdarzenia: nagłówek X-Autoheal-Cluster, etykieta alertu CLUSTER_LABEL
+(domyślnie "cluster") albo hostname Falco pasujący do `hosts`; bez wskazania -
+klaster lokalny. Zdarzenia nieznanego klastra nie są naprawiane (unrouted).
+"""
+import asyncio
+import fnmatch
+import logging
+import os
+import re
+import threading
+from typing import Dict, Any, List, Optional
+
+import yaml
+
+import kube_client
+import metrics
+from action_queue import ActionQueue
+from executor import ActionExecutor
+from informer import ClusterCache
+from remediation import RemediationEngine
+from rules import RuleSet
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_HEADER = "X-Autoheal-Cluster"
+DEFAULT_LOCAL_NAME = "local"
+DEFAULT_CLUSTER_LABEL = "cluster"
+
+# Maksymalna liczba zapamiętanych przypisań hostname -> klaster
+MAX_HOST_CACHE = 4096
+
+
+class UnknownClusterError(LookupError):
+    """Akcja wskazuje klaster spoza konfiguracji"""
+
+
+def load_clusters_config(path: str) -> List[Dict[str, Any]]:
+    """
+    Wczytuje listę dodatkowych klastrów z pliku YAML
+
+    Raises:
+        ValueError: Gdy konfiguracja jest niepoprawna
+    """
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    specs = config.get("clusters") if isinstance(config, dict) else config
+    if not isinstance(specs, list):
+        raise ValueError(f"{path}: 'clusters' must be a list")
+    names = set()
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict) or not spec.get("name"):
+            raise ValueError(f"{path}: cluster #{i} requires a 'name'")
+        if not spec.get("kubeconfig") and not spec.get("context"):
+            raise ValueError(f"{path}: cluster {spec['name']} requires 'kubeconfig' or 'context'")
+        if spec["name"] in names:
+            raise ValueError(f"{path}: duplicate cluster {spec['name']}")
+        names.add(spec["name"])
+    return specs
+
+
+class RemoteCluster:
+    """Zasoby jednego dodatkowego klastra"""
+
+    def __init__(self, spec: Dict[str, Any], rules: RuleSet, rules_config: Any, journal=None):
+        """
+        Args:
+            spec: Wpis klastra z CLUSTERS_CONFIG
+            rules: Aktywne reguły (współdzielone z klastrem lokalnym)
+            rules_config: Konfiguracja aktywnych reguł
+            journal: Opcjonalny dziennik akcji (wspólny dla wszystkich klastrów)
+        """
+        self.name = spec["name"]
+        self.kubeconfig = spec.get("kubeconfig")
+        self.context = spec.get("context")
+        self._api_client = None
+        self._lock = threading.Lock()
+
+        self.engine = RemediationEngine(api_client=self.api_client, rules_config=rules_config)
+        self.engine.rules = rules
+        self.cache = None
+        if spec.get("informer"):
+            self.cache = ClusterCache(self.engine.core_v1, self.engine.apps_v1)
+            self.engine.cache = self.cache
+        self.executor = ActionExecutor(self.engine)
+        self.queue = ActionQueue(self.executor, journal=journal)
+
+    def api_client(self):
+        """ApiClient klastra - tworzony przy pierwszym wywołaniu API, bez zmiany domyślnej konfiguracji procesu"""
+        if self._api_client is None:
+            with self._lock:
+                if self._api_client is None:
+                    configuration = kube_client.load_configuration(self.kubeconfig, self.context)
+                    self._api_client = kube_client.build_api_client(configuration, make_default=False)
+        return self._api_client
+
+    def start(self):
+        """Uruchamia workery kolejki i informery (w działającej pętli zdarzeń)"""
+        self.queue.start()
+        if self.cache is not None:
+            self.cache.start()
+
+    async def shutdown(self):
+        """Opróżnia kolejkę i zwalnia zasoby klastra"""
+        await self.queue.shutdown()
+        self.executor.shutdown(wait=False)
+        if self.cache is not None:
+            self.cache.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca stan zasobów klastra"""
+        stats = {
+            "queue": self.queue.stats(),
+            "executor": self.executor.stats(),
+            "rate_limits": self.executor.limiter.stats(),
+            "circuit_breaker": self.executor.breaker.stats(),
+            "kubernetes_client": kube_client.pool_stats(self._api_client) if self._api_client else {"pools": 0}
+        }
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+
+class ClusterRouter:
+    """
+    Wybór klastra dla zdarzeń i akcji
+
+    Akcje klastrów dodatkowych niosą pole "cluster"; akcje bez niego należą do
+    klastra lokalnego i trafiają do dotychczasowego silnika, wykonawcy i kolejki.
+    """
+
+    def __init__(
+        self,
+        engine: RemediationEngine,
+        executor: ActionExecutor,
+        queue: ActionQueue,
+        specs: Optional[List[Dict[str, Any]]] = None,
+        journal=None,
+        local_name: Optional[str] = None,
+        label: Optional[str] = None
+    ):
+        """
+        Args:
+            engine: Silnik klastra lokalnego
+            executor: Wykonawca klastra lokalnego
+            queue: Kolejka akcji klastra lokalnego
+            specs: Dodatkowe klastry (wpisy CLUSTERS_CONFIG)
+            journal: Opcjonalny dziennik akcji
+            local_name: Nazwa klastra lokalnego w etykietach i nagłówku
+            label: Etykieta alertu Prometheus wskazująca klaster
+        """
+        self.engine = engine
+        self.executor = executor
+        self.queue = queue
+        self.journal = journal
+        self.local_name = local_name or os.getenv("CLUSTER_NAME", DEFAULT_LOCAL_NAME)
+        self.label = label or os.getenv("CLUSTER_LABEL", DEFAULT_CLUSTER_LABEL)
+        self.specs: Dict[str, Dict[str, Any]] = {spec["name"]: spec for spec in specs or ()}
+        if self.local_name in self.specs:
+            raise ValueError(f"Cluster {self.local_name} is the local cluster (CLUSTER_NAME)")
+        # Wzorce hostname Falco - jedno wyrażenie na klaster, wynik zapamiętywany per hostname
+        self._hosts = [
+            (re.compile("|".join(fnmatch.translate(str(h)) for h in spec["hosts"])).match, name)
+            for name, spec in self.specs.items() if spec.get("hosts")
+        ]
+        self._host_cache: Dict[str, Optional[str]] = {}
+        self._clusters: Dict[str, RemoteCluster] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self.unrouted = 0
+
+    @classmethod
+    def from_env(cls, engine: RemediationEngine, executor: ActionExecutor, queue: ActionQueue, journal=None):
+        """Tworzy router z dodatkowymi klastrami z CLUSTERS_CONFIG (bez pliku - tylko klaster lokalny)"""
+        path = os.getenv("CLUSTERS_CONFIG")
+        specs = load_clusters_config(path) if path else []
+        if specs:
+            logger.info(f"Dodatkowe klastry z {path}: {', '.join(spec['name'] for spec in specs)}")
+        return cls(engine, executor, queue, specs, journal=journal)
+
+    @property
+    def enabled(self) -> bool:
+        """Czy skonfigurowano dodatkowe klastry"""
+        return bool(self.specs)
+
+    def route(
+        self,
+        header: Optional[str] = None,
+        hostname: Optional[str] = None,
+        labels: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """
+        Zwraca klaster zdarzenia (nazwa lokalnego albo dodatkowego) lub None dla nieznanego
+
+        Args:
+            header: Wartość nagłówka X-Autoheal-Cluster
+            hostname: Hostname zdarzenia Falco
+            labels: Etykiety alertu Prometheus
+        """
+        if not self.specs:
+            return self.local_name
+        name = header or (labels.get(self.label) if labels else None)
+        if name is None and hostname:
+            name = self._route_host(hostname)
+        if name is None or name == self.local_name:
+            name = self.local_name
+        elif name not in self.specs:
+            self.unrouted += 1
+            metrics.CLUSTER_EVENTS.labels("unrouted").inc()
+            logger.warning(f"Zdarzenie z nieznanego klastra {name} - pominięto")
+            return None
+        metrics.CLUSTER_EVENTS.labels(name).inc()
+        return name
+
+    def _route_host(self, hostname: str) -> Optional[str]:
+        name = self._host_cache.get(hostname, self._host_cache)
+        if name is self._host_cache:
+            name = next((cluster for match, cluster in self._hosts if match(hostname)), None)
+            if len(self._host_cache) >= MAX_HOST_CACHE:
+                self._host_cache.clear()
+            self._host_cache[hostname] = name
+        return name
+
+    def tag(self, action: Optional[Dict[str, Any]], name: str) -> Optional[Dict[str, Any]]:
+        """Oznacza akcję klastrem dodatkowym (akcje klastra lokalnego pozostają bez zmian)"""
+        if action is not None and name != self.local_name:
+            action["cluster"] = name
+        return action
+
+    def get(self, name: str) -> RemoteCluster:
+        """
+        Zwraca dodatkowy klaster, tworząc jego zasoby przy pierwszym użyciu
+
+        Raises:
+            UnknownClusterError: Gdy klastra nie ma w konfiguracji
+        """
+        cluster = self._clusters.get(name)
+        if cluster is not None:
+            return cluster
+        spec = self.specs.get(name)
+        if spec is None:
+            raise UnknownClusterError(f"Unknown cluster {name}")
+        with self._lock:
+            cluster = self._clusters.get(name)
+            if cluster is None:
+                cluster = RemoteCluster(spec, self.engine.rules, self.engine.action_rules, self.journal)
+                if self._started:
+                    cluster.start()
+                self._clusters[name] = cluster
+                logger.info(f"Utworzono zasoby klastra {name}")
+        return cluster
+
+    def engine_for(self, name: Optional[str]) -> RemediationEngine:
+        """Silnik klastra (decyzje korzystają z jego cache informerów)"""
+        if name is None or name == self.local_name:
+            return self.engine
+        return self.get(name).engine
+
+    def executor_for(self, action: Dict[str, Any]) -> ActionExecutor:
+        """Wykonawca klastra akcji"""
+        name = action.get("cluster")
+        return self.executor if name is None else self.get(name).executor
+
+    def queue_for(self, action: Dict[str, Any]) -> ActionQueue:
+        """Kolejka klastra akcji"""
+        name = action.get("cluster")
+        return self.queue if name is None else self.get(name).queue
+
+    async def execute(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        """Kolejkuje akcję w kolejce jej klastra i czeka na wynik"""
+        try:
+            queue = self.queue_for(action)
+        except UnknownClusterError as e:
+            return {"status": "unrouted", "message": str(e)}
+        return await queue.execute(action)
+
+    def apply_rules(self, rules_config: Any) -> RuleSet:
+        """Kompiluje i aktywuje reguły we wszystkich klastrach (RuleReloader)"""
+        rule_set = self.engine.apply_rules(rules_config)
+        for cluster in list(self._clusters.values()):
+            cluster.engine.action_rules = rules_config
+            cluster.engine.rules = rule_set
+        return rule_set
+
+    def depth(self) -> int:
+        """Łączna liczba akcji oczekujących we wszystkich kolejkach"""
+        return self.queue.depth() + sum(c.queue.depth() for c in list(self._clusters.values()))
+
+    def start(self):
+        """Uruchamia zasoby już utworzonych klastrów; kolejne startują przy utworzeniu"""
+        self._started = True
+        for cluster in list(self._clusters.values()):
+            cluster.start()
+
+    async def shutdown(self):
+        """Opróżnia kolejki i zwalnia zasoby dodatkowych klastrów"""
+        self._started = False
+        clusters = list(self._clusters.values())
+        if clusters:
+            await asyncio.gather(*(cluster.shutdown() for cluster in clusters), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca stan routingu i zasobów dodatkowych klastrów"""
+        return {
+            "local": self.local_name,
+            "label": self.label,
+            "configured": sorted(self.specs),
+            "unrouted": self.unrouted,
+            "clusters": {name: cluster.stats() for name, cluster in list(self._clusters.items())}
+        }
@@ -0,0 +1,104 @@
+"""
+Cache deduplikacji i cooldownu akcji naprawczych.
+Powtórzenia tej samej akcji na tym samym zasobie w oknie cooldownu są tłumione,
+np. wielokrotne usuwanie tego samego poda przy każdym exec w sesji powłoki.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COOLDOWN_SECONDS = 60.0
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class CooldownCache:
+    """Cache TTL o ograniczonym rozmiarze z wypieraniem LRU"""
+
+    def __init__(
+        self,
+        window: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        clock=time.monotonic
+    ):
+        """
+        Args:
+            window: Okno cooldownu w sekundach (0 wyłącza deduplikację)
+            max_entries: Maksymalna liczba śledzonych kluczy
+            clock: Źródło czasu (monotoniczne)
+        """
+        self.window = window if window is not None else float(
+            os.getenv("REMEDIATION_COOLDOWN_SECONDS", DEFAULT_COOLDOWN_SECONDS)
+        )
+        self.max_entries = max_entries or int(
+            os.getenv("REMEDIATION_COOLDOWN_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        )
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+        self.suppressed_by_type: Dict[str, int] = {}
+        self.evicted = 0
+
+    def check_and_mark(self, key: Hashable) -> bool:
+        """
+        Sprawdza czy akcja dla klucza jest w cooldownie; jeśli nie - oznacza ją
+
+        Args:
+            key: Klucz celu akcji (typ akcji, namespace, deployment lub pod)
+
+        Returns:
+            True jeśli akcja powinna zostać stłumiona
+        """
+        if self.window <= 0:
+            return False
+
+        now = self._clock()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is not None and expires_at > now:
+                self._entries.move_to_end(key)
+                self.suppressed += 1
+                action_type = key[0] if isinstance(key, tuple) else str(key)
+                self.suppressed_by_type[action_type] = self.suppressed_by_type.get(action_type, 0) + 1
+                return True
+
+            self._entries[key] = now + self.window
+            self._entries.move_to_end(key)
+            self._purge(now)
+            return False
+
+    def release(self, key: Hashable):
+        """Usuwa klucz z cache (np. po nieudanej akcji, aby można ją było ponowić)"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _purge(self, now: float):
+        # Wygasłe wpisy z początku kolejki LRU
+        while self._entries:
+            oldest_key, expires_at = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[oldest_key]
+        # Limit rozmiaru - wypieranie najdawniej używanych
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca statystyki cache"""
+        return {
+            "window": self.window,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "suppressed": self.suppressed,
+            "suppressed_by_type": dict(self.suppressed_by_type),
+            "evicted": self.evicted
+        }
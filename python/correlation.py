@@ -0,0 +1,216 @@
+"""
+Korelacja zdarzeń z różnych źródeł (Falco, Prometheus) per workload.
+Akcje na ten sam deployment/pod zebrane w krótkim oknie czasowym są łączone
+i wykonywana jest tylko jedna - zwycięska według reguł pierwszeństwa - zamiast
+restartu, skalowania i usunięcia poda konkurujących o ten sam obiekt. Akcje na
+różne pody tego samego workloadu nie konkurują ze sobą - każda konkuruje tylko
+z akcjami na cały workload i na ten sam pod.
+"""
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+
+from remediation import POD_ACTIONS
+from rules import priority_value
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 0.0
+DEFAULT_MAX_KEYS = 10000
+
+# Od najważniejszej: izolacja skompromitowanego poda wygrywa z naprawą dostępności
+DEFAULT_PRECEDENCE = (
+    "delete_pod", "rollback", "restart_deployment",
+    "restart_pod", "scale_down", "scale_up"
+)
+
+
+def workload_key(action: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[str]]:
+    """Klucz workloadu akcji: (namespace, deployment lub pod, klaster)"""
+    return (
+        action.get("namespace", "default"),
+        action.get("deployment_name") or action.get("pod_name"),
+        action.get("cluster")
+    )
+
+
+def pod_target(action: Dict[str, Any]) -> Optional[str]:
+    """Pod, którego dotyczy akcja na poziomie poda (None dla akcji na cały workload)"""
+    if action["type"] in POD_ACTIONS:
+        return action.get("pod_name")
+    return None
+
+
+class _Window:
+    """
+    Otwarte okno jednego workloadu - bieżący zwycięzca per cel
+
+    Cel None to cały workload; wpis dla niego wyklucza wpisy podów (i odwrotnie
+    - zwycięzcy per pod istnieją tylko, gdy wygrali z akcjami na workload).
+    """
+
+    __slots__ = ("winners", "events", "handle")
+
+    def __init__(self, handle):
+        # cel -> (akcja, ranga, future)
+        self.winners: Dict[Optional[str], Tuple[Dict[str, Any], Tuple[int, int], "asyncio.Future"]] = {}
+        self.events = 1
+        self.handle = handle
+
+
+class CorrelationWindow:
+    """
+    Okno korelacji akcji per workload
+
+    Pierwsza akcja dla workloadu otwiera okno o długości `window`; kolejne akcje
+    w oknie są porównywane z bieżącym zwycięzcą (typ akcji według pierwszeństwa,
+    potem priorytet zdarzenia, przy remisie wcześniejsza akcja) i przegrana jest
+    od razu rozstrzygana jako "superseded". Po zamknięciu okna zwycięzca trafia
+    do `dispatch`. Akcje na różne pody (delete_pod, restart_pod) są zwycięzcami
+    niezależnie, o ile żadna akcja na cały workload nie ma wyższej rangi - wtedy
+    wszystkie przegrywają z nią. Pamięć okna rośnie tylko z liczbą podów, a liczba
+    otwartych okien jest ograniczona - po przekroczeniu najstarsze okno jest
+    zamykane przed czasem.
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        window: Optional[float] = None,
+        max_keys: Optional[int] = None,
+        precedence: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            dispatch: Korutyna wykonująca zwycięską akcję i zwracająca jej wynik
+            window: Długość okna w sekundach (0 wyłącza korelację)
+            max_keys: Maksymalna liczba jednocześnie otwartych okien
+            precedence: Typy akcji od najważniejszego
+        """
+        self.dispatch = dispatch
+        self.window = window if window is not None else float(
+            os.getenv("REMEDIATION_CORRELATION_WINDOW", DEFAULT_WINDOW)
+        )
+        self.max_keys = max_keys or int(os.getenv("REMEDIATION_CORRELATION_MAX_KEYS", DEFAULT_MAX_KEYS))
+        if precedence is None:
+            value = os.getenv("REMEDIATION_ACTION_PRECEDENCE")
+            precedence = [p.strip() for p in value.split(",")] if value else list(DEFAULT_PRECEDENCE)
+        self.precedence = {action_type: len(precedence) - i for i, action_type in enumerate(precedence)}
+        self._windows: "OrderedDict[Tuple[str, Optional[str], Optional[str]], _Window]" = OrderedDict()
+        self._tasks = set()
+        self.offered = 0
+        self.superseded = 0
+        self.dispatched = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Czy korelacja jest włączona"""
+        return self.window > 0
+
+    def _rank(self, action: Dict[str, Any]) -> Tuple[int, int]:
+        return (self.precedence.get(action["type"], 0), priority_value(action.get("priority", "")))
+
+    def offer(self, action: Dict[str, Any]) -> "asyncio.Future":
+        """
+        Dodaje akcję do okna jej workloadu
+
+        Returns:
+            Future z wynikiem: wynik wykonania (zwycięzca) albo status "superseded"
+        """
+        self.offered += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = workload_key(action)
+        rank = self._rank(action)
+
+        target = pod_target(action)
+
+        current = self._windows.get(key)
+        if current is None:
+            handle = loop.call_later(self.window, self._close, key)
+            current = self._windows[key] = _Window(handle)
+            current.winners[target] = (action, rank, future)
+            while len(self._windows) > self.max_keys:
+                oldest = next(iter(self._windows))
+                self.evicted += 1
+                self._close(oldest)
+            return future
+
+        current.events += 1
+        winners = current.winners
+        # Akcja na workload konkuruje ze wszystkimi; akcja na pod - z workloadem i tym samym podem
+        if target is None:
+            rivals = list(winners)
+        else:
+            rivals = [t for t in (None, target) if t in winners]
+        strongest = None
+        for rival in rivals:
+            entry = winners[rival]
+            if strongest is None or entry[1] > strongest[1]:
+                strongest = entry
+        if strongest is not None and rank <= strongest[1]:
+            # Przy remisie wygrywa wcześniejsza akcja
+            self._supersede(future, action, strongest[0])
+            return future
+        for rival in rivals:
+            old_action, _, old_future = winners.pop(rival)
+            self._supersede(old_future, old_action, action)
+        winners[target] = (action, rank, future)
+        return future
+
+    def _supersede(self, future: "asyncio.Future", action: Dict[str, Any], winner: Dict[str, Any]):
+        self.superseded += 1
+        # Przy zalewie zdarzeń to najczęstsza ścieżka - komunikat tylko, gdy będzie zapisany
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                f"Akcja {action['type']} ({action.get('rule')}) zastąpiona przez "
+                f"{winner['type']} ({winner.get('rule')}) dla {workload_key(action)}"
+            )
+        if not future.done():
+            future.set_result({"status": "superseded", "winner": winner["type"], "winner_rule": winner.get("rule")})
+
+    def _close(self, key):
+        current = self._windows.pop(key, None)
+        if current is None:
+            return
+        current.handle.cancel()
+        if current.events > 1:
+            logger.info(
+                f"Okno korelacji {key}: {current.events} zdarzeń -> "
+                f"{', '.join(action['type'] for action, _, _ in current.winners.values())}"
+            )
+        for action, _, future in current.winners.values():
+            self.dispatched += 1
+            task = asyncio.ensure_future(self._dispatch(action, future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, action: Dict[str, Any], future: "asyncio.Future"):
+        try:
+            result = await self.dispatch(action)
+        except Exception as e:
+            logger.error(f"Błąd podczas wykonywania skorelowanej akcji {action['type']}: {e}")
+            result = {"status": "error", "message": str(e)}
+        if not future.done():
+            future.set_result(result)
+
+    async def flush(self):
+        """Zamyka wszystkie otwarte okna i czeka na wykonanie zwycięzców (przy zamykaniu)"""
+        for key in list(self._windows):
+            self._close(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca statystyki korelacji"""
+        return {
+            "window": self.window,
+            "open_windows": len(self._windows),
+            "offered": self.offered,
+            "superseded": self.superseded,
+            "dispatched": self.dispatched,
+            "evicted": self.evicted
+        }
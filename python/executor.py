@@ -0,0 +1,165 @@
+"""
+Wykonawca akcji - uruchamia akcje naprawcze poza pętlą zdarzeń asyncio.
+Wywołania klienta Kubernetes są synchroniczne, więc wykonujemy je w ograniczonej
+puli wątków z limitem współbieżności i limitem czasu na akcję.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Dict, Any, Optional
+
+import metrics
+from cooldown import CooldownCache
+from ratelimit import CircuitBreaker, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_ACTION_TIMEOUT = 30.0
+
+
+class ActionExecutor:
+    """Wykonuje akcje silnika naprawczego w ograniczonej puli wątków"""
+
+    def __init__(
+        self,
+        engine,
+        max_concurrency: Optional[int] = None,
+        action_timeout: Optional[float] = None,
+        cooldown: Optional[CooldownCache] = None,
+        limiter: Optional[RateLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        Args:
+            engine: Silnik naprawczy (RemediationEngine)
+            max_concurrency: Maksymalna liczba równolegle wykonywanych akcji
+            action_timeout: Limit czasu pojedynczej akcji w sekundach
+            cooldown: Cache deduplikacji akcji (domyślnie z konfiguracji środowiska)
+            limiter: Limity szybkości akcji (domyślnie z konfiguracji środowiska)
+            breaker: Circuit breaker błędów API (domyślnie z konfiguracji środowiska)
+        """
+        self.engine = engine
+        self.cooldown = cooldown if cooldown is not None else CooldownCache()
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("REMEDIATION_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)
+        )
+        self.action_timeout = action_timeout or float(
+            os.getenv("REMEDIATION_ACTION_TIMEOUT", DEFAULT_ACTION_TIMEOUT)
+        )
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="remediation"
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.timeouts = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semafor musi powstać w działającej pętli zdarzeń
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Wykonuje akcję w puli wątków bez blokowania pętli zdarzeń
+
+        Args:
+            action: Słownik z akcją do wykonania
+
+        Returns:
+            Wynik wykonania akcji
+        """
+        # Deduplikacja - ta sama akcja na tym samym zasobie w oknie cooldownu
+        key = self.engine.target_key(action)
+        if self.cooldown.check_and_mark(key):
+            logger.info(f"Pominięto powtórzoną akcję {action['type']} dla {key[1]}/{key[2]} (cooldown)")
+            metrics.ACTIONS.labels(action["type"], "suppressed").inc()
+            return {
+                "status": "suppressed",
+                "message": f"Action suppressed by cooldown ({self.cooldown.window}s)"
+            }
+
+        result = self._shed(action)
+        if result is None:
+            result = await self._execute(action)
+            self.breaker.record(result)
+        metrics.ACTIONS.labels(action["type"], result.get("status", "unknown")).inc()
+        if result.get("status") in ("error", "rate_limited", "circuit_open"):
+            # Nieudana lub odrzucona akcja nie blokuje ponowienia
+            self.cooldown.release(key)
+        return result
+
+    def _shed(self, action: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Sprawdza circuit breaker i limity szybkości; zwraca wynik odrzucenia lub None"""
+        # Najpierw breaker - akcja odrzucona przy otwartym obwodzie nie zużywa tokenów
+        if not self.breaker.allow():
+            logger.warning(f"Odrzucono akcję {action['type']} - circuit breaker otwarty")
+            return {"status": "circuit_open", "message": "Kubernetes API circuit breaker is open"}
+        scope = self.limiter.acquire(action["type"], action.get("namespace", "default"))
+        if scope is not None:
+            # Akcja próbna half_open nie zostanie wykonana - kolejna może ją zastąpić
+            self.breaker.cancel()
+            logger.warning(
+                f"Odrzucono akcję {action['type']} w namespace {action.get('namespace')} - limit {scope}"
+            )
+            return {"status": "rate_limited", "message": f"Rate limit exceeded ({scope})"}
+        return None
+
+    async def _execute(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+
+        self.in_flight += 1
+        metrics.ACTIONS_IN_FLIGHT.inc()
+        future = loop.run_in_executor(self._pool, self._timed_execute, action)
+        # Slot zwalniamy dopiero gdy wątek faktycznie skończy - także po przekroczeniu limitu czasu
+        future.add_done_callback(lambda _: self._release(semaphore))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.action_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.error(
+                f"Przekroczono limit czasu akcji {action.get('type')} "
+                f"({self.action_timeout}s) w namespace {action.get('namespace')}"
+            )
+            return {
+                "status": "timeout",
+                "message": f"Action timed out after {self.action_timeout}s"
+            }
+
+    def _timed_execute(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        start = perf_counter()
+        try:
+            return self.engine.execute_action(action)
+        finally:
+            metrics.EXECUTE_LATENCY.observe(perf_counter() - start)
+
+    def _release(self, semaphore: asyncio.Semaphore):
+        self.in_flight -= 1
+        metrics.ACTIONS_IN_FLIGHT.dec()
+        self.completed += 1
+        semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca statystyki wykonawcy"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "action_timeout": self.action_timeout,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "cooldown": self.cooldown.stats()
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Zamyka pulę wątków"""
+        self._pool.shutdown(wait=wait)
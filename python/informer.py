@@ -0,0 +1,415 @@
+"""
+Lokalny cache zasobów Kubernetes utrzymywany przez list + watch (informer).
+Pozwala rozwiązywać pod -> deployment przez ownerReferences, czytać
+deploymenty z pamięci zamiast z API servera i wybierać ReplicaSet rewizji
+deploymentu do rollbacku bez listowania.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple, Union
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WATCH_TIMEOUT = 300
+DEFAULT_SYNC_TIMEOUT = 30.0
+DEFAULT_CONTAINER_INDEX_SIZE = 100000
+
+# Falco raportuje skrócony identyfikator kontenera (12 znaków)
+SHORT_CONTAINER_ID_LENGTH = 12
+
+# Adnotacja z numerem rewizji deploymentu na jego ReplicaSetach
+REVISION_ANNOTATION = "deployment.kubernetes.io/revision"
+
+# Handler zdarzeń: (typ zdarzenia, nowy obiekt, poprzedni obiekt)
+EventHandler = Callable[[str, Any, Optional[Any]], None]
+
+
+def object_key(obj) -> Tuple[str, str]:
+    """Klucz obiektu w cache: (namespace, nazwa)"""
+    return (obj.metadata.namespace, obj.metadata.name)
+
+
+def controller_owner(obj) -> Optional[Any]:
+    """Zwraca ownerReference kontrolera obiektu (lub None)"""
+    for owner in obj.metadata.owner_references or []:
+        if owner.controller:
+            return owner
+    return None
+
+
+class ResourceInformer:
+    """Utrzymuje lokalną kopię jednego rodzaju zasobów (list + watch)"""
+
+    def __init__(
+        self,
+        kind: str,
+        list_func: Union[Callable, str],
+        watch_factory: Callable = watch.Watch,
+        watch_timeout: int = DEFAULT_WATCH_TIMEOUT,
+        api=None
+    ):
+        """
+        Args:
+            kind: Nazwa rodzaju zasobu (do logów)
+            list_func: Funkcja listująca z klienta Kubernetes (np. list_pod_for_all_namespaces)
+                albo nazwa tej funkcji w `api`
+            watch_factory: Fabryka obiektów watch (podmieniana w testach na fałszywy strumień)
+            watch_timeout: Czas pojedynczego połączenia watch w sekundach
+            api: Klient grupy API, z którego funkcja listująca jest odczytywana dopiero w wątku informera
+        """
+        self.kind = kind
+        self.list_func = list_func
+        self.api = api
+        self.watch_factory = watch_factory
+        self.watch_timeout = watch_timeout
+        self.store: Dict[Tuple[str, str], Any] = {}
+        self.synced = threading.Event()
+        self._handlers: List[EventHandler] = []
+        self._resource_version: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._watch = None
+
+    def add_handler(self, handler: EventHandler):
+        """Rejestruje handler wywoływany przy każdej zmianie w cache"""
+        self._handlers.append(handler)
+
+    def get(self, namespace: str, name: str) -> Optional[Any]:
+        """Zwraca obiekt z cache (lub None)"""
+        return self.store.get((namespace, name))
+
+    def start(self):
+        """Uruchamia wątek list + watch"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"informer-{self.kind}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Zatrzymuje wątek informera"""
+        self._stop.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                if isinstance(self.list_func, str):
+                    # Odczyt metody z LazyApi tworzy ApiClient (wczytuje kubeconfig) - w wątku informera, nie przy imporcie
+                    self.list_func = getattr(self.api, self.list_func)
+                if self._resource_version is None:
+                    self._list()
+                self._watch_once()
+                backoff = 1.0
+            except ApiException as e:
+                if e.status == 410:
+                    # resourceVersion zbyt stary - pełny relist
+                    logger.info(f"Informer {self.kind}: resourceVersion wygasł, ponowne listowanie")
+                    self._resource_version = None
+                    continue
+                logger.error(f"Informer {self.kind}: błąd Kubernetes API: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            except Exception as e:
+                logger.error(f"Informer {self.kind}: błąd watch: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _list(self):
+        response = self.list_func()
+        fresh = {object_key(obj): obj for obj in response.items}
+
+        # Różnica względem poprzedniego stanu jako zdarzenia dla handlerów
+        for key, old in list(self.store.items()):
+            if key not in fresh:
+                del self.store[key]
+                self._notify("DELETED", old, old)
+        for key, obj in fresh.items():
+            old = self.store.get(key)
+            self.store[key] = obj
+            self._notify("MODIFIED" if old is not None else "ADDED", obj, old)
+
+        self._resource_version = response.metadata.resource_version
+        self.synced.set()
+        logger.info(f"Informer {self.kind}: zsynchronizowano {len(self.store)} obiektów")
+
+    def _watch_once(self):
+        self._watch = self.watch_factory()
+        for event in self._watch.stream(
+            self.list_func,
+            resource_version=self._resource_version,
+            timeout_seconds=self.watch_timeout,
+            allow_watch_bookmarks=True
+        ):
+            if self._stop.is_set():
+                break
+
+            event_type = event["type"]
+            obj = event["object"]
+            if event_type == "ERROR":
+                code = obj.get("code") if isinstance(obj, dict) else None
+                if code == 410:
+                    self._resource_version = None
+                    return
+                logger.warning(f"Informer {self.kind}: zdarzenie ERROR w strumieniu watch: {obj}")
+                continue
+
+            self._resource_version = obj.metadata.resource_version
+            if event_type == "BOOKMARK":
+                continue
+            self._apply(event_type, obj)
+
+    def _apply(self, event_type: str, obj):
+        key = object_key(obj)
+        old = self.store.get(key)
+        if event_type == "DELETED":
+            self.store.pop(key, None)
+        else:
+            self.store[key] = obj
+        self._notify(event_type, obj, old)
+
+    def _notify(self, event_type: str, obj, old):
+        for handler in self._handlers:
+            try:
+                handler(event_type, obj, old)
+            except Exception as e:
+                logger.error(f"Informer {self.kind}: błąd handlera: {e}")
+
+
+def short_container_id(container_id: str) -> str:
+    """Skraca ID kontenera ("containerd://<hex>" lub "<hex>") do postaci używanej przez Falco"""
+    _, _, raw = container_id.rpartition("://")
+    return raw[:SHORT_CONTAINER_ID_LENGTH]
+
+
+def running_container_ids(pod) -> Dict[str, str]:
+    """Zwraca {krótkie ID: nazwa kontenera} dla niezakończonych kontenerów poda"""
+    status = pod.status
+    if status is None:
+        return {}
+    ids = {}
+    for statuses in (
+        status.init_container_statuses,
+        status.container_statuses,
+        status.ephemeral_container_statuses
+    ):
+        for container in statuses or ():
+            if not container.container_id:
+                continue
+            if container.state is not None and container.state.terminated is not None:
+                continue
+            ids[short_container_id(container.container_id)] = container.name
+    return ids
+
+
+class ContainerIndex:
+    """
+    Indeks ID kontenera -> (namespace, pod, kontener) budowany z containerStatuses
+
+    Aktualizowany przyrostowo przez zdarzenia informera podów; zakończone kontenery
+    są usuwane, a rozmiar jest ograniczony (wypieranie LRU).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(
+            os.getenv("CONTAINER_INDEX_MAX_ENTRIES", DEFAULT_CONTAINER_INDEX_SIZE)
+        )
+        self._entries: "OrderedDict[str, Tuple[str, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def on_pod_event(self, event_type: str, pod, old):
+        """Handler zdarzeń informera podów"""
+        namespace, name = object_key(pod)
+        current = {} if event_type == "DELETED" else running_container_ids(pod)
+        previous = running_container_ids(old) if old is not None else {}
+
+        with self._lock:
+            for container_id in previous.keys() - current.keys():
+                entry = self._entries.get(container_id)
+                if entry is not None and entry[:2] == (namespace, name):
+                    del self._entries[container_id]
+            for container_id, container_name in current.items():
+                self._entries[container_id] = (namespace, name, container_name)
+                self._entries.move_to_end(container_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def lookup(self, container_id: str) -> Optional[Tuple[str, str, str]]:
+        """Zwraca (namespace, pod, kontener) dla ID kontenera (pełnego lub skróconego)"""
+        return self._entries.get(short_container_id(container_id))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def replicaset_revision(replicaset) -> Optional[int]:
+    """Numer rewizji ReplicaSetu z adnotacji deployment.kubernetes.io/revision (lub None)"""
+    annotations = replicaset.metadata.annotations or {}
+    try:
+        return int(annotations[REVISION_ANNOTATION])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RevisionIndex:
+    """Indeks (namespace, deployment) -> [(rewizja, ReplicaSet)] posortowany rosnąco, aktualizowany przez informer ReplicaSetów"""
+
+    def __init__(self):
+        self._revisions: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+        self._lock = threading.Lock()
+
+    def on_replicaset_event(self, event_type: str, replicaset, old):
+        """Handler zdarzeń informera ReplicaSetów"""
+        namespace, name = object_key(replicaset)
+        previous = controller_owner(old) if old is not None else None
+        current = None if event_type == "DELETED" else controller_owner(replicaset)
+        revision = replicaset_revision(replicaset) if current is not None else None
+
+        with self._lock:
+            if previous is not None and previous.kind == "Deployment":
+                self._remove((namespace, previous.name), name)
+            if current is not None and current.kind == "Deployment" and revision is not None:
+                entries = self._revisions.setdefault((namespace, current.name), [])
+                bisect.insort(entries, (revision, name))
+
+    def _remove(self, key: Tuple[str, str], name: str):
+        entries = self._revisions.get(key)
+        if entries is None:
+            return
+        entries[:] = [entry for entry in entries if entry[1] != name]
+        if not entries:
+            del self._revisions[key]
+
+    def revisions(self, namespace: str, deployment: str) -> List[Tuple[int, str]]:
+        """Zwraca kopię listy (rewizja, nazwa ReplicaSetu) posortowanej rosnąco"""
+        with self._lock:
+            return list(self._revisions.get((namespace, deployment), ()))
+
+
+class ClusterCache:
+    """Cache podów, ReplicaSetów i Deploymentów z rozwiązywaniem właściciela poda"""
+
+    def __init__(self, core_v1, apps_v1, watch_factory: Callable = watch.Watch):
+        """
+        Args:
+            core_v1: Klient CoreV1Api
+            apps_v1: Klient AppsV1Api
+            watch_factory: Fabryka obiektów watch (podmieniana w testach)
+        """
+        # Funkcje listujące po nazwie - klient API powstaje dopiero przy starcie informerów
+        self.pods = ResourceInformer("pods", "list_pod_for_all_namespaces", watch_factory, api=core_v1)
+        self.replicasets = ResourceInformer(
+            "replicasets", "list_replica_set_for_all_namespaces", watch_factory, api=apps_v1
+        )
+        self.deployments = ResourceInformer(
+            "deployments", "list_deployment_for_all_namespaces", watch_factory, api=apps_v1
+        )
+        self._informers = [self.pods, self.replicasets, self.deployments]
+        self.containers = ContainerIndex()
+        self.pods.add_handler(self.containers.on_pod_event)
+        self.revisions = RevisionIndex()
+        self.replicasets.add_handler(self.revisions.on_replicaset_event)
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """Czy cache informerów jest włączony w konfiguracji"""
+        return os.getenv("INFORMER_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    def start(self):
+        """Uruchamia wszystkie informery"""
+        for informer in self._informers:
+            informer.start()
+
+    def stop(self):
+        """Zatrzymuje wszystkie informery"""
+        for informer in self._informers:
+            informer.stop()
+
+    @property
+    def synced(self) -> bool:
+        """Czy wszystkie informery zakończyły początkowe listowanie"""
+        return all(informer.synced.is_set() for informer in self._informers)
+
+    def wait_for_sync(self, timeout: float = DEFAULT_SYNC_TIMEOUT) -> bool:
+        """Czeka na początkową synchronizację wszystkich informerów"""
+        deadline = time.monotonic() + timeout
+        for informer in self._informers:
+            if not informer.synced.wait(max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+
+    def get_pod(self, namespace: str, name: str):
+        """Zwraca pod z cache (lub None)"""
+        return self.pods.get(namespace, name)
+
+    def get_deployment(self, namespace: str, name: str):
+        """Zwraca deployment z cache (lub None)"""
+        return self.deployments.get(namespace, name)
+
+    def get_replicaset(self, namespace: str, name: str):
+        """Zwraca ReplicaSet z cache (lub None)"""
+        return self.replicasets.get(namespace, name)
+
+    def deployment_revisions(self, namespace: str, deployment: str) -> List[Tuple[int, str]]:
+        """Zwraca [(rewizja, nazwa ReplicaSetu)] deploymentu posortowane rosnąco"""
+        return self.revisions.revisions(namespace, deployment)
+
+    def deployment_for_pod(self, namespace: str, pod_name: str) -> Optional[str]:
+        """
+        Rozwiązuje deployment poda przez ownerReferences: Pod -> ReplicaSet -> Deployment
+
+        Returns:
+            Nazwa deploymentu lub None
+        """
+        pod = self.pods.get(namespace, pod_name)
+        if pod is None:
+            return None
+        owner = controller_owner(pod)
+        if owner is None or owner.kind != "ReplicaSet":
+            return None
+        replicaset = self.replicasets.get(namespace, owner.name)
+        if replicaset is None:
+            return None
+        owner = controller_owner(replicaset)
+        if owner is None or owner.kind != "Deployment":
+            return None
+        return owner.name
+
+    def resolve_container(self, container_id: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Rozwiązuje ID kontenera na cel akcji bez zapytań do API
+
+        Returns:
+            Słownik z namespace, pod_name, container_name i deployment_name lub None
+        """
+        entry = self.containers.lookup(container_id)
+        if entry is None:
+            return None
+        namespace, pod_name, container_name = entry
+        return {
+            "namespace": namespace,
+            "pod_name": pod_name,
+            "container_name": container_name,
+            "deployment_name": self.deployment_for_pod(namespace, pod_name)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca statystyki cache"""
+        return {
+            "synced": self.synced,
+            "pods": len(self.pods.store),
+            "replicasets": len(self.replicasets.store),
+            "deployments": len(self.deployments.store),
+            "containers": len(self.containers),
+            "containers_evicted": self.containers.evicted
+        }
@@ -0,0 +1,140 @@
+"""
+Strumieniowe przyjmowanie zdarzeń Falco w formacie NDJSON (opcjonalnie gzip).
+Ciało żądania jest dekompresowane i dzielone na linie przyrostowo, a zdarzenia,
+które nie pasują do żadnej reguły, są odrzucane przed budową pełnego modelu.
+"""
+import json
+import os
+import zlib
+from typing import Any, AsyncIterator, Dict, Optional
+
+from rules import RuleSet, priority_value
+
+# Maksymalna długość jednej linii NDJSON (ochrona pamięci)
+MAX_LINE_BYTES = 1024 * 1024
+
+# Maksymalny rozmiar ciała po dekompresji (ochrona przed "bombą" gzip)
+DEFAULT_MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# Porcja wyjścia dekompresora - tyle pamięci zajmuje najwyżej jeden krok
+DECOMPRESS_CHUNK_BYTES = 64 * 1024
+
+
+class LineTooLongError(ValueError):
+    """Linia NDJSON przekracza dopuszczalną długość"""
+
+
+class BodyTooLargeError(ValueError):
+    """Ciało żądania po dekompresji przekracza dopuszczalny rozmiar"""
+
+
+def max_body_bytes() -> int:
+    """Limit rozmiaru ciała po dekompresji z BULK_MAX_DECOMPRESSED_BYTES"""
+    return int(os.getenv("BULK_MAX_DECOMPRESSED_BYTES", DEFAULT_MAX_BODY_BYTES))
+
+
+def _decompressed(decompressor, chunk: bytes):
+    """Dekompresuje fragment porcjami po DECOMPRESS_CHUNK_BYTES (przez unconsumed_tail)"""
+    while chunk:
+        output = decompressor.decompress(chunk, DECOMPRESS_CHUNK_BYTES)
+        chunk = decompressor.unconsumed_tail
+        if output:
+            yield output
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    compressed: bool = False,
+    max_line_bytes: int = MAX_LINE_BYTES,
+    max_body: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Dzieli strumień bajtów na linie NDJSON bez buforowania całego ciała
+
+    Pamięć jest ograniczona niezależnie od stopnia kompresji: dekompresor
+    oddaje najwyżej DECOMPRESS_CHUNK_BYTES na krok, a niedokończona linia
+    nie może przekroczyć max_line_bytes.
+
+    Args:
+        chunks: Strumień fragmentów ciała żądania
+        compressed: Czy strumień jest skompresowany gzip
+        max_line_bytes: Maksymalna długość jednej linii
+        max_body: Maksymalny rozmiar ciała po dekompresji (domyślnie max_body_bytes())
+
+    Yields:
+        Niepuste linie (bez znaku nowej linii)
+
+    Raises:
+        LineTooLongError: Linia dłuższa niż max_line_bytes
+        BodyTooLargeError: Ciało po dekompresji większe niż max_body
+    """
+    limit = max_body if max_body is not None else max_body_bytes()
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+    pending = b""
+    total = 0
+    async for chunk in chunks:
+        parts = _decompressed(decompressor, chunk) if decompressor is not None else (chunk,)
+        for part in parts:
+            total += len(part)
+            if total > limit:
+                raise BodyTooLargeError(f"Request body exceeds {limit} bytes")
+            if b"\n" not in part:
+                # Bez końca linii - tylko sprawdzenie limitu przed doklejeniem
+                if len(pending) + len(part) > max_line_bytes:
+                    raise LineTooLongError(f"NDJSON line exceeds {max_line_bytes} bytes")
+                pending += part
+                continue
+            lines = (pending + part).split(b"\n")
+            pending = lines.pop()
+            if len(pending) > max_line_bytes:
+                raise LineTooLongError(f"NDJSON line exceeds {max_line_bytes} bytes")
+            for line in lines:
+                if len(line) > max_line_bytes:
+                    raise LineTooLongError(f"NDJSON line exceeds {max_line_bytes} bytes")
+                if line.strip():
+                    yield line
+
+    if decompressor is not None:
+        tail = decompressor.flush()
+        total += len(tail)
+        if total > limit:
+            raise BodyTooLargeError(f"Request body exceeds {limit} bytes")
+        pending += tail
+    for line in pending.split(b"\n"):
+        if len(line) > max_line_bytes:
+            raise LineTooLongError(f"NDJSON line exceeds {max_line_bytes} bytes")
+        if line.strip():
+            yield line
+
+
+def prefilter(rule_set: RuleSet, source: str, event: Any) -> Optional[Dict[str, Any]]:
+    """
+    Szybka ścieżka: sprawdza tylko pola potrzebne do decyzji
+
+    Zdarzenie przechodzi dalej, jeśli jego reguła ma kandydatów w RuleSet, a priorytet
+    spełnia najniższy próg spośród nich. Selektory są sprawdzane później w decide_action.
+
+    Returns:
+        Zdarzenie (słownik) albo None, jeśli nie może wywołać żadnej akcji
+    """
+    if not isinstance(event, dict):
+        return None
+    rule = event.get("rule")
+    priority = event.get("priority")
+    if not isinstance(rule, str) or not isinstance(priority, str):
+        return None
+
+    candidates = rule_set.candidates(source, rule)
+    if not candidates:
+        return None
+    if priority_value(priority) < min(candidate.threshold for candidate in candidates):
+        return None
+    return event
+
+
+def parse_line(line: bytes) -> Any:
+    """Parsuje jedną linię NDJSON (None przy błędzie składni)"""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
@@ -0,0 +1,232 @@
+"""
+Trwały dziennik akcji naprawczych (SQLite w trybie WAL).
+Akcja jest zapisywana przed odpowiedzią 202 i oznaczana jako wykonana po
+zakończeniu, więc po restarcie niewykonane akcje są odtwarzane, a ponowienia
+tego samego zdarzenia (klucz idempotencji) nie wykonują akcji drugi raz.
+Zapisy są grupowane w jedną transakcję (group commit), żeby fsync nie
+ograniczał przepustowości.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_MAX_DELAY_MS = 2.0
+DEFAULT_RETENTION_SECONDS = 3600.0
+
+PENDING = "pending"
+DONE = "done"
+# Akcja zakończona błędem - nie jest odtwarzana po restarcie (jak DONE)
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS actions (
+    event_id TEXT PRIMARY KEY,
+    action TEXT NOT NULL,
+    state TEXT NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def falco_event_key(event) -> str:
+    """Klucz idempotencji zdarzenia Falco - ponowienia Falcosidekick mają ten sam klucz"""
+    payload = json.dumps(
+        [event.rule, event.time, event.hostname, event.output],
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ActionJournal:
+    """Dziennik akcji typu append-only z grupowym zatwierdzaniem zapisów"""
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: Optional[int] = None,
+        max_delay_ms: Optional[float] = None,
+        retention_seconds: Optional[float] = None
+    ):
+        """
+        Args:
+            path: Ścieżka pliku bazy SQLite
+            batch_size: Maksymalna liczba operacji w jednej transakcji (jednym fsync)
+            max_delay_ms: Maksymalny czas zbierania paczki w milisekundach
+            retention_seconds: Czas przechowywania wykonanych akcji (okno idempotencji)
+        """
+        self.path = path
+        self.batch_size = batch_size or int(os.getenv("JOURNAL_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.max_delay = (max_delay_ms if max_delay_ms is not None else float(
+            os.getenv("JOURNAL_MAX_DELAY_MS", DEFAULT_MAX_DELAY_MS)
+        )) / 1000.0
+        self.retention = retention_seconds or float(
+            os.getenv("JOURNAL_RETENTION_SECONDS", DEFAULT_RETENTION_SECONDS)
+        )
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: każdy commit kończy się fsync pliku WAL
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS actions_state ON actions (state)")
+
+        self._ops: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._last_prune = 0.0
+        self.commits = 0
+        self.appended = 0
+        self.duplicates = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ActionJournal"]:
+        """Tworzy dziennik, jeśli ustawiono JOURNAL_PATH"""
+        path = os.getenv("JOURNAL_PATH")
+        return cls(path) if path else None
+
+    def start(self):
+        """Uruchamia wątek zapisujący"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="action-journal", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Zatwierdza oczekujące zapisy i zamyka bazę"""
+        if self._thread is not None:
+            self._ops.put(None)
+            self._thread.join()
+            self._thread = None
+        self._conn.close()
+
+    def append_nowait(self, event_id: str, action: Dict[str, Any]) -> Future:
+        """
+        Zleca zapis akcji; Future zwraca True po zatwierdzeniu lub False dla duplikatu
+        """
+        future: Future = Future()
+        self._ops.put(("append", event_id, json.dumps(action, default=str), future))
+        return future
+
+    async def append(self, event_id: str, action: Dict[str, Any]) -> bool:
+        """
+        Zapisuje akcję i czeka na fsync
+
+        Returns:
+            True jeśli zapisano nową akcję, False jeśli zdarzenie było już w dzienniku
+        """
+        return await asyncio.wrap_future(self.append_nowait(event_id, action))
+
+    def complete(self, event_id: str, result: Dict[str, Any], failed: bool = False):
+        """Oznacza akcję jako wykonaną lub nieudaną (bez czekania na zapis)"""
+        self._ops.put(("fail" if failed else "complete", event_id, json.dumps(result, default=str), None))
+
+    def discard(self, event_id: str):
+        """Usuwa akcję, która nie została przyjęta (np. pełna kolejka)"""
+        self._ops.put(("discard", event_id, None, None))
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Zwraca niewykonane akcje w kolejności przyjęcia (odtwarzanie po restarcie)"""
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT action FROM actions WHERE state = ? ORDER BY created_at", (PENDING,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(row[0]) for row in rows]
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            op = self._ops.get()
+            if op is None:
+                break
+            batch = [op]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    op = self._ops.get(timeout=timeout) if timeout > 0 else self._ops.get_nowait()
+                except queue.Empty:
+                    break
+                if op is None:
+                    stopping = True
+                    break
+                batch.append(op)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        now = time.time()
+        outcomes = []
+        try:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN")
+            for kind, event_id, payload, future in batch:
+                if kind == "append":
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO actions (event_id, action, state, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (event_id, payload, PENDING, now, now)
+                    )
+                    outcomes.append((future, cursor.rowcount == 1))
+                elif kind in ("complete", "fail"):
+                    cursor.execute(
+                        "UPDATE actions SET state = ?, result = ?, updated_at = ? WHERE event_id = ?",
+                        (DONE if kind == "complete" else FAILED, payload, now, event_id)
+                    )
+                    if kind == "fail":
+                        self.failed += 1
+                elif kind == "discard":
+                    cursor.execute("DELETE FROM actions WHERE event_id = ?", (event_id,))
+            if now - self._last_prune > 60:
+                cursor.execute(
+                    "DELETE FROM actions WHERE state != ? AND updated_at < ?",
+                    (PENDING, now - self.retention)
+                )
+                self._last_prune = now
+            cursor.execute("COMMIT")
+            self.commits += 1
+        except Exception as e:
+            logger.error(f"Błąd zapisu dziennika akcji: {e}")
+            try:
+                self._conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for _, _, _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, inserted in outcomes:
+            if inserted:
+                self.appended += 1
+            else:
+                self.duplicates += 1
+            if not future.done():
+                future.set_result(inserted)
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca statystyki dziennika"""
+        return {
+            "path": self.path,
+            "batch_size": self.batch_size,
+            "max_delay_ms": self.max_delay * 1000.0,
+            "commits": self.commits,
+            "appended": self.appended,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "backlog": self._ops.qsize()
+        }
@@ -0,0 +1,216 @@
+"""
+Współdzielony klient Kubernetes API.
+
+Wszystkie API (CoreV1, AppsV1, BatchV1, CoordinationV1) korzystają z jednego
+ApiClient, czyli z jednej puli połączeń urllib3 z keep-alive. Rozmiar puli,
+limity czasu żądań i ponawianie przy 429/5xx (wykładniczy backoff z jitterem,
+z poszanowaniem nagłówka Retry-After) są konfigurowane w jednym miejscu.
+
+Klient powstaje leniwie - przy pierwszym wywołaniu API albo podczas rozgrzewania
+w tle (readiness) - więc import webhooka nie wczytuje konfiguracji klastra.
+"""
+import logging
+import os
+import random
+import threading
+from typing import Dict, Any, Optional
+
+from kubernetes import client, config
+from urllib3.util.retry import Retry
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Pula powinna pomieścić REMEDIATION_MAX_CONCURRENCY akcji oraz długie połączenia watch informerów
+DEFAULT_POOL_SIZE = 32
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 15.0
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.2
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Metody ponawiane po 429/5xx i błędzie odczytu. POST, PATCH i DELETE mogły już
+# zostać wykonane (np. restart z nową adnotacją, usunięcie poda, któremu kontroler
+# nadał już następcę o tej samej nazwie) - urllib3 ponawia je tylko przy błędzie
+# połączenia, gdy żądanie na pewno nie dotarło do API servera
+RETRY_METHODS = frozenset({"GET", "HEAD", "PUT"})
+
+_lock = threading.Lock()
+_shared: Optional["TunedApiClient"] = None
+
+
+class JitteredRetry(Retry):
+    """Retry z pełnym jitterem backoffu i licznikiem ponowień w metrykach"""
+
+    def get_backoff_time(self) -> float:
+        # Rozrzucenie ponowień wielu wątków po tym samym 429/503
+        return random.uniform(0, super().get_backoff_time())
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None and response.status:
+            reason = str(response.status)
+        else:
+            reason = type(error).__name__ if error is not None else "unknown"
+        metrics.KUBERNETES_API_RETRIES.labels(reason).inc()
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class TunedApiClient(client.ApiClient):
+    """ApiClient z domyślnym limitem czasu dla zwykłych żądań (bez strumieni watch)"""
+
+    def __init__(self, configuration: client.Configuration, request_timeout=None):
+        """
+        Args:
+            configuration: Konfiguracja klienta (pula, ponawianie)
+            request_timeout: Domyślny limit czasu (connect, read) w sekundach
+        """
+        super().__init__(configuration)
+        self.request_timeout = request_timeout
+
+    def request(self, method, url, query_params=None, headers=None,
+                post_params=None, body=None, _preload_content=True,
+                _request_timeout=None):
+        # Watch (_preload_content=False) trzyma połączenie dłużej niż read timeout
+        if _request_timeout is None and _preload_content:
+            _request_timeout = self.request_timeout
+        return super().request(
+            method, url, query_params=query_params, headers=headers,
+            post_params=post_params, body=body, _preload_content=_preload_content,
+            _request_timeout=_request_timeout
+        )
+
+
+def load_configuration(config_file: Optional[str] = None, context: Optional[str] = None) -> client.Configuration:
+    """
+    Wczytuje konfigurację in-cluster albo z kubeconfig
+
+    Args:
+        config_file: Plik kubeconfig innego klastra (pomija konfigurację in-cluster)
+        context: Kontekst w kubeconfig (domyślnie current-context)
+    """
+    configuration = client.Configuration()
+    if config_file or context:
+        config.load_kube_config(config_file=config_file, context=context, client_configuration=configuration)
+        return configuration
+    try:
+        config.load_incluster_config(client_configuration=configuration)
+    except config.ConfigException:
+        try:
+            config.load_kube_config(client_configuration=configuration)
+        except config.ConfigException:
+            logger.warning("Nie można załadować konfiguracji Kubernetes")
+    return configuration
+
+
+def build_api_client(
+    configuration: Optional[client.Configuration] = None,
+    make_default: bool = True
+) -> TunedApiClient:
+    """
+    Tworzy ApiClient z pulą połączeń, limitami czasu i ponawianiem z konfiguracji środowiska
+
+    Args:
+        configuration: Konfiguracja bazowa (domyślnie in-cluster lub kubeconfig)
+        make_default: Czy konfiguracja staje się domyślną dla klientów bez jawnego ApiClient
+            (False dla klientów innych klastrów)
+    """
+    configuration = configuration or load_configuration()
+    configuration.connection_pool_maxsize = int(os.getenv("KUBE_POOL_SIZE", DEFAULT_POOL_SIZE))
+    retries = int(os.getenv("KUBE_RETRIES", DEFAULT_RETRIES))
+    configuration.retries = JitteredRetry(
+        total=retries,
+        backoff_factor=float(os.getenv("KUBE_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF)),
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        # Po wyczerpaniu ponowień zwracamy ostatnią odpowiedź - ApiException niesie kod błędu
+        raise_on_status=False
+    )
+    timeout = (
+        float(os.getenv("KUBE_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+        float(os.getenv("KUBE_READ_TIMEOUT", DEFAULT_READ_TIMEOUT))
+    )
+    if make_default:
+        # Klienci tworzeni bez jawnego ApiClient dostają tę samą konfigurację
+        client.Configuration.set_default(configuration)
+    logger.info(
+        f"Klient Kubernetes {configuration.host}: pula {configuration.connection_pool_maxsize} połączeń, "
+        f"limit czasu {timeout[0]}/{timeout[1]}s, {retries} ponowień"
+    )
+    return TunedApiClient(configuration, request_timeout=timeout)
+
+
+def shared_api_client() -> TunedApiClient:
+    """Zwraca współdzielony ApiClient procesu (tworzony przy pierwszym użyciu)"""
+    global _shared
+    with _lock:
+        if _shared is None:
+            _shared = build_api_client()
+        return _shared
+
+
+class LazyApi:
+    """Klient grupy API (np. CoreV1Api) tworzony przy pierwszym użyciu"""
+
+    def __init__(self, api_class, api_client=None):
+        """
+        Args:
+            api_class: Klasa klienta grupy API z kubernetes.client
+            api_client: ApiClient albo funkcja zwracająca ApiClient przy pierwszym użyciu
+                (domyślnie współdzielony klient procesu)
+        """
+        self._api_class = api_class
+        self._api_client = api_client
+        self._api = None
+        self._api_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def resolve(self):
+        """Zwraca klienta grupy API, tworząc go (i współdzielony ApiClient) przy pierwszym wywołaniu"""
+        if self._api is None:
+            with self._api_lock:
+                if self._api is None:
+                    api_client = self._api_client
+                    if api_client is None:
+                        api_client = shared_api_client()
+                    elif callable(api_client):
+                        api_client = api_client()
+                    self._api = self._api_class(api_client)
+        return self._api
+
+
+def check_connection(api_client: Optional[client.ApiClient] = None) -> str:
+    """Sprawdza połączenie z API serverem (GET /version) i zwraca jego wersję"""
+    version = client.VersionApi(api_client or shared_api_client()).get_code()
+    return version.git_version
+
+
+def pool_stats(api_client: Optional[client.ApiClient] = None) -> Dict[str, Any]:
+    """
+    Zwraca statystyki puli połączeń urllib3
+
+    in_use to połączenia wypożyczone w tej chwili; created większe niż maxsize
+    oznacza, że pula była za mała (nadmiarowe połączenia są zamykane po użyciu).
+    """
+    api_client = api_client or _shared
+    if api_client is None:
+        return {"pools": 0}
+
+    manager = api_client.rest_client.pool_manager
+    stats = {"pools": 0, "maxsize": api_client.configuration.connection_pool_maxsize,
+             "created": 0, "requests": 0, "in_use": 0}
+    for key in list(manager.pools.keys()):
+        pool = manager.pools.get(key)
+        if pool is None:
+            continue
+        stats["pools"] += 1
+        stats["created"] += pool.num_connections
+        stats["requests"] += pool.num_requests
+        # Kolejka puli zawiera wolne sloty (także puste), więc zajęte = maxsize - qsize
+        stats["in_use"] += pool.pool.maxsize - pool.pool.qsize() if pool.pool is not None else 0
+    return stats
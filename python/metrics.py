@@ -0,0 +1,174 @@
+"""
+Metryki Prometheus webhooka auto-heal.
+Obiekty z etykietami stałymi są wiązane raz przy imporcie, żeby pomiar
+na ścieżce żądania sprowadzał się do jednego observe()/inc().
+"""
+import functools
+from time import perf_counter
+from typing import Any
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Kubernetes API i etapy przetwarzania trwają od ułamków milisekund do sekund
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+EVENTS_RECEIVED = Counter(
+    "autoheal_events_received_total",
+    "Liczba odebranych zdarzeń",
+    ["source", "rule", "priority"]
+)
+
+# Priorytety Falco i poziomy severity Alertmanagera; pozostałe wartości to "other"
+KNOWN_PRIORITIES = frozenset({
+    "emergency", "alert", "critical", "error", "warning", "notice",
+    "informational", "info", "debug", "none"
+})
+
+ACTIONS = Counter(
+    "autoheal_actions_total",
+    "Liczba akcji naprawczych według typu i wyniku",
+    ["type", "outcome"]
+)
+
+STAGE_LATENCY = Histogram(
+    "autoheal_stage_duration_seconds",
+    "Czas trwania etapów przetwarzania zdarzenia",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+KUBERNETES_API_LATENCY = Histogram(
+    "autoheal_kubernetes_api_duration_seconds",
+    "Czas trwania wywołań Kubernetes API",
+    ["call"],
+    buckets=LATENCY_BUCKETS
+)
+
+KUBERNETES_API_ERRORS = Counter(
+    "autoheal_kubernetes_api_errors_total",
+    "Liczba błędów wywołań Kubernetes API",
+    ["call", "code"]
+)
+
+KUBERNETES_API_RETRIES = Counter(
+    "autoheal_kubernetes_api_retries_total",
+    "Liczba ponowień żądań Kubernetes API według przyczyny (kod HTTP lub błąd połączenia)",
+    ["reason"]
+)
+
+KUBERNETES_POOL_IN_USE = Gauge(
+    "autoheal_kubernetes_pool_connections_in_use",
+    "Liczba połączeń puli klienta Kubernetes wypożyczonych w tej chwili"
+)
+
+ACTIONS_IN_FLIGHT = Gauge(
+    "autoheal_actions_in_flight",
+    "Liczba aktualnie wykonywanych akcji naprawczych"
+)
+
+QUEUE_DEPTH = Gauge(
+    "autoheal_queue_depth",
+    "Liczba akcji oczekujących w kolejce"
+)
+
+QUEUE_WAIT = Histogram(
+    "autoheal_queue_wait_seconds",
+    "Czas oczekiwania akcji w kolejce według priorytetu",
+    ["priority"],
+    buckets=LATENCY_BUCKETS
+)
+
+CRITICAL_BUDGET_EXCEEDED = Counter(
+    "autoheal_critical_budget_exceeded_total",
+    "Liczba akcji CRITICAL, które czekały w kolejce dłużej niż budżet opóźnienia"
+)
+
+STARTUP_DURATION = Gauge(
+    "autoheal_startup_duration_seconds",
+    "Czas od startu procesu do zakończenia importu aplikacji (import) i do gotowości (ready)",
+    ["phase"]
+)
+
+CLUSTER_EVENTS = Counter(
+    "autoheal_cluster_events_total",
+    "Liczba zdarzeń według klastra docelowego (unrouted - nieznany klaster)",
+    ["cluster"]
+)
+
+PARSE_LATENCY = STAGE_LATENCY.labels("parse")
+DECIDE_LATENCY = STAGE_LATENCY.labels("decide_action")
+EXECUTE_LATENCY = STAGE_LATENCY.labels("execute_action")
+
+
+class RequestTimingMiddleware:
+    """
+    Middleware ASGI zapisujący moment otrzymania żądania w request.state,
+    aby handler mógł zmierzyć czas odczytu i walidacji ciała (etap parse)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["received_at"] = perf_counter()
+        await self.app(scope, receive, send)
+
+
+def observe_parse(request):
+    """Rejestruje czas od otrzymania żądania do wejścia do handlera"""
+    received_at = getattr(request.state, "received_at", None)
+    if received_at is not None:
+        PARSE_LATENCY.observe(perf_counter() - received_at)
+
+
+class InstrumentedApi:
+    """Proxy klienta Kubernetes mierzący czas i błędy każdego wywołania API"""
+
+    def __init__(self, api):
+        self._api = api
+
+    def __getattr__(self, name):
+        attr = getattr(self._api, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        latency = KUBERNETES_API_LATENCY.labels(name)
+
+        # functools.wraps zachowuje docstring - kubernetes.watch odczytuje z niego typ zwracany
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            except Exception as e:
+                KUBERNETES_API_ERRORS.labels(name, str(getattr(e, "status", None) or "unknown")).inc()
+                raise
+            finally:
+                latency.observe(perf_counter() - start)
+
+        # Kolejne odwołania trafiają już w słownik instancji, bez __getattr__
+        setattr(self, name, call)
+        return call
+
+
+def priority_label(priority: Any) -> str:
+    """Priorytet jako etykieta metryk: znany poziom małymi literami albo other"""
+    if isinstance(priority, str):
+        value = priority.lower()
+        if value in KNOWN_PRIORITIES:
+            return value
+    return "other"
+
+
+def count_event(rule_set, source: str, rule: Any, priority: Any):
+    """
+    Zlicza odebrane zdarzenie (raz na zdarzenie, na każdej ścieżce wejścia)
+
+    Etykiety są ograniczone: reguła przez RuleSet.metric_label, priorytet
+    do znanych poziomów - wartości z zewnątrz nie tworzą nowych serii.
+    """
+    EVENTS_RECEIVED.labels(source, rule_set.metric_label(source, rule), priority_label(priority)).inc()
@@ -0,0 +1,265 @@
+"""
+Limity szybkości i circuit breaker dla akcji naprawczych.
+Token bucket globalny, per namespace i per typ akcji chroni API server przed
+lawiną usunięć podów, a circuit breaker wstrzymuje akcje po serii błędów API.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GLOBAL_RATE = (50.0, 100.0)
+DEFAULT_NAMESPACE_RATE = (5.0, 20.0)
+DEFAULT_ACTION_TYPE_RATE = (20.0, 50.0)
+DEFAULT_MAX_NAMESPACES = 10000
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RECOVERY_TIMEOUT = 30.0
+
+
+def _rate_from_env(name: str, default: Tuple[float, float]) -> Tuple[float, float]:
+    """Odczytuje limit w formacie "rate/burst" (np. "5/20")"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    rate, _, burst = value.partition("/")
+    return float(rate), float(burst or rate)
+
+
+class TokenBucket:
+    """Token bucket z leniwym uzupełnianiem tokenów"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def refill(self, now: float) -> float:
+        """Uzupełnia tokeny za czas od ostatniego odczytu i zwraca ich liczbę"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+        return self.tokens
+
+
+class RateLimiter:
+    """Limity akcji: globalny, per namespace i per typ akcji"""
+
+    def __init__(
+        self,
+        global_rate: Optional[Tuple[float, float]] = None,
+        namespace_rate: Optional[Tuple[float, float]] = None,
+        action_type_rates: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_namespaces: int = DEFAULT_MAX_NAMESPACES,
+        clock=time.monotonic
+    ):
+        """
+        Args:
+            global_rate: (akcje na sekundę, burst) dla wszystkich akcji
+            namespace_rate: (akcje na sekundę, burst) dla każdego namespace
+            action_type_rates: Limity per typ akcji; brakujące typy dostają limit domyślny
+            max_namespaces: Maksymalna liczba śledzonych namespace (wypieranie LRU)
+            clock: Źródło czasu (monotoniczne)
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        now = clock()
+
+        self.global_rate = global_rate or _rate_from_env("REMEDIATION_GLOBAL_RATE", DEFAULT_GLOBAL_RATE)
+        self.namespace_rate = namespace_rate or _rate_from_env(
+            "REMEDIATION_NAMESPACE_RATE", DEFAULT_NAMESPACE_RATE
+        )
+        self.default_action_type_rate = _rate_from_env(
+            "REMEDIATION_ACTION_TYPE_RATE", DEFAULT_ACTION_TYPE_RATE
+        )
+        if action_type_rates is None:
+            # np. REMEDIATION_ACTION_TYPE_RATES='{"delete_pod": [2, 10]}'
+            action_type_rates = {
+                k: tuple(v) for k, v in json.loads(os.getenv("REMEDIATION_ACTION_TYPE_RATES", "{}")).items()
+            }
+        self.action_type_rates = action_type_rates
+        self.max_namespaces = max_namespaces
+
+        self._global = TokenBucket(*self.global_rate, now)
+        self._action_types: Dict[str, TokenBucket] = {}
+        self._namespaces: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.rejected = {"global": 0, "namespace": 0, "action_type": 0}
+
+    def _action_type_bucket(self, action_type: str, now: float) -> TokenBucket:
+        bucket = self._action_types.get(action_type)
+        if bucket is None:
+            rate = self.action_type_rates.get(action_type, self.default_action_type_rate)
+            bucket = self._action_types[action_type] = TokenBucket(*rate, now)
+        return bucket
+
+    def _namespace_bucket(self, namespace: str, now: float) -> TokenBucket:
+        bucket = self._namespaces.get(namespace)
+        if bucket is None:
+            bucket = self._namespaces[namespace] = TokenBucket(*self.namespace_rate, now)
+            if len(self._namespaces) > self.max_namespaces:
+                self._namespaces.popitem(last=False)
+        else:
+            self._namespaces.move_to_end(namespace)
+        return bucket
+
+    def acquire(self, action_type: str, namespace: str) -> Optional[str]:
+        """
+        Pobiera token ze wszystkich limitów naraz
+
+        Returns:
+            None jeśli akcja może być wykonana, w przeciwnym razie nazwa przekroczonego limitu
+        """
+        now = self._clock()
+        with self._lock:
+            buckets = (
+                ("global", self._global),
+                ("namespace", self._namespace_bucket(namespace, now)),
+                ("action_type", self._action_type_bucket(action_type, now))
+            )
+            # Tokeny pobieramy dopiero gdy wszystkie limity je mają
+            for scope, bucket in buckets:
+                if bucket.refill(now) < 1.0:
+                    self.rejected[scope] += 1
+                    return scope
+            for _, bucket in buckets:
+                bucket.tokens -= 1.0
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca bieżący stan limitów"""
+        now = self._clock()
+        with self._lock:
+            return {
+                "global": {
+                    "rate": self.global_rate[0],
+                    "burst": self.global_rate[1],
+                    "tokens": round(self._global.refill(now), 2)
+                },
+                "namespaces": {
+                    "rate": self.namespace_rate[0],
+                    "burst": self.namespace_rate[1],
+                    "tracked": len(self._namespaces),
+                    "throttled": sorted(ns for ns, b in self._namespaces.items() if b.refill(now) < 1.0)
+                },
+                "action_types": {
+                    action_type: {
+                        "rate": bucket.rate,
+                        "burst": bucket.burst,
+                        "tokens": round(bucket.refill(now), 2)
+                    }
+                    for action_type, bucket in self._action_types.items()
+                },
+                "rejected": dict(self.rejected)
+            }
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker dla wywołań Kubernetes API
+
+    closed -> open po failure_threshold kolejnych błędach API (5xx, 429, brak
+    połączenia, przekroczenie czasu); po recovery_timeout przepuszcza jedną akcję
+    próbną (half_open) i zamyka się, gdy ta się powiedzie.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: Optional[int] = None,
+        recovery_timeout: Optional[float] = None,
+        clock=time.monotonic
+    ):
+        self.failure_threshold = failure_threshold or int(
+            os.getenv("REMEDIATION_BREAKER_FAILURES", DEFAULT_FAILURE_THRESHOLD)
+        )
+        self.recovery_timeout = recovery_timeout or float(
+            os.getenv("REMEDIATION_BREAKER_RECOVERY", DEFAULT_RECOVERY_TIMEOUT)
+        )
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self.trips = 0
+        self._probe_in_flight = False
+
+    @staticmethod
+    def is_failure(result: Dict[str, Any]) -> bool:
+        """Czy wynik akcji wskazuje na problem z API serverem"""
+        status = result.get("status")
+        if status == "timeout":
+            return True
+        if status != "error":
+            return False
+        if result.get("unreachable"):
+            return True
+        code = result.get("code")
+        return code is not None and (code >= 500 or code == 429)
+
+    def allow(self) -> bool:
+        """Czy akcja może zostać wykonana"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def cancel(self):
+        """Zwalnia akcję przepuszczoną przez allow(), która jednak nie zostanie wykonana"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record(self, result: Dict[str, Any]):
+        """Rejestruje wynik wykonanej akcji"""
+        failed = self.is_failure(result)
+        with self._lock:
+            if not failed:
+                if self.state != self.CLOSED:
+                    logger.info("Circuit breaker zamknięty - API server odpowiada")
+                self.state = self.CLOSED
+                self.consecutive_failures = 0
+                self._probe_in_flight = False
+                return
+
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                    logger.warning(
+                        f"Circuit breaker otwarty po {self.consecutive_failures} błędach API - "
+                        f"wstrzymanie akcji na {self.recovery_timeout}s"
+                    )
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+                self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca bieżący stan circuit breakera"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout": self.recovery_timeout,
+                "trips": self.trips,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,135 @@
+"""
+Gotowość webhooka - rozgrzewanie w tle zamiast przy imporcie.
+Proces przyjmuje zdarzenia zaraz po starcie (liveness), a połączenie z API
+serverem, rejestracja w pierścieniu shardingu i synchronizacja informerów
+wykonują się w wątku w tle. Readiness przechodzi dopiero po zakończeniu
+wszystkich kroków, więc Service kieruje ruch do repliki z ciepłym klientem
+i cache. Przy zamykaniu readiness jest od razu wyłączana (drenowanie).
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRY_INTERVAL = 1.0
+MAX_RETRY_INTERVAL = 30.0
+
+# Moment startu procesu w przybliżeniu - czas importu liczony od pierwszego importu tego modułu
+PROCESS_STARTED = time.perf_counter()
+
+
+class WarmUp:
+    """
+    Kroki rozgrzewania wykonywane po kolei w wątku w tle
+
+    Krok to para (nazwa, funkcja); krok zakończony wyjątkiem albo zwracający
+    False jest ponawiany z wykładniczo rosnącym odstępem, a kolejne kroki
+    czekają na jego powodzenie.
+    """
+
+    def __init__(
+        self,
+        steps: Optional[List[Tuple[str, Callable[[], Any]]]] = None,
+        retry_interval: Optional[float] = None,
+        clock=time.perf_counter
+    ):
+        """
+        Args:
+            steps: Kroki rozgrzewania w kolejności wykonania
+            retry_interval: Początkowy odstęp ponowień nieudanego kroku (sekundy)
+            clock: Źródło czasu dla pomiaru czasu startu
+        """
+        self.steps = list(steps or [])
+        self.retry_interval = retry_interval or float(
+            os.getenv("WARMUP_RETRY_INTERVAL", DEFAULT_RETRY_INTERVAL)
+        )
+        self._clock = clock
+        self._state: Dict[str, str] = {name: "pending" for name, _ in self.steps}
+        self._durations: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.draining = False
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.imported_in: Optional[float] = None
+        self.ready_in: Optional[float] = None
+
+    def add_step(self, name: str, func: Callable[[], Any]):
+        """Dodaje krok rozgrzewania (przed start())"""
+        self.steps.append((name, func))
+        self._state[name] = "pending"
+
+    def mark_imported(self):
+        """Zapisuje czas importu aplikacji (od startu procesu)"""
+        self.imported_in = self._clock() - PROCESS_STARTED
+        metrics.STARTUP_DURATION.labels("import").set(self.imported_in)
+
+    def start(self):
+        """Uruchamia wątek rozgrzewania"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Przerywa rozgrzewanie i wyłącza readiness (zamykanie procesu)"""
+        self.draining = True
+        self._stop.set()
+
+    @property
+    def ready(self) -> bool:
+        """Czy replika może przyjmować ruch (rozgrzana i nie zamykana)"""
+        return self._ready.is_set() and not self.draining
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Czeka na zakończenie rozgrzewania"""
+        return self._ready.wait(timeout)
+
+    def _run(self):
+        for name, func in self.steps:
+            if not self._run_step(name, func):
+                return
+        self.ready_in = self._clock() - PROCESS_STARTED
+        metrics.STARTUP_DURATION.labels("ready").set(self.ready_in)
+        self._ready.set()
+        logger.info(f"Webhook gotowy po {self.ready_in:.2f}s od startu procesu")
+
+    def _run_step(self, name: str, func: Callable[[], Any]) -> bool:
+        interval = self.retry_interval
+        started = self._clock()
+        while not self._stop.is_set():
+            self.attempts += 1
+            try:
+                ok = func() is not False
+                error = None if ok else "not ready"
+            except Exception as e:
+                ok, error = False, str(e)
+            if ok:
+                self._state[name] = "ready"
+                self._durations[name] = self._clock() - started
+                return True
+            self._state[name] = "retrying"
+            self.last_error = f"{name}: {error}"
+            logger.warning(f"Rozgrzewanie - krok {name} nieudany ({error}), ponowienie za {interval:.1f}s")
+            self._stop.wait(interval)
+            interval = min(interval * 2, MAX_RETRY_INTERVAL)
+        return False
+
+    def status(self) -> Dict[str, Any]:
+        """Zwraca stan rozgrzewania"""
+        return {
+            "ready": self.ready,
+            "draining": self.draining,
+            "steps": dict(self._state),
+            "step_seconds": {name: round(d, 3) for name, d in self._durations.items()},
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "import_seconds": round(self.imported_in, 3) if self.imported_in is not None else None,
+            "ready_seconds": round(self.ready_in, 3) if self.ready_in is not None else None
+        }
@@ -2,67 +2,78 @@
 Silnik naprawczy - wykonuje automatyczne akcje naprawcze w Kubernetes
 """
 import logging
-from typing import Dict, Any, Optional, List
-from kubernetes import client, config
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple
+from kubernetes import client
 from kubernetes.client.rest import ApiException
+from urllib3.exceptions import HTTPError
+from informer import controller_owner, replicaset_revision
+from kube_client import LazyApi
+from metrics import InstrumentedApi
+from rules import RuleSet, compile_rules, load_rules_config, priority_value
 
 logger = logging.getLogger(__name__)
 
+# Liczba ponowień patcha przy konflikcie resourceVersion (409)
+MAX_CONFLICT_RETRIES = 3
+
+# Akcje, których celem jest pojedynczy pod (a nie cały deployment)
+POD_ACTIONS = {"delete_pod", "restart_pod"}
+
+# Sposób usuwania podów: bezpośrednie DELETE albo Eviction API (respektuje PodDisruptionBudget)
+POD_DELETE_MODES = ("delete", "evict")
+
+# Etykieta szablonu poda nadawana przez kontroler ReplicaSet (pomijana przy rollbacku)
+POD_TEMPLATE_HASH_LABEL = "pod-template-hash"
+
 class RemediationEngine:
     """Silnik do wykonywania akcji naprawczych"""
     
-    def __init__(self):
-        """Inicjalizacja silnika naprawczego"""
-        try:
-            config.load_incluster_config()
-        except config.ConfigException:
-            try:
-                config.load_kube_config()
-            except config.ConfigException:
-                logger.warning("Nie można załadować konfiguracji Kubernetes")
-        
-        self.apps_v1 = client.AppsV1Api()
-        self.core_v1 = client.CoreV1Api()
-        self.batch_v1 = client.BatchV1Api()
-        
-        # Mapowanie reguł na akcje
-        self.action_rules = {
-            "falco": {
-                "Container Escape Attempt": {
-                    "action": "delete_pod",
-                    "priority_threshold": "CRITICAL"
-                },
-                "Privilege Escalation Attempt": {
-                    "action": "delete_pod",
-                    "priority_threshold": "ERROR"
-                },
-                "Unauthorized Process Execution": {
-                    "action": "restart_pod",
-                    "priority_threshold": "WARNING"
-                }
-            },
-            "prometheus": {
-                "PodCrashLooping": {
-                    "action": "restart_deployment",
-                    "priority_threshold": "critical"
-                },
-                "HighMemoryUsage": {
-                    "action": "scale_down",
-                    "priority_threshold": "warning"
-                },
-                "HighCPUUsage": {
-                    "action": "scale_down",
-                    "priority_threshold": "warning"
-                }
-            }
-        }
+    def __init__(self, cache=None, api_client=None, rules_config: Any = None):
+        """
+        Inicjalizacja silnika naprawczego
+        
+        Args:
+            cache: Opcjonalny cache informerów (ClusterCache) do odczytów i rozwiązywania właściciela poda
+            api_client: ApiClient Kubernetes albo funkcja go tworząca (domyślnie współdzielony klient procesu, tworzony leniwie)
+            rules_config: Konfiguracja reguł (domyślnie wczytana z pliku reguł)
+        """
+        # Klienci API powstają przy pierwszym wywołaniu (albo przy rozgrzewaniu w tle)
+        self.apps_v1 = InstrumentedApi(LazyApi(client.AppsV1Api, api_client))
+        self.core_v1 = InstrumentedApi(LazyApi(client.CoreV1Api, api_client))
+        self.batch_v1 = InstrumentedApi(LazyApi(client.BatchV1Api, api_client))
+        self.cache = cache
+        self._rollback_locks: Dict[Tuple[str, str], List[Any]] = {}
+        self._rollback_locks_guard = threading.Lock()
+        self.pod_delete_mode = os.getenv("REMEDIATION_POD_DELETE_MODE", "delete")
+        if self.pod_delete_mode not in POD_DELETE_MODES:
+            raise ValueError(f"REMEDIATION_POD_DELETE_MODE must be one of {POD_DELETE_MODES}")
+        
+        # Mapowanie reguł na akcje - wczytane z pliku i skompilowane do indeksu
+        self.apply_rules(rules_config if rules_config is not None else load_rules_config())
+        logger.info(f"Załadowano {len(self.rules)} reguł naprawczych")
+    
+    def apply_rules(self, rules_config: Any) -> RuleSet:
+        """
+        Kompiluje i atomowo aktywuje nową konfigurację reguł
+        
+        Raises:
+            RuleError: Gdy konfiguracja jest niepoprawna (aktywne reguły bez zmian)
+        """
+        rule_set = compile_rules(rules_config)
+        self.action_rules = rules_config
+        self.rules = rule_set
+        return rule_set
     
     def decide_action(
         self,
         source: str,
         rule: str,
         priority: str,
-        metadata: Dict[str, Any]
+        metadata: Dict[str, Any],
+        tags: Optional[List[str]] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Decyduje o akcji naprawczej na podstawie zdarzenia
@@ -72,68 +83,146 @@ class RemediationEngine:
             rule: Nazwa reguły/alertu
             priority: Priorytet zdarzenia
             metadata: Dodatkowe metadane zdarzenia
+            tags: Tagi zdarzenia (Falco)
         
         Returns:
             Słownik z akcją do wykonania lub None
         """
         logger.info(f"Analizowanie zdarzenia: {source}/{rule} ({priority})")
         
-        # Sprawdzenie czy istnieje reguła dla tego zdarzenia
-        if source not in self.action_rules:
-            logger.debug(f"Brak reguł dla źródła: {source}")
-            return None
+        target = self._event_target(metadata)
         
-        if rule not in self.action_rules[source]:
-            logger.debug(f"Brak reguły dla: {rule}")
+        # Dopasowanie do skompilowanych reguł (nazwa, priorytet, selektory)
+        matched = self.rules.match(source, rule, priority, target[0], tags, target[4] or metadata)
+        if matched is None:
+            logger.debug(f"Brak pasującej reguły dla: {source}/{rule} ({priority})")
             return None
         
-        rule_config = self.action_rules[source][rule]
+        return self._build_action(matched, source, rule, priority, metadata, target)
+    
+    def decide_actions(
+        self,
+        source: str,
+        events: List[Tuple[Any, ...]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Decyduje o akcjach dla całej paczki zdarzeń w jednym przebiegu
+        
+        Kandydaci są wyznaczani raz na nazwę reguły w paczce: nazwy bez
+        kandydatów są odrzucane bez ekstrakcji celu, a pojedyncza reguła bez
+        selektorów to tylko porównanie priorytetu - wykonywane przed ekstrakcją
+        celu. Pełne match() dotyczy wyłącznie reguł z selektorami (namespace,
+        etykiety, tagi) albo nazw z kilkoma kandydatami.
         
-        # Sprawdzenie priorytetu
-        if not self._check_priority(priority, rule_config.get("priority_threshold", "INFO")):
-            logger.debug(f"Priorytet {priority} nie spełnia wymagań")
-            return None
+        Args:
+            source: Źródło zdarzeń (falco, prometheus)
+            events: Lista krotek (reguła, priorytet, metadane[, tagi])
         
+        Returns:
+            Lista akcji (lub None) w kolejności zdarzeń
+        """
+        rules = self.rules
+        candidates_of, match = rules.candidates, rules.match
+        event_target, build_action = self._event_target, self._build_action
+        # Nazwa reguły -> False (brak kandydatów), jedyna reguła bez selektorów albo None (pełne match())
+        plans: Dict[Any, Any] = {}
+        actions: List[Optional[Dict[str, Any]]] = []
+        append = actions.append
+        for event in events:
+            rule, priority, metadata = event[0], event[1], event[2]
+            plan = plans.get(rule, plans)
+            if plan is plans:
+                candidates = candidates_of(source, rule)
+                plan = plans[rule] = (
+                    False if not candidates
+                    else candidates[0] if len(candidates) == 1 and not candidates[0].has_selectors
+                    else None
+                )
+            if plan is False:
+                append(None)
+                continue
+            if plan is not None and priority_value(priority) < plan.threshold:
+                append(None)
+                continue
+            target = event_target(metadata)
+            if plan is None:
+                tags = event[3] if len(event) > 3 else None
+                matched = match(source, rule, priority, target[0], tags, target[4] or metadata)
+                if matched is None:
+                    append(None)
+                    continue
+            else:
+                matched = plan
+            append(build_action(matched, source, rule, priority, metadata, target))
+        
+        logger.debug(
+            f"Paczka {source}: {len(events)} zdarzeń, {len(plans)} nazw reguł, "
+            f"{sum(1 for a in actions if a is not None)} akcji"
+        )
+        return actions
+    
+    def _event_target(self, metadata: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[str], Optional[str], Dict[str, Any]]:
+        """Zwraca cel zdarzenia: (namespace, pod, kontener, deployment, etykiety)"""
+        # Ekstrakcja informacji o zasobie z metadanych
+        # (alerty Prometheus przenoszą namespace/pod/deployment w etykietach)
+        labels = metadata.get("labels") or {}
+        namespace = metadata.get("k8s.ns.name") or metadata.get("namespace") or labels.get("namespace", "default")
+        pod_name = metadata.get("k8s.pod.name") or metadata.get("pod") or labels.get("pod")
+        container_name = (
+            metadata.get("k8s.container.name") or metadata.get("container")
+            or labels.get("container") or metadata.get("container.name")
+        )
+        deployment_name = metadata.get("k8s.deployment.name") or metadata.get("deployment") or labels.get("deployment")
+        
+        # Zdarzenia Falco bez pól k8s.* - rozwiązanie celu po ID kontenera z indeksu informera
+        container_id = metadata.get("container.id")
+        if not pod_name and container_id and self.cache is not None:
+            target = self.cache.resolve_container(container_id)
+            if target is not None:
+                namespace = target["namespace"]
+                pod_name = target["pod_name"]
+                container_name = container_name or target["container_name"]
+                deployment_name = deployment_name or target["deployment_name"]
+        elif pod_name and not deployment_name and self.cache is not None:
+            # Wspólny klucz workloadu dla korelacji zdarzeń poda i alertów deploymentu
+            deployment_name = self.cache.deployment_for_pod(namespace, pod_name)
+        
+        return namespace, pod_name, container_name, deployment_name, labels
+    
+    @staticmethod
+    def _build_action(matched, source: str, rule: str, priority: str, metadata: Dict[str, Any], target: Tuple) -> Dict[str, Any]:
+        namespace, pod_name, container_name, deployment_name, labels = target
         # Przygotowanie akcji
         action = {
-            "type": rule_config["action"],
+            "type": matched.action,
             "source": source,
             "rule": rule,
             "priority": priority,
             "metadata": metadata
         }
         
-        # Ekstrakcja informacji o zasobie z metadanych
-        namespace = metadata.get("k8s.ns.name") or metadata.get("namespace", "default")
-        pod_name = metadata.get("k8s.pod.name") or metadata.get("pod")
-        container_name = metadata.get("k8s.container.name") or metadata.get("container")
-        deployment_name = metadata.get("k8s.deployment.name") or metadata.get("deployment")
-        
         action["namespace"] = namespace
         action["pod_name"] = pod_name
         action["container_name"] = container_name
         action["deployment_name"] = deployment_name
+        if matched.action == "rollback" and labels.get("rollback_revision"):
+            # Alert może wskazać konkretną rewizję; domyślnie poprzednia
+            action["revision"] = labels["rollback_revision"]
         
         return action
     
+    @staticmethod
+    def target_key(action: Dict[str, Any]) -> Tuple[str, str, Optional[str], Optional[str]]:
+        """Klucz celu akcji: (typ akcji, namespace, pod dla akcji na podzie, inaczej deployment lub pod, klaster)"""
+        if action["type"] in POD_ACTIONS and action.get("pod_name"):
+            target = action["pod_name"]
+        else:
+            target = action.get("deployment_name") or action.get("pod_name")
+        return (action["type"], action.get("namespace", "default"), target, action.get("cluster"))
+    
     def _check_priority(self, priority: str, threshold: str) -> bool:
         """Sprawdza czy priorytet spełnia próg"""
-        priority_levels = {
-            "CRITICAL": 4,
-            "ERROR": 3,
-            "WARNING": 2,
-            "NOTICE": 1,
-            "INFO": 0,
-            "critical": 4,
-            "error": 3,
-            "warning": 2,
-            "info": 0
-        }
-        
-        priority_val = priority_levels.get(priority.upper(), 0)
-        threshold_val = priority_levels.get(threshold.upper(), 0)
-        
-        return priority_val >= threshold_val
+        return priority_value(priority) >= priority_value(threshold)
     
     def execute_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -169,7 +258,11 @@ class RemediationEngine:
         
         except ApiException as e:
             logger.error(f"Błąd Kubernetes API: {e}")
-            return {"status": "error", "message": str(e)}
+            return {"status": "error", "message": str(e), "code": e.status}
+        except HTTPError as e:
+            # Brak połączenia z API serverem
+            logger.error(f"Kubernetes API niedostępne: {e}")
+            return {"status": "error", "message": str(e), "unreachable": True}
         except Exception as e:
             logger.error(f"Błąd podczas wykonywania akcji: {e}")
             return {"status": "error", "message": str(e)}
@@ -182,6 +275,9 @@ class RemediationEngine:
         if not pod_name:
             return {"status": "error", "message": "Pod name not provided"}
         
+        if self.pod_delete_mode == "evict":
+            return self._evict_pod(pod_name, namespace)
+        
         try:
             self.core_v1.delete_namespaced_pod(
                 name=pod_name,
@@ -196,6 +292,25 @@ class RemediationEngine:
                 return {"status": "not_found", "pod": pod_name}
             raise
     
+    def _evict_pod(self, pod_name: str, namespace: str) -> Dict[str, Any]:
+        """Usuwa pod przez Eviction API - API server odmawia, gdy naruszyłoby to PodDisruptionBudget"""
+        body = client.V1Eviction(
+            metadata=client.V1ObjectMeta(name=pod_name, namespace=namespace),
+            delete_options=client.V1DeleteOptions(grace_period_seconds=0)
+        )
+        try:
+            self.core_v1.create_namespaced_pod_eviction(name=pod_name, namespace=namespace, body=body)
+            logger.info(f"Eksmitowano pod: {pod_name} w namespace {namespace}")
+            return {"status": "success", "action": "evicted", "pod": pod_name}
+        except ApiException as e:
+            if e.status == 404:
+                logger.warning(f"Pod {pod_name} nie istnieje")
+                return {"status": "not_found", "pod": pod_name}
+            if e.status == 429:
+                logger.warning(f"Eksmisja poda {pod_name} zablokowana przez PodDisruptionBudget")
+                return {"status": "blocked", "pod": pod_name, "reason": "PodDisruptionBudget"}
+            raise
+    
     def _restart_pod(self, action: Dict[str, Any]) -> Dict[str, Any]:
         """Restartuje pod poprzez usunięcie"""
         return self._delete_pod(action)
@@ -215,22 +330,21 @@ class RemediationEngine:
             return {"status": "error", "message": "Deployment name not found"}
         
         try:
-            deployment = self.apps_v1.read_namespaced_deployment(
-                name=deployment_name,
-                namespace=namespace
-            )
-            
-            # Restart poprzez zmianę annotation
-            if deployment.spec.template.metadata.annotations is None:
-                deployment.spec.template.metadata.annotations = {}
-            
-            import time
-            deployment.spec.template.metadata.annotations["kubectl.kubernetes.io/restartedAt"] = str(int(time.time()))
-            
+            # Restart poprzez zmianę annotation - strategic merge patch tylko tego pola
             self.apps_v1.patch_namespaced_deployment(
                 name=deployment_name,
                 namespace=namespace,
-                body=deployment
+                body={
+                    "spec": {
+                        "template": {
+                            "metadata": {
+                                "annotations": {
+                                    "kubectl.kubernetes.io/restartedAt": str(int(time.time()))
+                                }
+                            }
+                        }
+                    }
+                }
             )
             
             logger.info(f"Restartowano deployment: {deployment_name} w namespace {namespace}")
@@ -250,20 +364,7 @@ class RemediationEngine:
             return {"status": "error", "message": "Deployment name not found"}
         
         try:
-            deployment = self.apps_v1.read_namespaced_deployment(
-                name=deployment_name,
-                namespace=namespace
-            )
-            
-            current_replicas = deployment.spec.replicas or 1
-            new_replicas = max(1, current_replicas - 1)
-            
-            deployment.spec.replicas = new_replicas
-            self.apps_v1.patch_namespaced_deployment(
-                name=deployment_name,
-                namespace=namespace,
-                body=deployment
-            )
+            current_replicas, new_replicas = self._scale_deployment(deployment_name, namespace, -1)
             
             logger.info(f"Zmniejszono repliki deploymentu {deployment_name} z {current_replicas} do {new_replicas}")
             return {
@@ -286,20 +387,7 @@ class RemediationEngine:
             return {"status": "error", "message": "Deployment name not found"}
         
         try:
-            deployment = self.apps_v1.read_namespaced_deployment(
-                name=deployment_name,
-                namespace=namespace
-            )
-            
-            current_replicas = deployment.spec.replicas or 1
-            new_replicas = min(10, current_replicas + 1)  # Max 10 replik
-            
-            deployment.spec.replicas = new_replicas
-            self.apps_v1.patch_namespaced_deployment(
-                name=deployment_name,
-                namespace=namespace,
-                body=deployment
-            )
+            current_replicas, new_replicas = self._scale_deployment(deployment_name, namespace, 1)
             
             logger.info(f"Zwiększono repliki deploymentu {deployment_name} z {current_replicas} do {new_replicas}")
             return {
@@ -314,43 +402,201 @@ class RemediationEngine:
             raise
     
     def _rollback_deployment(self, action: Dict[str, Any]) -> Dict[str, Any]:
-        """Wykonuje rollback deploymentu"""
+        """
+        Przywraca szablon poda z ReplicaSetu poprzedniej (lub wskazanej w "revision") rewizji
+        
+        apps/v1 nie ma już endpointu rollback - tak jak kubectl rollout undo,
+        patchujemy spec.template deploymentu szablonem docelowego ReplicaSetu.
+        Rewizje pochodzą z indeksu informera (bez listowania); bez cache jest
+        jedno listowanie ReplicaSetów selektorem deploymentu.
+        """
         deployment_name = action.get("deployment_name")
         namespace = action.get("namespace", "default")
         
         if not deployment_name:
             return {"status": "error", "message": "Deployment name not found"}
         
+        revision = action.get("revision")
+        # [blokada, liczba wykonanych rollbacków] - rollbacki tego samego deploymentu po kolei
+        state = self._rollback_state(namespace, deployment_name)
+        seen = state[1]
         try:
-            # Pobranie historii deploymentu
-            deployment = self.apps_v1.read_namespaced_deployment(
-                name=deployment_name,
-                namespace=namespace
-            )
-            
-            # Rollback do poprzedniej wersji
-            rollback = client.AppsV1Api()
-            rollback.create_namespaced_deployment_rollback(
-                name=deployment_name,
-                namespace=namespace,
-                body={
-                    "name": deployment_name,
-                    "rollbackTo": {
-                        "revision": 0  # 0 oznacza poprzednią wersję
-                    }
-                }
-            )
-            
-            logger.info(f"Wykonano rollback deploymentu: {deployment_name}")
-            return {"status": "success", "action": "rolled_back", "deployment": deployment_name}
+            with state[0]:
+                if revision is None and state[1] != seen:
+                    # Inny rollback "do poprzedniej" zakończył się w trakcie oczekiwania -
+                    # drugi cofnąłby deployment o kolejną rewizję
+                    return {"status": "success", "action": "already_rolled_back", "deployment": deployment_name}
+                result = self._rollback_to(deployment_name, namespace, revision)
+                if result.get("action") == "rolled_back":
+                    state[1] += 1
+                return result
         
         except ApiException as e:
             if e.status == 404:
                 return {"status": "not_found", "deployment": deployment_name}
             raise
     
+    def _rollback_state(self, namespace: str, name: str) -> List[Any]:
+        with self._rollback_locks_guard:
+            return self._rollback_locks.setdefault((namespace, name), [threading.Lock(), 0])
+    
+    def _rollback_to(self, name: str, namespace: str, revision: Optional[Any]) -> Dict[str, Any]:
+        """
+        Patch szablonu z warunkiem na resourceVersion; przy konflikcie (409) odczytuje
+        deployment z API servera i ponawia z tym samym docelowym ReplicaSetem, więc
+        równoległy rollback (np. z innej repliki) nie cofa deploymentu o dwie rewizje.
+        """
+        target = None
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            deployment = self._read_deployment(name, namespace, fresh=attempt > 0)
+            if target is None:
+                target = self._rollback_target(deployment, name, namespace, revision)
+                if target is None:
+                    logger.warning(f"Brak rewizji do rollbacku deploymentu {namespace}/{name} (żądana: {revision})")
+                    return {"status": "error", "message": "No revision to roll back to", "deployment": name}
+            target_revision, replicaset = target
+            
+            template = self._template_body(replicaset.spec.template)
+            if template == self._template_body(deployment.spec.template):
+                # Np. równoległy rollback już przywrócił ten szablon
+                return {
+                    "status": "success", "action": "already_at_revision",
+                    "deployment": name, "revision": target_revision
+                }
+            
+            try:
+                # JSON patch: całe spec.template zastąpione (merge zostawiłby np. nowe zmienne env)
+                self.apps_v1.patch_namespaced_deployment(
+                    name=name,
+                    namespace=namespace,
+                    body=[
+                        {"op": "replace", "path": "/metadata/resourceVersion",
+                         "value": deployment.metadata.resource_version},
+                        {"op": "replace", "path": "/spec/template", "value": template}
+                    ]
+                )
+                logger.info(
+                    f"Wykonano rollback deploymentu {namespace}/{name} do rewizji {target_revision} "
+                    f"(ReplicaSet {replicaset.metadata.name})"
+                )
+                return {
+                    "status": "success", "action": "rolled_back", "deployment": name,
+                    "revision": target_revision, "replicaset": replicaset.metadata.name
+                }
+            except ApiException as e:
+                if e.status == 409 and attempt < MAX_CONFLICT_RETRIES:
+                    logger.info(f"Konflikt resourceVersion dla {namespace}/{name} - ponawianie rollbacku ({attempt + 1})")
+                    continue
+                raise
+    
+    def _rollback_target(self, deployment, name: str, namespace: str, revision: Optional[Any]):
+        """Zwraca (rewizja, ReplicaSet) celu rollbacku: wskazana rewizja albo najnowsza starsza od bieżącej"""
+        revisions = self._deployment_revisions(deployment, name, namespace)
+        if not revisions:
+            return None
+        if revision is not None:
+            wanted = int(revision)
+            return next((entry for entry in revisions if entry[0] == wanted), None)
+        current = replicaset_revision(deployment) or revisions[-1][0]
+        older = [entry for entry in revisions if entry[0] < current]
+        return older[-1] if older else None
+    
+    def _deployment_revisions(self, deployment, name: str, namespace: str) -> List[Tuple[int, Any]]:
+        """[(rewizja, ReplicaSet)] deploymentu posortowane rosnąco - z indeksu informera lub jednym listowaniem"""
+        if self.cache is not None and self.cache.synced:
+            revisions = []
+            for revision, replicaset_name in self.cache.deployment_revisions(namespace, name):
+                replicaset = self.cache.get_replicaset(namespace, replicaset_name)
+                if replicaset is not None:
+                    revisions.append((revision, replicaset))
+            return revisions
+        
+        selector = deployment.spec.selector.match_labels or {}
+        replicasets = self.apps_v1.list_namespaced_replica_set(
+            namespace=namespace,
+            label_selector=",".join(f"{k}={v}" for k, v in sorted(selector.items()))
+        )
+        revisions = []
+        for replicaset in replicasets.items:
+            owner = controller_owner(replicaset)
+            revision = replicaset_revision(replicaset)
+            if owner is not None and owner.kind == "Deployment" and owner.name == name and revision is not None:
+                revisions.append((revision, replicaset))
+        return sorted(revisions, key=lambda entry: entry[0])
+    
+    def _template_body(self, template) -> Dict[str, Any]:
+        """Szablon poda jako słownik API bez etykiety pod-template-hash (nadawanej przez kontroler)"""
+        body = self.apps_v1.api_client.sanitize_for_serialization(template)
+        labels = (body.get("metadata") or {}).get("labels")
+        if labels:
+            labels.pop(POD_TEMPLATE_HASH_LABEL, None)
+        return body
+    
+    def _scale_deployment(
+        self,
+        name: str,
+        namespace: str,
+        delta: int,
+        min_replicas: int = 1,
+        max_replicas: int = 10
+    ) -> Tuple[int, int]:
+        """
+        Zmienia liczbę replik przez subresource /scale z warunkiem na resourceVersion
+        
+        Przy konflikcie (409) odczytuje aktualny stan z API servera i ponawia
+        (compare-and-swap), więc równoległe akcje nie nadpisują się nawzajem.
+        
+        Returns:
+            Krotka (poprzednia liczba replik, nowa liczba replik)
+        """
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            current_replicas, resource_version = self._read_replicas(name, namespace, fresh=attempt > 0)
+            new_replicas = max(min_replicas, min(max_replicas, current_replicas + delta))
+            if new_replicas == current_replicas:
+                return current_replicas, new_replicas
+            
+            try:
+                self.apps_v1.patch_namespaced_deployment_scale(
+                    name=name,
+                    namespace=namespace,
+                    body={
+                        "metadata": {"resourceVersion": resource_version},
+                        "spec": {"replicas": new_replicas}
+                    }
+                )
+                return current_replicas, new_replicas
+            except ApiException as e:
+                if e.status == 409 and attempt < MAX_CONFLICT_RETRIES:
+                    logger.info(f"Konflikt resourceVersion dla {namespace}/{name} - ponawianie ({attempt + 1})")
+                    continue
+                raise
+    
+    def _read_replicas(self, name: str, namespace: str, fresh: bool = False) -> Tuple[int, str]:
+        """Zwraca (liczba replik, resourceVersion) z cache informerów lub z subresource /scale"""
+        if not fresh and self.cache is not None and self.cache.synced:
+            deployment = self.cache.get_deployment(namespace, name)
+            if deployment is not None:
+                return deployment.spec.replicas or 1, deployment.metadata.resource_version
+        
+        scale = self.apps_v1.read_namespaced_deployment_scale(name=name, namespace=namespace)
+        return scale.spec.replicas or 1, scale.metadata.resource_version
+    
+    def _read_deployment(self, name: str, namespace: str, fresh: bool = False):
+        """Odczytuje deployment z cache informerów lub z API servera"""
+        if not fresh and self.cache is not None and self.cache.synced:
+            deployment = self.cache.get_deployment(namespace, name)
+            if deployment is not None:
+                return deployment
+        return self.apps_v1.read_namespaced_deployment(name=name, namespace=namespace)
+    
     def _find_deployment_for_pod(self, pod_name: str, namespace: str) -> Optional[str]:
         """Znajduje deployment dla poda"""
+        if self.cache is not None and self.cache.synced:
+            # Rozwiązanie przez ownerReferences bez zapytań do API
+            deployment_name = self.cache.deployment_for_pod(namespace, pod_name)
+            if deployment_name or self.cache.get_pod(namespace, pod_name) is not None:
+                return deployment_name
+        
         try:
             pod = self.core_v1.read_namespaced_pod(name=pod_name, namespace=namespace)
             labels = pod.metadata.labels
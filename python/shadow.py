@@ -0,0 +1,425 @@
+"""
+Tryb cienia (shadow) - ocena kandydackiego zbioru reguł bez dotykania klastra.
+
+Offline: archiwa zdarzeń (NDJSON, opcjonalnie .gz) są czytane strumieniowo i
+oceniane paczkami przez RemediationEngine.decide_actions dla reguł
+kandydackich i bieżących. Raport podaje liczby akcji per reguła, namespace,
+typ akcji i workload oraz różnicę względem bieżących reguł. Akcje nie są
+wykonywane - silnik nie tworzy klienta Kubernetes, dopóki nie wykona akcji.
+
+Obsługiwane rekordy archiwum (jeden na linię):
+    {"t": ..., "source": "falco"|"prometheus", "payload": {...}}   # zapis ruchu (benchmarks/traffic.py)
+    {"rule": ..., "priority": ..., "output_fields": {...}}         # zdarzenie Falco
+    {"status": ..., "alerts": [...]}                               # grupa Alertmanagera
+    {"status": ..., "labels": {...}, "annotations": {...}}         # pojedynczy alert
+
+Przykłady:
+    python shadow.py --candidate new-rules.yaml falco-*.ndjson.gz alerts.ndjson
+    python shadow.py --candidate new-rules.yaml --baseline rules.yaml --output report.json -
+
+Na żywo (SHADOW_RULES_PATH): ShadowMode przyjmuje kopie zdarzeń webhooka do
+ograniczonego bufora (bez blokowania i bez walidacji modelu - odrzucane są
+tylko rekordy niebędące obiektami JSON) i ocenia je paczkami w wątku w tle;
+raport jest dostępny pod GET /shadow.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from remediation import RemediationEngine
+from rules import load_rules_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_BUFFER_SIZE = 100000
+DEFAULT_INTERVAL = 1.0
+DEFAULT_TOP = 20
+
+# Zdarzenie po normalizacji: (źródło, reguła, priorytet, metadane, tagi)
+Event = Tuple[str, str, str, Dict[str, Any], Optional[List[str]]]
+
+DIMENSIONS = ("by_type", "by_rule", "by_namespace", "by_workload")
+
+
+def normalize(source: Optional[str], record: Dict[str, Any]) -> Iterator[Event]:
+    """
+    Zamienia rekord archiwum albo kopię zdarzenia webhooka na zdarzenia do oceny
+
+    Alerty rozwiązane są pomijane (webhook też ich nie naprawia). Metadane
+    alertów mają ten sam kształt, co w webhooku Prometheus. Rekordy i alerty
+    o niepoprawnym kształcie (np. output_fields albo labels niebędące obiektem)
+    są pomijane.
+    """
+    if "payload" in record and "source" in record:
+        source, record = record["source"], record["payload"]
+    if not isinstance(record, dict):
+        return
+
+    if source == "falco" or (source is None and "rule" in record):
+        fields = record.get("output_fields") or {}
+        if "rule" in record and isinstance(fields, dict):
+            yield (
+                "falco", str(record["rule"]), str(record.get("priority", "")),
+                fields, record.get("tags")
+            )
+        return
+
+    alerts = record.get("alerts") or ([record] if "labels" in record else [])
+    if not isinstance(alerts, list):
+        return
+    for alert in alerts:
+        if not isinstance(alert, dict) or alert.get("status") == "resolved":
+            continue
+        labels = alert.get("labels") or {}
+        if not isinstance(labels, dict):
+            continue
+        yield (
+            "prometheus", labels.get("alertname", ""), labels.get("severity", "warning"),
+            {"labels": labels, "annotations": alert.get("annotations") or {}, "status": alert.get("status")},
+            None
+        )
+
+
+def read_archive(path: str) -> Iterator[Dict[str, Any]]:
+    """Czyta rekordy NDJSON z pliku (.gz rozpakowywany w locie, "-" = stdin); pomija niepoprawne linie"""
+    if path == "-":
+        stream = sys.stdin.buffer
+    elif path.endswith(".gz"):
+        stream = gzip.open(path, "rb")
+    else:
+        stream = open(path, "rb")
+    try:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                yield record
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+
+def batched(records: Iterable[Dict[str, Any]], batch_size: int, source: Optional[str] = None) -> Iterator[List[Event]]:
+    """Grupuje znormalizowane zdarzenia w paczki o stałym rozmiarze"""
+    batch: List[Event] = []
+    for record in records:
+        batch.extend(normalize(source, record))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Tally:
+    """Liczniki akcji jednego zbioru reguł"""
+
+    def __init__(self):
+        self.actions = 0
+        self.counters: Dict[str, Counter] = {name: Counter() for name in DIMENSIONS}
+
+    def add(self, action: Dict[str, Any]):
+        self.actions += 1
+        namespace = action.get("namespace") or "default"
+        workload = action.get("deployment_name") or action.get("pod_name") or "-"
+        self.counters["by_type"][action["type"]] += 1
+        self.counters["by_rule"][f"{action['source']}/{action['rule']}"] += 1
+        self.counters["by_namespace"][namespace] += 1
+        self.counters["by_workload"][f"{namespace}/{workload}"] += 1
+
+    def report(self, top: int) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"actions": self.actions}
+        for name, counter in self.counters.items():
+            report[name] = dict(counter.most_common(top if name == "by_workload" else None))
+        return report
+
+
+def _diff(baseline: Counter, candidate: Counter) -> Dict[str, Dict[str, int]]:
+    changed = {}
+    for key in sorted(set(baseline) | set(candidate)):
+        b, c = baseline.get(key, 0), candidate.get(key, 0)
+        if b != c:
+            changed[key] = {"baseline": b, "candidate": c, "delta": c - b}
+    return changed
+
+
+class ShadowEvaluator:
+    """
+    Porównanie decyzji kandydackiego i bieżącego zbioru reguł na tych samych zdarzeniach
+
+    Oba zbiory oceniają silniki bez cache ani klienta (offline) albo silnik
+    kandydacki współdzielący cache informerów z silnikiem produkcyjnym (na
+    żywo). Zdarzenia są oceniane paczkami - decide_actions wyznacza kandydatów
+    raz na nazwę reguły w paczce.
+    """
+
+    def __init__(
+        self,
+        candidate: RemediationEngine,
+        baseline: RemediationEngine,
+        top: Optional[int] = None
+    ):
+        """
+        Args:
+            candidate: Silnik z regułami kandydackimi
+            baseline: Silnik z bieżącymi regułami (na żywo - silnik produkcyjny)
+            top: Liczba workloadów w raporcie
+        """
+        self.candidate = candidate
+        self.baseline = baseline
+        self.top = top or DEFAULT_TOP
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_configs(cls, candidate_config: Any, baseline_config: Any = None, cache=None, top: Optional[int] = None):
+        """Tworzy evaluator z konfiguracji reguł (bieżące reguły domyślnie z pliku reguł)"""
+        return cls(
+            RemediationEngine(cache=cache, rules_config=candidate_config),
+            RemediationEngine(cache=cache, rules_config=baseline_config),
+            top=top
+        )
+
+    def reset(self):
+        """Zeruje zebrane liczniki"""
+        with self._lock:
+            self.events = 0
+            self.batches = 0
+            self.seconds = 0.0
+            self.by_source: Counter = Counter()
+            self.changed = 0
+            self.transitions: Counter = Counter()
+            self.candidate_tally = _Tally()
+            self.baseline_tally = _Tally()
+
+    def evaluate(self, events: List[Event]):
+        """Ocenia paczkę zdarzeń obydwoma zbiorami reguł i dolicza wyniki do raportu"""
+        started = time.perf_counter()
+        by_source: Dict[str, List[Tuple]] = {}
+        for source, rule, priority, metadata, tags in events:
+            by_source.setdefault(source, []).append((rule, priority, metadata, tags))
+
+        decided = []
+        for source, batch in by_source.items():
+            decided.append((
+                source, len(batch),
+                self.baseline.decide_actions(source, batch),
+                self.candidate.decide_actions(source, batch)
+            ))
+
+        with self._lock:
+            self.batches += 1
+            for source, count, baseline, candidate in decided:
+                self.events += count
+                self.by_source[source] += count
+                for base, cand in zip(baseline, candidate):
+                    if base is not None:
+                        self.baseline_tally.add(base)
+                    if cand is not None:
+                        self.candidate_tally.add(cand)
+                    before = base["type"] if base is not None else "none"
+                    after = cand["type"] if cand is not None else "none"
+                    if before != after:
+                        self.changed += 1
+                        self.transitions[f"{before} -> {after}"] += 1
+            self.seconds += time.perf_counter() - started
+
+    def run(self, batches: Iterable[List[Event]]):
+        """Ocenia strumień paczek zdarzeń"""
+        for batch in batches:
+            self.evaluate(batch)
+
+    def report(self) -> Dict[str, Any]:
+        """Zwraca raport: akcje obu zbiorów reguł i różnice"""
+        with self._lock:
+            baseline = self.baseline_tally.report(self.top)
+            candidate = self.candidate_tally.report(self.top)
+            diff = {
+                name: _diff(self.baseline_tally.counters[name], self.candidate_tally.counters[name])
+                for name in DIMENSIONS if name != "by_workload"
+            }
+            workloads = _diff(self.baseline_tally.counters["by_workload"], self.candidate_tally.counters["by_workload"])
+            diff["by_workload"] = dict(
+                sorted(workloads.items(), key=lambda item: -abs(item[1]["delta"]))[:self.top]
+            )
+            return {
+                "events": self.events,
+                "by_source": dict(self.by_source),
+                "batches": self.batches,
+                "seconds": round(self.seconds, 3),
+                "events_per_second": round(self.events / self.seconds) if self.seconds else None,
+                "rules": {"baseline": len(self.baseline.rules), "candidate": len(self.candidate.rules)},
+                "baseline": baseline,
+                "candidate": candidate,
+                "diff": {
+                    "actions": candidate["actions"] - baseline["actions"],
+                    "changed_events": self.changed,
+                    "transitions": dict(self.transitions.most_common()),
+                    **diff
+                }
+            }
+
+
+class ShadowMode:
+    """
+    Ocena reguł kandydackich na żywym ruchu, obok silnika produkcyjnego
+
+    offer() tylko dopisuje surowe zdarzenie do ograniczonego bufora (przy
+    przepełnieniu zdarzenie jest pomijane i liczone), a normalizacja i ocena
+    odbywają się paczkami w wątku w tle - ścieżka żądania nie czeka na tryb
+    cienia. Bieżące reguły to aktywne reguły silnika produkcyjnego, więc
+    przeładowanie reguł od razu zmienia punkt odniesienia.
+    """
+
+    def __init__(
+        self,
+        evaluator: ShadowEvaluator,
+        buffer_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        interval: Optional[float] = None
+    ):
+        """
+        Args:
+            evaluator: Evaluator porównujący reguły kandydackie z produkcyjnymi
+            buffer_size: Maksymalna liczba zdarzeń czekających na ocenę
+            batch_size: Maksymalna liczba zdarzeń w jednej paczce
+            interval: Okres opróżniania bufora w sekundach
+        """
+        self.evaluator = evaluator
+        self.buffer_size = buffer_size or int(os.getenv("SHADOW_BUFFER_SIZE", DEFAULT_BUFFER_SIZE))
+        self.batch_size = batch_size or int(os.getenv("SHADOW_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.interval = interval or float(os.getenv("SHADOW_INTERVAL", DEFAULT_INTERVAL))
+        self._buffer: deque = deque()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.offered = 0
+        self.dropped = 0
+        self.invalid = 0
+        self.errors = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        """Czy tryb cienia jest włączony w konfiguracji"""
+        return bool(os.getenv("SHADOW_RULES_PATH"))
+
+    @classmethod
+    def from_env(cls, engine: RemediationEngine) -> "ShadowMode":
+        """Tworzy tryb cienia z regułami z SHADOW_RULES_PATH obok silnika produkcyjnego"""
+        path = os.environ["SHADOW_RULES_PATH"]
+        candidate = RemediationEngine(cache=engine.cache, rules_config=load_rules_config(path))
+        logger.info(f"Tryb cienia: {len(candidate.rules)} reguł kandydackich z {path}")
+        return cls(ShadowEvaluator(candidate, engine))
+
+    def offer(self, source: str, record: Dict[str, Any]):
+        """Przyjmuje kopię zdarzenia do oceny (bez blokowania); rekordy inne niż słownik są pomijane"""
+        self.offered += 1
+        if not isinstance(record, dict):
+            self.invalid += 1
+            return
+        if len(self._buffer) >= self.buffer_size:
+            self.dropped += 1
+            return
+        self._buffer.append((source, record))
+
+    def start(self):
+        """Uruchamia wątek oceny"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="shadow", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Zatrzymuje wątek oceny"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.drain()
+
+    def drain(self) -> int:
+        """Ocenia zdarzenia z bufora paczkami; zwraca liczbę ocenionych zdarzeń"""
+        evaluated = 0
+        while self._buffer:
+            batch: List[Event] = []
+            while self._buffer and len(batch) < self.batch_size:
+                source, record = self._buffer.popleft()
+                try:
+                    batch.extend(list(normalize(source, record)))
+                except Exception as e:
+                    # Np. alerty niebędące obiektami - jeden rekord nie zatrzymuje wątku oceny
+                    self.invalid += 1
+                    logger.debug(f"Pominięto niepoprawny rekord trybu cienia ({source}): {e}")
+            try:
+                self.evaluator.evaluate(batch)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Błąd oceny paczki trybu cienia: {e}")
+            evaluated += len(batch)
+        return evaluated
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca stan bufora trybu cienia"""
+        return {
+            "offered": self.offered,
+            "dropped": self.dropped,
+            "invalid": self.invalid,
+            "pending": len(self._buffer),
+            "errors": self.errors,
+            "buffer_size": self.buffer_size,
+            "batch_size": self.batch_size
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ocena kandydackich reguł naprawczych na archiwum zdarzeń (bez klastra)")
+    parser.add_argument("archives", nargs="+", help="Pliki NDJSON (.gz dozwolone, - = stdin)")
+    parser.add_argument("--candidate", required=True, help="Plik z regułami kandydackimi (YAML)")
+    parser.add_argument("--baseline", help="Plik z bieżącymi regułami (domyślnie REMEDIATION_RULES_PATH)")
+    parser.add_argument("--source", choices=("falco", "prometheus"),
+                        help="Źródło rekordów bez koperty zapisu ruchu (domyślnie rozpoznawane)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Liczba workloadów w raporcie")
+    parser.add_argument("--output", help="Plik wynikowy JSON (domyślnie stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Jedna linia logu na zdarzenie przy milionach zdarzeń to więcej pracy niż sama ocena
+    logging.basicConfig(level=logging.WARNING)
+
+    evaluator = ShadowEvaluator.from_configs(
+        load_rules_config(args.candidate),
+        load_rules_config(args.baseline),
+        top=args.top
+    )
+    started = time.perf_counter()
+    for path in args.archives:
+        evaluator.run(batched(read_archive(path), args.batch_size, args.source))
+
+    report = evaluator.report()
+    report["archives"] = args.archives
+    report["wall_seconds"] = round(time.perf_counter() - started, 3)
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+"""
+Podział pracy między repliki webhooka (sharding) koordynowany przez obiekty Lease.
+Każda replika odnawia własny Lease; żywe Lease wyznaczają członków pierścienia
+spójnego haszowania, a pierścień przypisuje namespace (lub workload) do jednej
+repliki. Akcje trafiające do repliki, która nie jest właścicielem, są
+przekazywane właścicielowi albo odrzucane.
+"""
+import bisect
+import datetime
+import hashlib
+import hmac
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import urllib3
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import ConnectTimeoutError, HTTPError, NewConnectionError
+
+from kube_client import LazyApi
+from metrics import InstrumentedApi
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_DURATION = 15.0
+DEFAULT_VNODES = 64
+DEFAULT_FORWARD_TIMEOUT = 5.0
+DEFAULT_FORWARD_CONNECT_TIMEOUT = 1.0
+DEFAULT_FORWARD_POOL_SIZE = 8
+DEFAULT_LEASE_PREFIX = "autoheal-shard"
+
+SHARD_LABEL = "app.kubernetes.io/component"
+SHARD_LABEL_VALUE = "autoheal-shard"
+ADDRESS_ANNOTATION = "autoheal.io/address"
+
+# Nagłówek akcji przekazanych przez inną replikę - nie są przekazywane dalej
+FORWARDED_HEADER = "X-Autoheal-Forwarded"
+# Wspólny sekret replik (SHARD_PEER_TOKEN) wymagany przez POST /internal/actions
+PEER_TOKEN_HEADER = "X-Autoheal-Peer-Token"
+
+SHARD_KEYS = ("namespace", "workload")
+NON_OWNER_MODES = ("forward", "drop")
+
+
+class ForwardError(Exception):
+    """Przekazanie akcji replice-właścicielowi nie powiodło się"""
+
+
+class PeerUnreachableError(ForwardError):
+    """Nie udało się połączyć z właścicielem - żądanie do niego nie dotarło"""
+
+
+class PeerRejectedError(ForwardError):
+    """Właściciel odpowiedział błędem HTTP - akcje nie zostały przyjęte"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+class PeerUnconfirmedError(ForwardError):
+    """Żądanie dotarło, ale bez odpowiedzi (np. timeout odczytu) - właściciel mógł przyjąć akcje"""
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Pierścień spójnego haszowania z wirtualnymi węzłami"""
+
+    def __init__(self, members: List[str], vnodes: int = DEFAULT_VNODES):
+        """
+        Args:
+            members: Identyfikatory członków
+            vnodes: Liczba wirtualnych węzłów na członka (wyrównuje rozkład kluczy)
+        """
+        self.members = sorted(set(members))
+        points = sorted(
+            (_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(vnodes)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Zwraca członka odpowiedzialnego za klucz (None dla pustego pierścienia)"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class FakeLeaseStore:
+    """
+    Magazyn Lease bez Kubernetes - do uruchamiania kilku replik lokalnie i w testach
+
+    Bez ścieżki Lease są trzymane w pamięci (jedną instancję można współdzielić
+    między koordynatorami w jednym procesie). Ze ścieżką są zapisywane w pliku
+    JSON, więc repliki uruchomione jako osobne procesy widzą się nawzajem.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Opcjonalny plik JSON współdzielony przez procesy
+        """
+        self.path = path
+        self._leases: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self.path is None:
+            return self._leases
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, leases: Dict[str, Dict[str, Any]]):
+        if self.path is None:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(leases, f)
+        os.replace(tmp, self.path)
+
+    def renew(self, identity: str, address: str, duration: float, now: float):
+        """Tworzy lub odnawia Lease członka"""
+        with self._lock:
+            leases = self._load()
+            leases[identity] = {
+                "identity": identity,
+                "address": address,
+                "renew_time": now,
+                "duration": duration
+            }
+            self._save(leases)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Zwraca wszystkie Lease (także wygasłe)"""
+        with self._lock:
+            return [dict(lease) for lease in self._load().values()]
+
+    def release(self, identity: str):
+        """Usuwa Lease członka (zamknięcie repliki)"""
+        with self._lock:
+            leases = self._load()
+            leases.pop(identity, None)
+            self._save(leases)
+
+
+class KubernetesLeaseStore:
+    """Magazyn Lease oparty na coordination.k8s.io/v1"""
+
+    def __init__(self, coordination_v1, namespace: str, prefix: str = DEFAULT_LEASE_PREFIX):
+        """
+        Args:
+            coordination_v1: Klient CoordinationV1Api
+            namespace: Namespace obiektów Lease
+            prefix: Prefiks nazw Lease (nazwa = prefiks-identyfikator)
+        """
+        self.api = coordination_v1
+        self.namespace = namespace
+        self.prefix = prefix
+
+    def _body(self, identity: str, address: str, duration: float, now: float):
+        return client.V1Lease(
+            metadata=client.V1ObjectMeta(
+                name=f"{self.prefix}-{identity}",
+                labels={SHARD_LABEL: SHARD_LABEL_VALUE},
+                annotations={ADDRESS_ANNOTATION: address}
+            ),
+            spec=client.V1LeaseSpec(
+                holder_identity=identity,
+                lease_duration_seconds=int(duration),
+                renew_time=datetime.datetime.fromtimestamp(now, tz=datetime.timezone.utc)
+            )
+        )
+
+    def renew(self, identity: str, address: str, duration: float, now: float):
+        """Tworzy lub odnawia Lease członka"""
+        body = self._body(identity, address, duration, now)
+        try:
+            self.api.patch_namespaced_lease(body.metadata.name, self.namespace, body)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            self.api.create_namespaced_lease(self.namespace, body)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Zwraca wszystkie Lease shardów (także wygasłe)"""
+        response = self.api.list_namespaced_lease(
+            self.namespace, label_selector=f"{SHARD_LABEL}={SHARD_LABEL_VALUE}"
+        )
+        leases = []
+        for lease in response.items:
+            spec = lease.spec
+            if spec is None or not spec.holder_identity or spec.renew_time is None:
+                continue
+            leases.append({
+                "identity": spec.holder_identity,
+                "address": (lease.metadata.annotations or {}).get(ADDRESS_ANNOTATION),
+                "renew_time": spec.renew_time.timestamp(),
+                "duration": float(spec.lease_duration_seconds or DEFAULT_LEASE_DURATION)
+            })
+        return leases
+
+    def release(self, identity: str):
+        """Usuwa Lease członka (zamknięcie repliki)"""
+        try:
+            self.api.delete_namespaced_lease(f"{self.prefix}-{identity}", self.namespace)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+
+
+class ShardCoordinator:
+    """
+    Członkostwo repliki w pierścieniu i wyznaczanie właściciela akcji
+
+    Wątek w tle odnawia własny Lease co lease_duration / 3 i przebudowuje
+    pierścień z żywych Lease. Gdy magazyn Lease jest niedostępny, obowiązuje
+    ostatni znany pierścień.
+    """
+
+    def __init__(
+        self,
+        store,
+        identity: str,
+        address: str,
+        shard_key: Optional[str] = None,
+        non_owner: Optional[str] = None,
+        lease_duration: Optional[float] = None,
+        vnodes: int = DEFAULT_VNODES,
+        clock=time.time,
+        peer_token: Optional[str] = None
+    ):
+        """
+        Args:
+            store: Magazyn Lease (KubernetesLeaseStore lub FakeLeaseStore)
+            identity: Identyfikator repliki (np. nazwa poda)
+            address: Adres, pod którym inne repliki przekazują akcje (np. http://10.0.0.5:8000)
+            shard_key: "namespace" lub "workload" - jednostka przypisywana replice
+            non_owner: "forward" (przekazanie właścicielowi) lub "drop" (odrzucenie akcji)
+            lease_duration: Czas ważności Lease w sekundach
+            vnodes: Liczba wirtualnych węzłów na replikę
+            clock: Źródło czasu (epoch - porównywane z renewTime innych replik)
+            peer_token: Wspólny sekret replik uwierzytelniający przekazane akcje
+        """
+        self.store = store
+        self.identity = identity
+        self.address = address
+        self.shard_key = shard_key or os.getenv("SHARD_KEY", "namespace")
+        if self.shard_key not in SHARD_KEYS:
+            raise ValueError(f"SHARD_KEY must be one of {SHARD_KEYS}, got '{self.shard_key}'")
+        self.non_owner = non_owner or os.getenv("SHARD_NON_OWNER", "forward")
+        if self.non_owner not in NON_OWNER_MODES:
+            raise ValueError(f"SHARD_NON_OWNER must be one of {NON_OWNER_MODES}, got '{self.non_owner}'")
+        self.lease_duration = lease_duration or float(
+            os.getenv("SHARD_LEASE_DURATION", DEFAULT_LEASE_DURATION)
+        )
+        self.peer_token = peer_token or os.getenv("SHARD_PEER_TOKEN", "")
+        if not self.peer_token:
+            # Bez sekretu każdy w sieci klastra mógłby zlecać akcje przez /internal/actions
+            raise ValueError("SHARD_PEER_TOKEN is required when sharding is enabled")
+        self.vnodes = vnodes
+        self._clock = clock
+        self._ring = HashRing([identity], vnodes)
+        self._addresses: Dict[str, str] = {identity: address}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.rebalances = 0
+        self.heartbeat_failures = 0
+        self.forwarded = 0
+        self.dropped = 0
+        self.taken_over = 0
+        self.forward_rejected = 0
+        self.forward_unconfirmed = 0
+        self.forward_timeout = float(os.getenv("SHARD_FORWARD_TIMEOUT", DEFAULT_FORWARD_TIMEOUT))
+        self.forward_connect_timeout = float(
+            os.getenv("SHARD_FORWARD_CONNECT_TIMEOUT", DEFAULT_FORWARD_CONNECT_TIMEOUT)
+        )
+        # Pula połączeń keep-alive do innych replik; bez ponowień - POST nie jest idempotentny
+        self._http = urllib3.PoolManager(
+            maxsize=int(os.getenv("SHARD_FORWARD_POOL_SIZE", DEFAULT_FORWARD_POOL_SIZE)),
+            retries=False
+        )
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """Czy sharding jest włączony w konfiguracji"""
+        return os.getenv("SHARDING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    @classmethod
+    def from_env(cls) -> "ShardCoordinator":
+        """
+        Tworzy koordynatora na podstawie zmiennych środowiskowych
+
+        Lease są trzymane w Kubernetes, a przy ustawionym SHARD_LEASE_FILE
+        w lokalnym pliku (kilka replik na jednej maszynie, bez klastra).
+        """
+        identity = os.getenv("SHARD_IDENTITY") or os.getenv("HOSTNAME") or socket.gethostname()
+        address = os.getenv("SHARD_ADVERTISE_ADDRESS") or (
+            f"http://{os.getenv('POD_IP', socket.gethostname())}:{os.getenv('PORT', '8000')}"
+        )
+        lease_file = os.getenv("SHARD_LEASE_FILE")
+        if lease_file:
+            store = FakeLeaseStore(lease_file)
+        else:
+            namespace = os.getenv("SHARD_NAMESPACE") or os.getenv("POD_NAMESPACE", "default")
+            store = KubernetesLeaseStore(InstrumentedApi(LazyApi(client.CoordinationV1Api)), namespace)
+        return cls(store, identity, address)
+
+    def start(self) -> bool:
+        """
+        Rejestruje replikę i uruchamia wątek odnawiający Lease
+
+        Błąd pierwszej rejestracji jest zgłaszany (krok rozgrzewania jest
+        ponawiany, a readiness czeka), zamiast startu z pierścieniem jednej repliki.
+
+        Returns:
+            True po rejestracji
+        """
+        if self._thread is not None:
+            return True
+        self.heartbeat(raise_errors=True)
+        self._thread = threading.Thread(target=self._run, name="shard-coordinator", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Zatrzymuje odnawianie i zwalnia Lease, żeby pozostałe repliki przejęły klucze"""
+        self._stop.set()
+        try:
+            self.store.release(self.identity)
+        except Exception as e:
+            logger.warning(f"Nie udało się zwolnić Lease repliki {self.identity}: {e}")
+        self._http.clear()
+
+    def _run(self):
+        while not self._stop.wait(self.lease_duration / 3):
+            self.heartbeat()
+
+    def heartbeat(self, raise_errors: bool = False) -> bool:
+        """
+        Odnawia własny Lease i przebudowuje pierścień z żywych członków
+
+        Args:
+            raise_errors: Czy zgłaszać błąd magazynu Lease (inaczej obowiązuje ostatni pierścień)
+
+        Returns:
+            True jeśli skład pierścienia się zmienił
+        """
+        now = self._clock()
+        try:
+            self.store.renew(self.identity, self.address, self.lease_duration, now)
+            leases = self.store.list()
+        except Exception as e:
+            self.heartbeat_failures += 1
+            logger.error(f"Błąd odnawiania Lease repliki {self.identity}: {e}")
+            if raise_errors:
+                raise
+            return False
+
+        addresses = {
+            lease["identity"]: lease["address"]
+            for lease in leases
+            if lease["renew_time"] + lease["duration"] > now
+        }
+        addresses[self.identity] = self.address
+        if sorted(addresses) == self._ring.members:
+            self._addresses = addresses
+            return False
+
+        self._ring = HashRing(list(addresses), self.vnodes)
+        self._addresses = addresses
+        self.rebalances += 1
+        logger.info(f"Zmiana składu shardów: {len(addresses)} replik {self._ring.members}")
+        return True
+
+    def key(self, action: Dict[str, Any]) -> str:
+        """Klucz shardu akcji"""
+        namespace = action.get("namespace", "default")
+        if action.get("cluster"):
+            # Ten sam namespace w różnych klastrach to różne klucze
+            namespace = f"{action['cluster']}:{namespace}"
+        if self.shard_key == "namespace":
+            return namespace
+        return f"{namespace}/{action.get('deployment_name') or action.get('pod_name')}"
+
+    def owner(self, action: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """Zwraca (identyfikator, adres) repliki odpowiedzialnej za akcję"""
+        owner = self._ring.owner(self.key(action)) or self.identity
+        return owner, self._addresses.get(owner)
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Czy token z żądania /internal/actions to wspólny sekret replik"""
+        return bool(token) and hmac.compare_digest(token.encode(), self.peer_token.encode())
+
+    def is_owner(self, action: Dict[str, Any]) -> bool:
+        """Czy ta replika odpowiada za akcję"""
+        return self.owner(action)[0] == self.identity
+
+    def forward(
+        self,
+        address: str,
+        actions: List[Dict[str, Any]],
+        wait: bool = False,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Przekazuje akcje właścicielowi (POST /internal/actions) - wywołanie blokujące
+
+        Args:
+            address: Adres repliki-właściciela
+            actions: Akcje do wykonania
+            wait: Czy właściciel ma odpowiedzieć dopiero z wynikami akcji
+            timeout: Limit czasu żądania w sekundach
+
+        Returns:
+            Odpowiedź repliki-właściciela
+
+        Raises:
+            PeerUnreachableError: Brak połączenia (odmowa, DNS, timeout połączenia) - akcje nie dotarły
+            PeerRejectedError: Właściciel odpowiedział statusem błędu (np. 401, 422, 503)
+            PeerUnconfirmedError: Żądanie wysłane, brak odpowiedzi - właściciel mógł przyjąć akcje
+        """
+        timeout = timeout or self.forward_timeout
+        try:
+            response = self._http.request(
+                "POST",
+                f"{address.rstrip('/')}/internal/actions",
+                body=json.dumps({"actions": actions, "wait": wait}, default=str).encode(),
+                headers={
+                    "Content-Type": "application/json",
+                    FORWARDED_HEADER: self.identity,
+                    PEER_TOKEN_HEADER: self.peer_token
+                },
+                timeout=urllib3.Timeout(connect=min(self.forward_connect_timeout, timeout), read=timeout)
+            )
+        except (NewConnectionError, ConnectTimeoutError) as e:
+            raise PeerUnreachableError(str(e)) from e
+        except HTTPError as e:
+            raise PeerUnconfirmedError(str(e)) from e
+        if response.status >= 300:
+            raise PeerRejectedError(response.status, response.data.decode(errors="replace")[:200])
+        self.forwarded += len(actions)
+        return json.loads(response.data or b"{}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca stan shardingu"""
+        return {
+            "identity": self.identity,
+            "shard_key": self.shard_key,
+            "non_owner": self.non_owner,
+            "members": self._ring.members,
+            "rebalances": self.rebalances,
+            "heartbeat_failures": self.heartbeat_failures,
+            "forwarded": self.forwarded,
+            "dropped": self.dropped,
+            "taken_over": self.taken_over,
+            "forward_rejected": self.forward_rejected,
+            "forward_unconfirmed": self.forward_unconfirmed
+        }
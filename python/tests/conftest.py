@@ -0,0 +1,131 @@
+"""
+Wspólne fixture'y testów webhooka.
+
+Testy importują moduły z katalogu python/ bezpośrednio (jak uvicorn w obrazie),
+a zasoby Kubernetes budują z modeli klienta - bez klastra.
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+from kubernetes import client
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(HERE)), "benchmarks"))
+
+
+def owner(kind: str, name: str) -> client.V1OwnerReference:
+    return client.V1OwnerReference(api_version="apps/v1", kind=kind, name=name, uid=f"uid-{name}", controller=True)
+
+
+def make_pod(namespace: str, name: str, replicaset: str = None, resource_version: str = "1", container_id: str = None):
+    """Pod (opcjonalnie kontrolowany przez ReplicaSet) z jednym działającym kontenerem"""
+    statuses = None
+    if container_id:
+        statuses = [client.V1ContainerStatus(
+            name="app", container_id=f"containerd://{container_id}", image="app", image_id="app",
+            ready=True, restart_count=0, state=client.V1ContainerState(running=client.V1ContainerStateRunning())
+        )]
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(
+            namespace=namespace, name=name, uid=f"uid-{name}", resource_version=resource_version,
+            owner_references=[owner("ReplicaSet", replicaset)] if replicaset else None
+        ),
+        status=client.V1PodStatus(container_statuses=statuses)
+    )
+
+
+def make_replicaset(namespace: str, name: str, deployment: str, revision: int = 1, resource_version: str = "1"):
+    """ReplicaSet deploymentu z adnotacją rewizji"""
+    return client.V1ReplicaSet(metadata=client.V1ObjectMeta(
+        namespace=namespace, name=name, resource_version=resource_version,
+        annotations={"deployment.kubernetes.io/revision": str(revision)},
+        owner_references=[owner("Deployment", deployment)]
+    ))
+
+
+def make_deployment(namespace: str, name: str, resource_version: str = "1"):
+    return client.V1Deployment(metadata=client.V1ObjectMeta(
+        namespace=namespace, name=name, resource_version=resource_version
+    ))
+
+
+class ListResult:
+    """Odpowiedź funkcji listującej: items + metadata.resource_version"""
+
+    def __init__(self, items, resource_version: str):
+        self.items = items
+        self.metadata = client.V1ListMeta(resource_version=resource_version)
+
+
+class FakeLister:
+    """Funkcja listująca zwracająca kolejne stany (ostatni powtarzany); scripts - skrypty jej watch"""
+
+    def __init__(self, *states):
+        self.states = list(states)
+        self.calls = 0
+        self.scripts = None
+
+    def __call__(self, **kwargs):
+        state = self.states[min(self.calls, len(self.states) - 1)]
+        self.calls += 1
+        return state
+
+
+class FakeWatch:
+    """
+    Fałszywy kubernetes.watch.Watch: każde połączenie odtwarza kolejny skrypt
+    (lista zdarzeń albo wyjątek), po wyczerpaniu skryptów czeka na stop().
+    Skrypty pochodzą z FakeLister.scripts (jeśli ustawione) albo ze wspólnej listy.
+    """
+
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.resource_versions = []
+        self._stopped = threading.Event()
+
+    def stream(self, func, resource_version=None, **kwargs):
+        self.resource_versions.append(resource_version)
+        scripts = getattr(func, "scripts", None)
+        if scripts is None:
+            scripts = self.scripts
+        if not scripts:
+            self._stopped.wait(5)
+            return
+        script = scripts.pop(0)
+        if isinstance(script, Exception):
+            raise script
+        yield from script
+
+    def stop(self):
+        self._stopped.set()
+
+
+@pytest.fixture
+def watch_factory():
+    """Fabryka FakeWatch współdzieląca skrypty między połączeniami; .watches - utworzone obiekty"""
+
+    class Factory:
+        def __init__(self):
+            self.scripts = []
+            self.watches = []
+
+        def __call__(self):
+            w = FakeWatch(self.scripts)
+            self.watches.append(w)
+            return w
+
+    return Factory()
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    """Czeka (polling) aż warunek będzie spełniony"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
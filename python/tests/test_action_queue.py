@@ -0,0 +1,114 @@
+"""Testy kolejki akcji: dziennik i kolejność pasów priorytetów dla akcji alertów"""
+import asyncio
+import importlib
+import sqlite3
+import sys
+
+import httpx
+
+from action_queue import ActionQueue
+from journal import ActionJournal
+
+
+class Executor:
+    """Wykonawca zgłaszający wyjątek dla akcji oznaczonych "boom\""""
+
+    async def run(self, action):
+        if action.get("boom"):
+            raise RuntimeError("API exploded")
+        return {"status": "success"}
+
+
+def journal_states(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT event_id, state FROM actions").fetchall())
+    finally:
+        conn.close()
+
+
+def test_failed_action_is_completed_in_journal(tmp_path):
+    path = str(tmp_path / "journal.db")
+    journal = ActionJournal(path, max_delay_ms=0)
+    journal.start()
+    actions = [
+        {"type": "delete_pod", "namespace": "ns", "pod_name": "a", "event_id": "ok"},
+        {"type": "delete_pod", "namespace": "ns", "pod_name": "b", "event_id": "bad", "boom": True},
+    ]
+
+    async def run():
+        queue = ActionQueue(Executor(), maxsize=10, workers=2, drain_timeout=5, journal=journal)
+        queue.start()
+        for action in actions:
+            assert await journal.append(action["event_id"], action)
+        results = await asyncio.gather(*(queue.execute(action) for action in actions))
+        await queue.shutdown()
+        return queue, results
+
+    queue, results = asyncio.run(run())
+    journal.close()
+
+    assert [r["status"] for r in results] == ["success", "error"]
+    assert queue.failed == 1
+    assert journal_states(path) == {"ok": "done", "bad": "failed"}
+    # Nieudana akcja nie jest odtwarzana po restarcie
+    assert ActionJournal(path).pending() == []
+    assert journal.stats()["failed"] == 1
+
+
+def test_critical_alert_action_is_dequeued_before_queued_low_priority_work(monkeypatch):
+    monkeypatch.setenv("REMEDIATION_QUEUE_WORKERS", "1")
+    sys.modules.pop("auto_heal_webhook", None)
+    w = importlib.import_module("auto_heal_webhook")
+    executed = []
+    release = asyncio.Event()
+
+    async def run(action):
+        executed.append(action.get("deployment_name") or action["pod_name"])
+        if action.get("pod_name") == "blocker":
+            await release.wait()
+        return {"status": "success"}
+
+    monkeypatch.setattr(w.action_executor, "run", run)
+    low = [
+        {"type": "restart_pod", "namespace": "shop", "pod_name": name, "priority": "WARNING", "rule": "r"}
+        for name in ("blocker", "low-1", "low-2", "low-3")
+    ]
+    alert = {
+        "status": "firing",
+        "labels": {"alertname": "PodCrashLooping", "severity": "critical", "namespace": "shop", "deployment": "api"},
+        "annotations": {},
+        "startsAt": "2024-01-01T00:00:00Z",
+    }
+
+    async def main():
+        w.action_queue.start()
+        try:
+            for action in low:
+                w.action_queue.submit(action)
+            # Jedyny worker czeka na "blocker"; w kolejce trzy akcje WARNING
+            while executed != ["blocker"]:
+                await asyncio.sleep(0.01)
+            transport = httpx.ASGITransport(app=w.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+                request = asyncio.ensure_future(c.post("/webhook/prometheus", json=alert))
+                for _ in range(500):
+                    if w.action_queue.depth() == len(low) or request.done():
+                        break
+                    await asyncio.sleep(0.01)
+                # Akcja alertu czeka w kolejce za akcjami WARNING, a nie omija jej
+                queued = (w.action_queue.depth(), list(executed))
+                release.set()
+                return queued, await request
+        finally:
+            await w.action_queue.shutdown()
+
+    try:
+        queued, response = asyncio.run(main())
+    finally:
+        sys.modules.pop("auto_heal_webhook", None)
+
+    assert queued == (len(low), ["blocker"])
+    assert response.status_code == 200
+    assert response.json()["result"]["status"] == "success"
+    assert executed == ["blocker", "api", "low-1", "low-2", "low-3"]
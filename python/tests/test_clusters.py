@@ -0,0 +1,135 @@
+"""
+Testy wielu klastrów: każdy dodatkowy klaster ma własny klient API, cooldown,
+circuit breaker i kolejkę, a zdarzenia nieznanego klastra są odrzucane.
+"""
+import asyncio
+
+import pytest
+
+from action_queue import ActionQueue
+from clusters import ClusterRouter, UnknownClusterError
+from executor import ActionExecutor
+from fake_k8s import FakeApiServer, FakeCluster
+from remediation import RemediationEngine
+
+SCALE_UP = {"type": "scale_up", "namespace": "shop", "deployment_name": "app-0", "priority": "WARNING", "rule": "r"}
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    monkeypatch.setenv("KUBE_RETRIES", "0")
+    monkeypatch.setenv("REMEDIATION_COOLDOWN_SECONDS", "300")
+    monkeypatch.setenv("REMEDIATION_BREAKER_FAILURES", "2")
+    servers = {
+        "a": FakeApiServer(FakeCluster(error_rate=1.0, error_codes=(500,))),
+        "b": FakeApiServer(FakeCluster()),
+    }
+    for server in servers.values():
+        server.start()
+    yield servers
+    for server in servers.values():
+        server.stop()
+
+
+@pytest.fixture
+def router(servers, tmp_path):
+    specs = []
+    for name, server in servers.items():
+        path = tmp_path / f"{name}.kubeconfig"
+        path.write_text(server.kubeconfig())
+        specs.append({"name": name, "kubeconfig": str(path), "hosts": [f"{name}-node-*"]})
+    engine = RemediationEngine()
+    executor = ActionExecutor(engine)
+    return ClusterRouter(engine, executor, ActionQueue(executor), specs, local_name="local")
+
+
+def execute_all(router, actions):
+    async def run():
+        router.queue.start()
+        router.start()
+        try:
+            return [await router.execute(action) for action in actions]
+        finally:
+            await router.shutdown()
+            await router.queue.shutdown()
+    return asyncio.run(run())
+
+
+def test_each_cluster_has_its_own_client_and_queue(router, servers):
+    a, b = router.get("a"), router.get("b")
+
+    assert a.api_client() is not b.api_client()
+    assert a.api_client().configuration.host == servers["a"].url
+    assert b.api_client().configuration.host == servers["b"].url
+    assert len({id(router.queue), id(a.queue), id(b.queue)}) == 3
+    assert router.queue_for(dict(SCALE_UP, cluster="a")) is a.queue
+    assert router.queue_for(SCALE_UP) is router.queue
+    assert router.executor_for(dict(SCALE_UP, cluster="b")) is b.executor
+    # Ta sama instancja przy kolejnych odwołaniach
+    assert router.get("a") is a
+
+
+def test_actions_reach_only_their_cluster(router, servers):
+    results = execute_all(router, [dict(SCALE_UP, cluster="b")])
+
+    assert results[0]["status"] == "success"
+    assert servers["b"].cluster.stats()["namespaces"] == {"shop": 2}
+    assert servers["a"].cluster.stats()["total_calls"] == 0
+
+
+def test_cooldown_is_per_cluster(router, servers):
+    servers["a"].cluster.error_rate = 0.0
+    results = execute_all(router, [
+        dict(SCALE_UP, cluster="a"), dict(SCALE_UP, cluster="a"), dict(SCALE_UP, cluster="b")
+    ])
+
+    # Powtórzenie w klastrze a jest tłumione, ta sama akcja w klastrze b - nie
+    assert [r["status"] for r in results] == ["success", "suppressed", "success"]
+
+
+def test_circuit_breaker_is_per_cluster(router, servers):
+    # Różne deploymenty - cooldown nie tłumi kolejnych prób w klastrze a
+    failing = [dict(SCALE_UP, cluster="a", deployment_name=f"app-{i}") for i in range(3)]
+    results = execute_all(router, failing + [dict(SCALE_UP, cluster="b")])
+
+    assert [r["status"] for r in results] == ["error", "error", "circuit_open", "success"]
+    assert router.get("a").executor.breaker.state == "open"
+    assert router.get("b").executor.breaker.state == "closed"
+    assert router.executor.breaker.state == "closed"
+
+
+def test_unknown_cluster_is_rejected(router):
+    assert router.route(header="nope") is None
+    assert router.route(labels={"cluster": "nope"}) is None
+    assert router.route(hostname="other-node-1") == "local"
+    assert router.route(hostname="a-node-3") == "a"
+    assert router.unrouted == 2
+
+    with pytest.raises(UnknownClusterError):
+        router.get("nope")
+    with pytest.raises(UnknownClusterError):
+        router.queue_for(dict(SCALE_UP, cluster="nope"))
+    assert execute_all(router, [dict(SCALE_UP, cluster="nope")])[0]["status"] == "unrouted"
+    assert "nope" not in router.stats()["clusters"]
+
+
+def test_cluster_with_informer_does_not_build_client_on_first_event(servers, tmp_path):
+    path = tmp_path / "a.kubeconfig"
+    path.write_text(servers["a"].kubeconfig())
+    engine = RemediationEngine()
+    executor = ActionExecutor(engine)
+    router = ClusterRouter(
+        engine, executor, ActionQueue(executor), [{"name": "a", "kubeconfig": str(path), "informer": True}],
+        local_name="local"
+    )
+
+    cluster = router.get("a")
+
+    # get() działa w pętli zdarzeń - kubeconfig wczytuje dopiero wątek informera
+    assert cluster.cache is not None
+    assert cluster._api_client is None
+
+
+def test_local_cluster_name_cannot_be_configured(router):
+    with pytest.raises(ValueError):
+        ClusterRouter(router.engine, router.executor, router.queue, [{"name": "local", "kubeconfig": "x"}], local_name="local")
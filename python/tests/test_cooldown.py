@@ -0,0 +1,73 @@
+"""Testy cache cooldownu: wygasanie po TTL i wypieranie LRU (sztuczny zegar)"""
+from cooldown import CooldownCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def key(pod):
+    return ("delete_pod", "shop", pod)
+
+
+def test_repeat_is_suppressed_until_window_expires():
+    clock = Clock()
+    cache = CooldownCache(window=60.0, max_entries=10, clock=clock)
+
+    assert cache.check_and_mark(key("a")) is False
+    clock.now = 59.9
+    assert cache.check_and_mark(key("a")) is True
+    # Stłumione powtórzenie nie przedłuża okna
+    clock.now = 60.0
+    assert cache.check_and_mark(key("a")) is False
+    assert cache.check_and_mark(key("a")) is True
+    assert cache.stats()["suppressed"] == 2
+    assert cache.stats()["suppressed_by_type"] == {"delete_pod": 2}
+
+
+def test_expired_entries_are_purged():
+    clock = Clock()
+    cache = CooldownCache(window=10.0, max_entries=10, clock=clock)
+    for pod in ("a", "b", "c"):
+        cache.check_and_mark(key(pod))
+
+    clock.now = 10.0
+    cache.check_and_mark(key("d"))
+
+    assert len(cache) == 1
+    assert cache.stats()["evicted"] == 0
+
+
+def test_least_recently_used_key_is_evicted_at_capacity():
+    clock = Clock()
+    cache = CooldownCache(window=60.0, max_entries=2, clock=clock)
+    cache.check_and_mark(key("a"))
+    cache.check_and_mark(key("b"))
+    # Trafienie odświeża a - najdawniej używany jest teraz b
+    assert cache.check_and_mark(key("a")) is True
+
+    cache.check_and_mark(key("c"))
+
+    assert len(cache) == 2
+    assert cache.stats()["evicted"] == 1
+    assert cache.check_and_mark(key("a")) is True
+    assert cache.check_and_mark(key("c")) is True
+    # Wyparty b nie jest już tłumiony
+    assert cache.check_and_mark(key("b")) is False
+
+
+def test_released_key_can_run_again():
+    cache = CooldownCache(window=60.0, max_entries=10, clock=Clock())
+    cache.check_and_mark(key("a"))
+    cache.release(key("a"))
+    assert cache.check_and_mark(key("a")) is False
+
+
+def test_zero_window_disables_deduplication():
+    cache = CooldownCache(window=0, max_entries=10, clock=Clock())
+    assert [cache.check_and_mark(key("a")) for _ in range(3)] == [False, False, False]
+    assert len(cache) == 0
@@ -0,0 +1,79 @@
+"""Testy okna korelacji akcji"""
+import asyncio
+
+from correlation import CorrelationWindow
+
+
+def action(action_type, pod=None, priority="WARNING", deployment="web"):
+    a = {"type": action_type, "namespace": "ns", "deployment_name": deployment, "priority": priority, "rule": action_type}
+    if pod:
+        a["pod_name"] = pod
+    return a
+
+
+def correlate(*actions):
+    """Podaje akcje do jednego okna i zwraca (wyniki w kolejności, wykonane akcje)"""
+    executed = []
+
+    async def dispatch(a):
+        executed.append((a["type"], a.get("pod_name")))
+        return {"status": "success"}
+
+    async def run():
+        window = CorrelationWindow(dispatch, window=0.01, max_keys=100)
+        futures = [window.offer(a) for a in actions]
+        results = await asyncio.gather(*futures)
+        return [r["status"] for r in results], window.stats()
+
+    statuses, stats = asyncio.run(run())
+    return statuses, sorted(executed, key=str), stats
+
+
+def test_deletes_of_different_pods_are_all_executed():
+    statuses, executed, stats = correlate(
+        action("delete_pod", "web-b"), action("delete_pod", "web-a"), action("delete_pod", "web-c")
+    )
+    assert statuses == ["success"] * 3
+    assert executed == [("delete_pod", "web-a"), ("delete_pod", "web-b"), ("delete_pod", "web-c")]
+    assert stats["superseded"] == 0
+
+
+def test_same_pod_actions_keep_one_winner():
+    statuses, executed, _ = correlate(action("restart_pod", "web-a"), action("delete_pod", "web-a"))
+    assert statuses == ["superseded", "success"]
+    assert executed == [("delete_pod", "web-a")]
+
+
+def test_pod_actions_outranking_workload_action_all_win():
+    statuses, executed, _ = correlate(
+        action("scale_up"), action("delete_pod", "web-a"), action("delete_pod", "web-b")
+    )
+    assert statuses == ["superseded", "success", "success"]
+    assert executed == [("delete_pod", "web-a"), ("delete_pod", "web-b")]
+
+
+def test_workload_action_outranking_pod_actions_supersedes_them():
+    statuses, executed, _ = correlate(
+        action("restart_pod", "web-a"), action("restart_pod", "web-b"), action("restart_deployment"),
+        action("restart_pod", "web-c")
+    )
+    assert statuses == ["superseded", "superseded", "success", "superseded"]
+    assert executed == [("restart_deployment", None)]
+
+
+def test_workload_action_loses_to_stronger_pod_action():
+    statuses, executed, _ = correlate(
+        action("delete_pod", "web-a"), action("restart_pod", "web-b"), action("rollback")
+    )
+    assert statuses == ["success", "success", "superseded"]
+    assert executed == [("delete_pod", "web-a"), ("restart_pod", "web-b")]
+
+
+def test_priority_breaks_type_ties_and_earlier_wins_on_equal_rank():
+    statuses, _, _ = correlate(action("scale_down", priority="WARNING"), action("scale_down", priority="CRITICAL"))
+    assert statuses == ["superseded", "success"]
+    # Typ akcji ma pierwszeństwo przed priorytetem zdarzenia
+    statuses, _, _ = correlate(action("scale_down", priority="WARNING"), action("scale_up", priority="CRITICAL"))
+    assert statuses == ["success", "superseded"]
+    statuses, _, _ = correlate(action("scale_down"), action("scale_down"))
+    assert statuses == ["success", "superseded"]
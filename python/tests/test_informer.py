@@ -0,0 +1,171 @@
+"""Testy informerów i ClusterCache przez wstrzykiwaną fabrykę watch"""
+import importlib
+import sys
+
+from kubernetes.client.rest import ApiException
+
+from conftest import (
+    FakeLister, ListResult, make_deployment, make_pod, make_replicaset, wait_until
+)
+import kube_client
+from informer import ClusterCache, ResourceInformer
+
+
+def event(event_type, obj):
+    return {"type": event_type, "object": obj}
+
+
+def start(informer):
+    informer.start()
+    assert informer.synced.wait(5)
+
+
+def test_watch_events_update_store_and_notify_handlers(watch_factory):
+    lister = FakeLister(ListResult([make_pod("ns", "a", resource_version="1")], "10"))
+    informer = ResourceInformer("pods", lister, watch_factory)
+    seen = []
+    informer.add_handler(lambda t, obj, old: seen.append((t, obj.metadata.name, old is not None)))
+    watch_factory.scripts.append([
+        event("ADDED", make_pod("ns", "b", resource_version="11")),
+        event("MODIFIED", make_pod("ns", "a", resource_version="12")),
+        event("DELETED", make_pod("ns", "b", resource_version="13")),
+    ])
+
+    start(informer)
+    try:
+        assert wait_until(lambda: len(seen) == 4)
+    finally:
+        informer.stop()
+
+    assert seen == [("ADDED", "a", False), ("ADDED", "b", False), ("MODIFIED", "a", True), ("DELETED", "b", True)]
+    assert set(informer.store) == {("ns", "a")}
+    assert informer.get("ns", "a").metadata.resource_version == "12"
+    # Watch wznawiany od resourceVersion listy
+    assert watch_factory.watches[0].resource_versions == ["10"]
+
+
+def test_bookmark_advances_resource_version_without_events(watch_factory):
+    lister = FakeLister(ListResult([], "10"))
+    informer = ResourceInformer("pods", lister, watch_factory)
+    seen = []
+    informer.add_handler(lambda t, obj, old: seen.append(t))
+    watch_factory.scripts.append([event("BOOKMARK", make_pod("ns", "", resource_version="20"))])
+
+    start(informer)
+    try:
+        assert wait_until(lambda: len(watch_factory.watches) == 2)
+    finally:
+        informer.stop()
+
+    assert seen == []
+    assert watch_factory.watches[1].resource_versions == ["20"]
+
+
+def test_relist_after_410_gone_exception(watch_factory):
+    lister = FakeLister(
+        ListResult([make_pod("ns", "a"), make_pod("ns", "b")], "10"),
+        ListResult([make_pod("ns", "a", resource_version="30"), make_pod("ns", "c")], "30"),
+    )
+    informer = ResourceInformer("pods", lister, watch_factory)
+    seen = []
+    informer.add_handler(lambda t, obj, old: seen.append((t, obj.metadata.name)))
+    watch_factory.scripts.append(ApiException(status=410, reason="Gone"))
+
+    start(informer)
+    try:
+        assert wait_until(lambda: lister.calls == 2 and len(watch_factory.watches) == 2)
+    finally:
+        informer.stop()
+
+    assert set(informer.store) == {("ns", "a"), ("ns", "c")}
+    # Relist zgłasza różnicę względem poprzedniego stanu
+    assert seen[2:] == [("DELETED", "b"), ("MODIFIED", "a"), ("ADDED", "c")]
+    assert [w.resource_versions for w in watch_factory.watches] == [["10"], ["30"]]
+
+
+def test_relist_after_410_error_event_in_stream(watch_factory):
+    lister = FakeLister(ListResult([], "10"), ListResult([make_pod("ns", "a")], "40"))
+    informer = ResourceInformer("pods", lister, watch_factory)
+    watch_factory.scripts.append([event("ERROR", {"code": 410, "reason": "Expired"})])
+
+    start(informer)
+    try:
+        assert wait_until(lambda: lister.calls == 2 and len(watch_factory.watches) == 2)
+    finally:
+        informer.stop()
+
+    assert set(informer.store) == {("ns", "a")}
+    assert watch_factory.watches[1].resource_versions == ["40"]
+
+
+def cluster_cache(watch_factory, pods, replicasets, deployments, pod_events=None):
+    class Core:
+        list_pod_for_all_namespaces = FakeLister(ListResult(pods, "1"))
+
+    class Apps:
+        list_replica_set_for_all_namespaces = FakeLister(ListResult(replicasets, "1"))
+        list_deployment_for_all_namespaces = FakeLister(ListResult(deployments, "1"))
+
+    Core.list_pod_for_all_namespaces.scripts = [pod_events] if pod_events else []
+    Apps.list_replica_set_for_all_namespaces.scripts = []
+    Apps.list_deployment_for_all_namespaces.scripts = []
+    cache = ClusterCache(Core(), Apps(), watch_factory)
+    cache.start()
+    assert cache.wait_for_sync(5)
+    return cache
+
+
+def test_pod_resolves_to_deployment_through_owner_references(watch_factory):
+    cache = cluster_cache(
+        watch_factory,
+        pods=[make_pod("ns", "web-7d9-a", "web-7d9", container_id="abcdef0123456789"), make_pod("ns", "bare")],
+        replicasets=[make_replicaset("ns", "web-7d9", "web", revision=3)],
+        deployments=[make_deployment("ns", "web")],
+    )
+    try:
+        assert cache.deployment_for_pod("ns", "web-7d9-a") == "web"
+        assert cache.deployment_revisions("ns", "web") == [(3, "web-7d9")]
+        # Pod bez kontrolera i pod spoza cache
+        assert cache.deployment_for_pod("ns", "bare") is None
+        assert cache.deployment_for_pod("ns", "missing") is None
+        assert cache.resolve_container("abcdef012345") == {
+            "namespace": "ns", "pod_name": "web-7d9-a", "container_name": "app", "deployment_name": "web"
+        }
+    finally:
+        cache.stop()
+
+
+def test_owner_resolution_follows_watch_events(watch_factory):
+    cache = cluster_cache(
+        watch_factory,
+        pods=[],
+        replicasets=[make_replicaset("ns", "web-1", "web", revision=1)],
+        deployments=[make_deployment("ns", "web")],
+        pod_events=[
+            event("ADDED", make_pod("ns", "web-1-x", "web-1", resource_version="2")),
+            event("ADDED", make_pod("ns", "web-1-y", "web-1", resource_version="3")),
+            event("DELETED", make_pod("ns", "web-1-x", "web-1", resource_version="4")),
+        ],
+    )
+    try:
+        assert wait_until(lambda: cache.pods.get("ns", "web-1-y") is not None and cache.pods.get("ns", "web-1-x") is None)
+        assert cache.deployment_for_pod("ns", "web-1-y") == "web"
+        assert cache.deployment_for_pod("ns", "web-1-x") is None
+    finally:
+        cache.stop()
+
+
+def test_enabled_cache_does_not_build_client_on_import(monkeypatch):
+    monkeypatch.setenv("INFORMER_ENABLED", "true")
+    monkeypatch.setattr(kube_client, "_shared", None)
+    sys.modules.pop("auto_heal_webhook", None)
+    try:
+        w = importlib.import_module("auto_heal_webhook")
+
+        assert w.cluster_cache is not None
+        # Klient API (i kubeconfig) dopiero w wątkach informerów przy rozgrzewaniu
+        assert kube_client._shared is None
+        assert w.remediation_engine.core_v1._api._api is None
+        assert w.remediation_engine.apps_v1._api._api is None
+    finally:
+        sys.modules.pop("auto_heal_webhook", None)
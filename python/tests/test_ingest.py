@@ -0,0 +1,209 @@
+"""Testy strumieniowego przyjmowania NDJSON (gzip, limity pamięci)"""
+import asyncio
+import gzip
+import json
+import tracemalloc
+import zlib
+
+import httpx
+import pytest
+
+from ingest import BodyTooLargeError, LineTooLongError, iter_ndjson_lines
+
+
+async def stream(data: bytes, size: int = 8192):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def lines(data: bytes, **kwargs):
+    async def collect():
+        return [line async for line in iter_ndjson_lines(stream(data), **kwargs)]
+    return asyncio.run(collect())
+
+
+def drain(data: bytes, **kwargs) -> int:
+    """Przechodzi przez linie bez ich przechowywania (pomiar pamięci samego parsera)"""
+    async def count():
+        n = 0
+        async for _ in iter_ndjson_lines(stream(data), **kwargs):
+            n += 1
+        return n
+    return asyncio.run(count())
+
+
+def test_gzip_lines_split_across_chunks():
+    events = [json.dumps({"rule": f"r{i}", "pad": "x" * (i % 300)}).encode() for i in range(2000)]
+    body = gzip.compress(b"\n".join(events) + b"\n\n")
+    assert lines(body, compressed=True) == events
+    assert lines(b"\n".join(events)) == events
+
+
+def test_gzip_bomb_is_rejected_with_bounded_memory():
+    # ~100 KB skompresowane, 100 MB po dekompresji
+    body = gzip.compress((b" " * 4095 + b"\n") * (25 * 1024), compresslevel=9)
+    assert len(body) < 1024 * 1024
+    tracemalloc.start()
+    try:
+        with pytest.raises(BodyTooLargeError):
+            drain(body, compressed=True, max_body=16 * 1024 * 1024)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 8 * 1024 * 1024
+
+
+def test_long_line_without_newline_is_rejected_before_buffering():
+    body = gzip.compress(b"x" * (50 * 1024 * 1024))
+    tracemalloc.start()
+    try:
+        with pytest.raises(LineTooLongError):
+            drain(body, compressed=True, max_line_bytes=1024 * 1024)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 8 * 1024 * 1024
+
+
+def test_complete_line_over_limit_is_rejected():
+    with pytest.raises(LineTooLongError):
+        lines(b"x" * 5000 + b"\n{}\n", max_line_bytes=1000)
+
+
+def test_corrupt_gzip_raises_zlib_error():
+    with pytest.raises(zlib.error):
+        lines(b"\x1f\x8b" + b"garbage" * 100, compressed=True)
+
+
+def test_bulk_webhook_returns_413_over_decompressed_limit(monkeypatch):
+    import auto_heal_webhook as w
+
+    monkeypatch.setenv("BULK_MAX_DECOMPRESSED_BYTES", str(64 * 1024))
+    body = gzip.compress(b"{}\n" * (1024 * 1024))
+
+    async def post():
+        transport = httpx.ASGITransport(app=w.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/webhook/falco/bulk", content=body,
+                headers={"Content-Encoding": "gzip", "Content-Type": "application/x-ndjson"}
+            )
+
+    response = asyncio.run(post())
+    assert response.status_code == 413
+
+
+BULK_RULES = """
+rules:
+  - name: Shell
+    source: falco
+    action: restart_pod
+    priority_threshold: WARNING
+    namespaces: [shop]
+"""
+
+
+def falco_event(pod, rule="Shell", priority="Critical", namespace="shop"):
+    return {
+        "output": f"shell in {pod}", "priority": priority, "rule": rule, "time": "2024-01-01T00:00:00Z",
+        "hostname": "node-1", "output_fields": {"k8s.ns.name": namespace, "k8s.pod.name": pod},
+    }
+
+
+def ndjson(*records) -> bytes:
+    return b"\n".join(r if isinstance(r, bytes) else json.dumps(r).encode() for r in records) + b"\n"
+
+
+@pytest.fixture
+def webhook(monkeypatch, tmp_path):
+    """Świeży moduł webhooka z regułą Shell ograniczoną do namespace shop"""
+    import importlib
+    import sys
+
+    rules = tmp_path / "rules.yaml"
+    rules.write_text(BULK_RULES)
+    monkeypatch.setenv("REMEDIATION_RULES_PATH", str(rules))
+    sys.modules.pop("auto_heal_webhook", None)
+    yield lambda: importlib.import_module("auto_heal_webhook")
+    sys.modules.pop("auto_heal_webhook", None)
+
+
+def post_bulk(w, monkeypatch, *bodies, gzipped=False):
+    """Wysyła ciała po kolei; zwraca odpowiedzi i pody akcji wykonanych przez kolejkę"""
+    executed = []
+
+    async def run(action):
+        executed.append(action["pod_name"])
+        return {"status": "success"}
+
+    monkeypatch.setattr(w.action_executor, "run", run)
+    headers = {"Content-Type": "application/x-ndjson"}
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+
+    async def post():
+        w.action_queue.start()
+        try:
+            transport = httpx.ASGITransport(app=w.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                # Ciało w kawałkach po 4 KB - błąd pojawia się dopiero po przetworzeniu wcześniejszych linii
+                return [
+                    await client.post(
+                        "/webhook/falco/bulk", content=stream(gzip.compress(b) if gzipped else b, 4096), headers=headers
+                    )
+                    for b in bodies
+                ]
+        finally:
+            await w.action_queue.shutdown()
+
+    return asyncio.run(post()), executed
+
+
+MIXED = ndjson(
+    falco_event("api-0"),
+    falco_event("api-1", priority="Error"),
+    falco_event("web-0", namespace="dev"),       # reguła pasuje, selektor namespace nie - no_action
+    falco_event("api-2", priority="Notice"),     # poniżej progu - odrzucone przed walidacją
+    falco_event("api-3", rule="Other"),          # reguła bez kandydatów
+    [1, 2],                                      # JSON, ale nie obiekt
+    b"{not json",
+    {"rule": "Shell", "priority": "Critical"},   # brak wymaganych pól modelu
+)
+
+
+@pytest.mark.parametrize("gzipped", [False, True])
+def test_bulk_webhook_counts(webhook, monkeypatch, gzipped):
+    w = webhook()
+
+    responses, executed = post_bulk(w, monkeypatch, MIXED, gzipped=gzipped)
+
+    assert responses[0].status_code == 202
+    counts = responses[0].json()["counts"]
+    assert {k: v for k, v in counts.items() if v} == {
+        "received": 8, "accepted": 2, "no_action": 1, "filtered": 3, "invalid": 2
+    }
+    assert executed == ["api-0", "api-1"]
+
+
+@pytest.mark.parametrize("tail, limit, code", [
+    (b"x" * (1024 * 1024 + 1), None, 400),
+    (json.dumps(falco_event("api-9", rule="Other")).encode() * 2000, str(64 * 1024), 413),
+], ids=["line-too-long", "body-too-large"])
+def test_rejected_bulk_request_queues_nothing(webhook, monkeypatch, tmp_path, tail, limit, code):
+    if limit:
+        monkeypatch.setenv("BULK_MAX_DECOMPRESSED_BYTES", limit)
+    monkeypatch.setenv("JOURNAL_PATH", str(tmp_path / "journal.db"))
+    w = webhook()
+    w.action_journal.start()
+    valid = ndjson(falco_event("api-0"), falco_event("api-1"))
+    try:
+        (rejected, retried), executed = post_bulk(w, monkeypatch, valid + tail, valid)
+    finally:
+        w.action_journal.close()
+
+    # Akcje sprzed błędu nie są wykonywane, a ponowienie samych poprawnych linii nie jest duplikatem
+    assert rejected.status_code == code
+    assert retried.status_code == 202
+    assert retried.json()["counts"]["accepted"] == 2
+    assert retried.json()["counts"]["duplicate"] == 0
+    assert executed == ["api-0", "api-1"]
@@ -0,0 +1,85 @@
+"""Testy dziennika akcji: idempotencja zdarzeń i odtwarzanie niewykonanych akcji po restarcie"""
+import asyncio
+import importlib
+import sys
+
+from journal import ActionJournal
+
+
+def action(pod):
+    return {"type": "delete_pod", "namespace": "ns", "pod_name": pod, "priority": "CRITICAL", "event_id": pod}
+
+
+def open_journal(path):
+    journal = ActionJournal(str(path), max_delay_ms=0)
+    journal.start()
+    return journal
+
+
+def append_all(journal, actions):
+    async def run():
+        return [await journal.append(a["event_id"], a) for a in actions]
+    return asyncio.run(run())
+
+
+def test_repeated_event_is_journaled_once(tmp_path):
+    journal = open_journal(tmp_path / "journal.db")
+    try:
+        assert append_all(journal, [action("a"), action("a"), action("b")]) == [True, False, True]
+        assert journal.stats()["appended"] == 2
+        assert journal.stats()["duplicates"] == 1
+    finally:
+        journal.close()
+
+
+def test_incomplete_actions_are_replayed_after_crash(tmp_path):
+    path = tmp_path / "journal.db"
+    journal = open_journal(path)
+    append_all(journal, [action(pod) for pod in ("a", "b", "c", "d")])
+    journal.complete("a", {"status": "success"})
+    journal.complete("c", {"status": "error"}, failed=True)
+    # Zapis e zatwierdza też wcześniejsze oznaczenia; proces kończy się bez zamknięcia dziennika
+    append_all(journal, [action("e")])
+
+    reopened = open_journal(path)
+    try:
+        assert [a["pod_name"] for a in reopened.pending()] == ["b", "d", "e"]
+        # Zdarzenia sprzed restartu - wykonane, nieudane i oczekujące - nadal są duplikatami
+        assert append_all(reopened, [action("a"), action("b"), action("c"), action("f")]) == [False, False, False, True]
+    finally:
+        reopened.close()
+        journal.close()
+
+
+def test_webhook_replays_pending_actions_on_startup(monkeypatch, tmp_path):
+    path = tmp_path / "journal.db"
+    journal = open_journal(path)
+    append_all(journal, [action("a"), action("b")])
+    journal.complete("a", {"status": "success"})
+    journal.close()
+
+    monkeypatch.setenv("JOURNAL_PATH", str(path))
+    sys.modules.pop("auto_heal_webhook", None)
+    w = importlib.import_module("auto_heal_webhook")
+    executed = []
+
+    async def run(a):
+        executed.append(a["pod_name"])
+        return {"status": "success"}
+
+    monkeypatch.setattr(w.action_executor, "run", run)
+
+    async def main():
+        w.action_queue.start()
+        w.action_journal.start()
+        w._replay_journal()
+        await w.action_queue.shutdown()
+        w.action_journal.close()
+
+    try:
+        asyncio.run(main())
+    finally:
+        sys.modules.pop("auto_heal_webhook", None)
+
+    assert executed == ["b"]
+    assert ActionJournal(str(path)).pending() == []
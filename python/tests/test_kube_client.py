@@ -0,0 +1,39 @@
+"""Testy ponawiania żądań klienta Kubernetes"""
+import pytest
+from kubernetes import client
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, ReadTimeoutError
+
+import kube_client
+
+URL = "/api/v1/namespaces/shop/pods/api-0"
+
+
+@pytest.fixture
+def retries():
+    configuration = client.Configuration(host="http://127.0.0.1:1")
+    return kube_client.build_api_client(configuration, make_default=False).configuration.retries
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD", "PUT"])
+def test_idempotent_methods_retry_on_status(retries, method):
+    assert retries.is_retry(method, 503)
+    assert retries.is_retry(method, 429, has_retry_after=True)
+
+
+@pytest.mark.parametrize("method", ["POST", "PATCH", "DELETE"])
+def test_mutating_methods_do_not_retry_after_reaching_server(retries, method):
+    assert not retries.is_retry(method, 503)
+    assert not retries.is_retry(method, 429, has_retry_after=True)
+    with pytest.raises(ReadTimeoutError):
+        retries.increment(method, URL, error=ReadTimeoutError(None, URL, "read timed out"))
+
+
+@pytest.mark.parametrize("method", ["POST", "PATCH", "DELETE"])
+def test_mutating_methods_retry_on_connect_errors(retries, method):
+    error = ConnectTimeoutError(None, "connect timed out")
+    retry = retries.increment(method, URL, error=error)
+    assert retry.total == retries.total - 1
+    for _ in range(retries.total - 1):
+        retry = retry.increment(method, URL, error=error)
+    with pytest.raises(MaxRetryError):
+        retry.increment(method, URL, error=error)
@@ -0,0 +1,41 @@
+"""Testy ograniczonych etykiet autoheal_events_received_total"""
+import metrics
+from rules import compile_rules
+
+RULES = [
+    {"source": "falco", "name": "Terminal shell in container", "action": "delete_pod"},
+    {"source": "falco", "pattern": "Write below *", "action": "restart_pod"},
+    {"source": "prometheus", "name": "HighCPUUsage", "action": "scale_up"},
+]
+
+
+def received(source, rule, priority) -> float:
+    return metrics.EVENTS_RECEIVED.labels(source, rule, priority)._value.get()
+
+
+def test_rule_label_is_bounded_by_configuration():
+    rule_set = compile_rules(RULES)
+    assert rule_set.metric_label("falco", "Terminal shell in container") == "Terminal shell in container"
+    assert rule_set.metric_label("falco", "Write below etc") == "Write below *"
+    assert rule_set.metric_label("falco", "attacker-chosen-1234") == "other"
+    assert rule_set.metric_label("prometheus", "Terminal shell in container") == "other"
+    assert rule_set.metric_label("falco", None) == "other"
+
+
+def test_priority_label_maps_unknown_values_to_other():
+    assert metrics.priority_label("Critical") == "critical"
+    assert metrics.priority_label("warning") == "warning"
+    assert metrics.priority_label("x" * 100) == "other"
+    assert metrics.priority_label(5) == "other"
+
+
+def test_count_event_uses_bounded_labels():
+    rule_set = compile_rules(RULES)
+    before_other = received("falco", "other", "other")
+    before_known = received("falco", "Write below *", "error")
+
+    metrics.count_event(rule_set, "falco", "random-rule-name", "random-priority")
+    metrics.count_event(rule_set, "falco", "Write below binary dir", "Error")
+
+    assert received("falco", "other", "other") == before_other + 1
+    assert received("falco", "Write below *", "error") == before_known + 1
@@ -0,0 +1,152 @@
+"""Testy limitów szybkości i circuit breakera (sztuczny zegar)"""
+import asyncio
+
+from cooldown import CooldownCache
+from executor import ActionExecutor
+from ratelimit import CircuitBreaker, RateLimiter, TokenBucket
+
+API_ERROR = {"status": "error", "code": 500}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeEngine:
+    """Silnik bez klastra: zwraca kolejne wyniki akcji"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.executed = []
+
+    def target_key(self, action):
+        return (action["type"], action["namespace"], action["pod_name"])
+
+    def execute_action(self, action):
+        self.executed.append(action["pod_name"])
+        return self.results.pop(0) if self.results else {"status": "success"}
+
+
+def action(pod, namespace="shop"):
+    return {"type": "delete_pod", "namespace": namespace, "pod_name": pod}
+
+
+def run_all(executor, actions):
+    async def run():
+        return [(await executor.run(a))["status"] for a in actions]
+    return asyncio.run(run())
+
+
+def limiter(clock, global_rate=(100.0, 100.0), namespace_rate=(100.0, 100.0)):
+    return RateLimiter(
+        global_rate=global_rate, namespace_rate=namespace_rate,
+        action_type_rates={"delete_pod": (100.0, 100.0)}, clock=clock
+    )
+
+
+def test_token_bucket_refills_at_rate_up_to_burst():
+    bucket = TokenBucket(rate=2.0, burst=4.0, now=0.0)
+    bucket.tokens = 0.0
+
+    assert bucket.refill(0.5) == 1.0
+    assert bucket.refill(1.5) == 3.0
+    # Bez tokenów ponad burst, także po długiej przerwie
+    assert bucket.refill(60.0) == 4.0
+    # Zegar cofnięty nie odejmuje tokenów
+    assert bucket.refill(10.0) == 4.0
+
+
+def test_burst_limit_then_refill():
+    clock = Clock()
+    rate_limiter = limiter(clock, global_rate=(1.0, 3.0))
+
+    assert [rate_limiter.acquire("delete_pod", "shop") for _ in range(4)] == [None, None, None, "global"]
+    clock.now = 1.0
+    assert rate_limiter.acquire("delete_pod", "shop") is None
+    assert rate_limiter.acquire("delete_pod", "shop") == "global"
+    assert rate_limiter.rejected["global"] == 2
+
+
+def test_namespace_limit_does_not_take_global_tokens():
+    clock = Clock()
+    rate_limiter = limiter(clock, global_rate=(0.0, 3.0), namespace_rate=(0.0, 1.0))
+
+    assert rate_limiter.acquire("delete_pod", "noisy") is None
+    assert rate_limiter.acquire("delete_pod", "noisy") == "namespace"
+    assert rate_limiter.acquire("delete_pod", "noisy") == "namespace"
+    # Odrzucenia przez limit namespace nie zużyły globalnych tokenów
+    assert [rate_limiter.acquire("delete_pod", ns) for ns in ("a", "b", "c")] == [None, None, "global"]
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10.0, clock=clock)
+
+    breaker.record(API_ERROR)
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record(API_ERROR)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now = 10.0
+    # Po recovery_timeout przechodzi jedna akcja próbna
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record({"status": "success"})
+    assert breaker.state == "closed"
+    assert breaker.allow()
+    assert breaker.stats()["trips"] == 1
+
+
+def test_failed_probe_reopens_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10.0, clock=clock)
+    breaker.record(API_ERROR)
+
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.record(API_ERROR)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    clock.now = 20.0
+    assert breaker.allow()
+
+
+def test_open_breaker_does_not_consume_tokens():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10.0, clock=clock)
+    engine = FakeEngine(API_ERROR)
+    executor = ActionExecutor(
+        engine, cooldown=CooldownCache(window=0), limiter=limiter(clock, global_rate=(0.0, 2.0)), breaker=breaker
+    )
+
+    statuses = run_all(executor, [action(f"p{i}") for i in range(5)])
+
+    assert statuses == ["error", "circuit_open", "circuit_open", "circuit_open", "circuit_open"]
+    # Jeden token zużyła akcja, która otworzyła obwód; odrzucone akcje nie pobrały żadnego
+    assert executor.limiter.stats()["global"]["tokens"] == 1.0
+    clock.now = 10.0
+    assert run_all(executor, [action("probe")]) == ["success"]
+    assert engine.executed == ["p0", "probe"]
+    assert breaker.state == "closed"
+
+
+def test_rate_limited_probe_does_not_block_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10.0, clock=clock)
+    engine = FakeEngine(API_ERROR)
+    executor = ActionExecutor(
+        engine, cooldown=CooldownCache(window=0),
+        limiter=limiter(clock, namespace_rate=(0.0, 1.0)), breaker=breaker
+    )
+    run_all(executor, [action("p0", namespace="noisy")])
+
+    clock.now = 10.0
+    # Próba odrzucona przez limit nie zajmuje miejsca akcji próbnej
+    assert run_all(executor, [action("p1", namespace="noisy"), action("p2")]) == ["rate_limited", "success"]
+    assert breaker.state == "closed"
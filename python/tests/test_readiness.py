@@ -0,0 +1,91 @@
+"""Testy readiness: /health/ready zwraca 503 do końca rozgrzewania (informer z fałszywym listowaniem)"""
+import asyncio
+import importlib
+import sys
+import threading
+
+import httpx
+import pytest
+
+from conftest import FakeLister, ListResult, make_pod, wait_until
+from fake_k8s import FakeApiServer, FakeCluster
+import kube_client
+from informer import ClusterCache
+
+
+class GatedLister(FakeLister):
+    """Listowanie wstrzymane do otwarcia bramki - informer nie kończy synchronizacji"""
+
+    def __init__(self, gate: threading.Event, *states):
+        super().__init__(*states)
+        self.gate = gate
+        self.scripts = []
+
+    def __call__(self, **kwargs):
+        self.gate.wait(5)
+        return super().__call__(**kwargs)
+
+
+def fake_cache(gate, watch_factory) -> ClusterCache:
+    class Core:
+        list_pod_for_all_namespaces = GatedLister(gate, ListResult([make_pod("shop", "api-0")], "1"))
+
+    class Apps:
+        list_replica_set_for_all_namespaces = GatedLister(gate, ListResult([], "1"))
+        list_deployment_for_all_namespaces = GatedLister(gate, ListResult([], "1"))
+
+    return ClusterCache(Core(), Apps(), watch_factory)
+
+
+@pytest.fixture
+def api_server(monkeypatch, tmp_path):
+    server = FakeApiServer(FakeCluster())
+    server.start()
+    path = tmp_path / "kubeconfig"
+    path.write_text(server.kubeconfig())
+    # Krok kubernetes_api (GET /version) łączy się z fałszywym API serverem
+    monkeypatch.setattr(kube_client, "_shared", kube_client.build_api_client(kube_client.load_configuration(str(path))))
+    yield server
+    server.stop()
+
+
+def get_ready(w):
+    async def get():
+        transport = httpx.ASGITransport(app=w.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await c.get("/health/ready")
+    return asyncio.run(get())
+
+
+def test_ready_only_after_informer_sync(monkeypatch, api_server, watch_factory):
+    monkeypatch.setenv("INFORMER_ENABLED", "true")
+    sys.modules.pop("auto_heal_webhook", None)
+    w = importlib.import_module("auto_heal_webhook")
+    gate = threading.Event()
+    cache = fake_cache(gate, watch_factory)
+    monkeypatch.setattr(w, "cluster_cache", cache)
+    try:
+        assert get_ready(w).status_code == 503
+
+        w.warm_up.start()
+        assert wait_until(lambda: w.warm_up.status()["steps"]["kubernetes_api"] == "ready")
+        response = get_ready(w)
+        # Klient połączony, ale informery nie skończyły listowania
+        assert response.status_code == 503
+        assert response.json()["steps"] == {"kubernetes_api": "ready", "cache": "pending"}
+
+        gate.set()
+        assert w.warm_up.wait(5)
+        response = get_ready(w)
+        assert response.status_code == 200
+        assert response.json()["ready"] is True
+        assert cache.get_pod("shop", "api-0") is not None
+
+        # Zamykanie - readiness od razu wyłączona
+        w.warm_up.stop()
+        assert get_ready(w).status_code == 503
+    finally:
+        gate.set()
+        w.warm_up.stop()
+        cache.stop()
+        sys.modules.pop("auto_heal_webhook", None)
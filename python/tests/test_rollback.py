@@ -0,0 +1,144 @@
+"""
+Testy rollbacku deploymentu przeciw fałszywemu API serverowi (benchmarks/fake_k8s.py):
+wybór rewizji z indeksu ReplicaSetów, brak rewizji, konflikt 409 z ponowieniem
+i łączenie równoczesnych rollbacków.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from kubernetes import client
+
+from fake_k8s import CURRENT_HASH, PREVIOUS_HASH, FakeApiServer, FakeCluster
+from informer import ClusterCache
+from kube_client import build_api_client
+from remediation import RemediationEngine
+
+NAMESPACE = "shop"
+DEPLOYMENT = "app-0"
+
+
+@pytest.fixture
+def server():
+    server = FakeApiServer(FakeCluster(inventory={NAMESPACE: [DEPLOYMENT]}))
+    server.start()
+    yield server
+    server.stop()
+
+
+def make_engine(server) -> RemediationEngine:
+    configuration = client.Configuration(host=server.url)
+    return RemediationEngine(api_client=build_api_client(configuration, make_default=False))
+
+
+def rollback(engine, **extra):
+    return engine.execute_action(dict(
+        {"type": "rollback", "namespace": NAMESPACE, "deployment_name": DEPLOYMENT}, **extra
+    ))
+
+
+def calls(server, route):
+    return server.cluster.stats()["calls"].get(route, 0)
+
+
+def test_revision_is_picked_from_replicaset_index(server):
+    engine = make_engine(server)
+    cache = ClusterCache(engine.core_v1, engine.apps_v1)
+    cache.start()
+    try:
+        assert cache.wait_for_sync(10)
+        engine.cache = cache
+        lists = calls(server, "list_namespaced_replicasets")
+
+        result = rollback(engine)
+    finally:
+        cache.stop()
+
+    assert result["action"] == "rolled_back"
+    assert result["revision"] == 1
+    assert result["replicaset"] == f"{DEPLOYMENT}-{PREVIOUS_HASH}"
+    # Rewizje z indeksu informera - bez listowania ReplicaSetów
+    assert calls(server, "list_namespaced_replicasets") == lists
+    assert server.cluster.deployment_state(NAMESPACE, DEPLOYMENT)["current"] == PREVIOUS_HASH
+
+
+def test_explicit_revision_without_cache_lists_replicasets_once(server):
+    result = rollback(make_engine(server), revision="1")
+
+    assert result["action"] == "rolled_back"
+    assert result["replicaset"] == f"{DEPLOYMENT}-{PREVIOUS_HASH}"
+    assert calls(server, "list_namespaced_replicasets") == 1
+
+
+@pytest.mark.parametrize("revision", ["7", "0"])
+def test_missing_revision_is_an_error_without_patch(server, revision):
+    result = rollback(make_engine(server), revision=revision)
+
+    assert result == {"status": "error", "message": "No revision to roll back to", "deployment": DEPLOYMENT}
+    assert calls(server, "patch_deployment") == 0
+    assert server.cluster.deployment_state(NAMESPACE, DEPLOYMENT)["current"] == CURRENT_HASH
+
+
+def test_conflict_is_retried_with_fresh_deployment(server):
+    engine = make_engine(server)
+    read = engine._read_deployment
+    bumped = []
+
+    def read_then_concurrent_write(name, namespace, fresh=False):
+        deployment = read(name, namespace, fresh)
+        if not bumped:
+            # Inny zapis (np. zmiana adnotacji) między odczytem a patchem
+            cluster = server.cluster
+            cluster.deployment_state(namespace, name)["resourceVersion"] = cluster._next_version()
+            bumped.append(True)
+        return deployment
+
+    engine._read_deployment = read_then_concurrent_write
+    result = rollback(engine)
+
+    assert result["action"] == "rolled_back"
+    assert result["revision"] == 1
+    assert server.cluster.conflicts == 1
+    assert server.cluster.rollbacks == 1
+    assert calls(server, "patch_deployment") == 2
+
+
+def test_conflict_with_rollback_from_other_replica_does_not_roll_back_twice(server):
+    engine, other = make_engine(server), make_engine(server)
+    pick = engine._rollback_target
+    raced = []
+
+    def pick_then_other_rollback(deployment, name, namespace, revision):
+        target = pick(deployment, name, namespace, revision)
+        # Druga replika cofa deployment między wyborem celu a patchem
+        raced.append(rollback(other))
+        return target
+
+    engine._rollback_target = pick_then_other_rollback
+    result = rollback(engine)
+
+    assert raced[0]["action"] == "rolled_back"
+    # Po 409 odczyt pokazuje szablon docelowej rewizji - bez cofania o kolejną
+    assert result["action"] == "already_at_revision"
+    assert server.cluster.conflicts == 1
+    assert server.cluster.rollbacks == 1
+    assert server.cluster.deployment_state(NAMESPACE, DEPLOYMENT)["current"] == PREVIOUS_HASH
+
+
+def test_concurrent_rollbacks_are_coalesced(server):
+    engine = make_engine(server)
+    concurrent = 8
+    barrier = threading.Barrier(concurrent)
+
+    def run(_):
+        barrier.wait()
+        return rollback(engine)
+
+    with ThreadPoolExecutor(max_workers=concurrent) as pool:
+        results = list(pool.map(run, range(concurrent)))
+
+    actions = sorted(r["action"] for r in results)
+    assert actions.count("rolled_back") == 1
+    assert set(actions) <= {"rolled_back", "already_rolled_back", "already_at_revision"}
+    assert server.cluster.rollbacks == 1
+    assert server.cluster.deployment_state(NAMESPACE, DEPLOYMENT)["current"] == PREVIOUS_HASH
@@ -0,0 +1,106 @@
+"""Testy kompilacji i dopasowania reguł naprawczych"""
+import pytest
+import yaml
+
+from remediation import RemediationEngine
+from rules import DEFAULT_ACTION_RULES, RuleError, RuleReloader, compile_rules, load_rules_config
+
+
+def rule(**spec):
+    return dict({"source": "falco", "action": "delete_pod"}, **spec)
+
+
+def test_unknown_key_is_rejected():
+    with pytest.raises(RuleError, match="unknown keys \\['treshold'\\]"):
+        compile_rules([rule(name="Shell", treshold="CRITICAL")])
+
+
+@pytest.mark.parametrize("selectors", [
+    {"name": "Shell", "pattern": "Shell*"},
+    {"name": "Shell", "regex": "^Shell$"},
+    {"pattern": "Shell*", "regex": "^Shell$"},
+])
+def test_ambiguous_name_selectors_are_rejected(selectors):
+    with pytest.raises(RuleError, match="mutually exclusive"):
+        compile_rules([rule(**selectors)])
+
+
+@pytest.mark.parametrize("threshold", ["Critcal", "", "5"])
+def test_unknown_priority_threshold_is_rejected(threshold):
+    with pytest.raises(RuleError, match="unknown priority_threshold"):
+        compile_rules([rule(name="Shell", priority_threshold=threshold)])
+
+
+def test_priority_threshold_is_case_insensitive():
+    rule_set = compile_rules([rule(name="Shell", priority_threshold="critical")])
+    assert rule_set.match("falco", "Shell", "Critical").action == "delete_pod"
+    assert rule_set.match("falco", "Shell", "Notice") is None
+
+
+def test_missing_name_selector_is_rejected():
+    with pytest.raises(RuleError, match="is required"):
+        compile_rules([rule()])
+
+
+def test_shipped_and_legacy_configs_compile():
+    assert len(compile_rules(load_rules_config())) > 0
+    assert len(compile_rules(DEFAULT_ACTION_RULES)) == 6
+
+
+def test_first_matching_rule_wins_with_thresholds_and_selectors():
+    rule_set = compile_rules([
+        rule(pattern="Write below *", priority_threshold="CRITICAL"),
+        rule(pattern="Write below *", action="restart_pod", namespaces=["prod-*"], priority_threshold="WARNING"),
+        rule(name="Write below etc", action="scale_down", priority_threshold="WARNING"),
+    ])
+    assert rule_set.match("falco", "Write below etc", "CRITICAL").action == "delete_pod"
+    assert rule_set.match("falco", "Write below etc", "WARNING", namespace="prod-a").action == "restart_pod"
+    assert rule_set.match("falco", "Write below etc", "WARNING", namespace="dev").action == "scale_down"
+    assert rule_set.match("falco", "Write below etc", "NOTICE") is None
+    assert rule_set.match("prometheus", "Write below etc", "CRITICAL") is None
+
+
+def write_rules(path, *rules):
+    path.write_text(yaml.safe_dump({"rules": list(rules)}))
+
+
+@pytest.fixture
+def reloader(tmp_path):
+    path = tmp_path / "rules.yaml"
+    write_rules(path, rule(name="Shell", priority_threshold="CRITICAL"))
+    engine = RemediationEngine(rules_config=load_rules_config(str(path)))
+    return engine, path, RuleReloader(engine.apply_rules, path=str(path), interval=0)
+
+
+def test_reload_activates_changed_rules(reloader):
+    engine, path, reloader = reloader
+    assert reloader.check() is False
+
+    write_rules(path, rule(name="Shell", action="restart_pod", priority_threshold="WARNING"))
+
+    assert reloader.check() is True
+    assert reloader.status()["version"] == 1
+    assert engine.rules.match("falco", "Shell", "WARNING").action == "restart_pod"
+    # Ta sama zawartość - bez ponownej kompilacji
+    assert reloader.check() is False
+
+
+@pytest.mark.parametrize("bad_rule", [
+    rule(name="Shell", priority_threshold="Critcal"),
+    rule(name="Shell", action="exec_shell"),
+    rule(name="Shell", treshold="CRITICAL"),
+])
+def test_reload_rejects_invalid_rules_and_keeps_previous(reloader, bad_rule):
+    engine, path, reloader = reloader
+    active = engine.rules
+
+    write_rules(path, rule(name="Other", priority_threshold="WARNING"), bad_rule)
+
+    assert reloader.check() is False
+    assert engine.rules is active
+    assert engine.rules.match("falco", "Shell", "NOTICE") is None
+    assert engine.rules.match("falco", "Shell", "CRITICAL").action == "delete_pod"
+    status = reloader.status()
+    assert status["version"] == 0
+    assert status["failures"] == 1
+    assert "Rule #1" in status["last_error"]
@@ -0,0 +1,110 @@
+"""Testy trybu cienia na żywym ruchu: niepoprawne rekordy nie zatrzymują oceny"""
+import asyncio
+import importlib
+import os
+import sys
+
+import httpx
+
+from remediation import RemediationEngine
+from shadow import ShadowEvaluator, ShadowMode, normalize
+
+RULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rules.yaml")
+
+FALCO = {
+    "rule": "Terminal shell in container",
+    "priority": "Warning",
+    "output_fields": {"k8s.ns.name": "shop", "k8s.pod.name": "api-0"},
+}
+
+
+def shadow_mode() -> ShadowMode:
+    return ShadowMode(ShadowEvaluator(RemediationEngine(), RemediationEngine()), buffer_size=100, batch_size=10)
+
+
+def test_non_dict_records_are_rejected_by_offer():
+    mode = shadow_mode()
+    for record in (5, "falco", None, [FALCO]):
+        mode.offer("falco", record)
+    mode.offer("falco", FALCO)
+
+    assert mode.stats()["invalid"] == 4
+    assert mode.stats()["pending"] == 1
+    assert mode.drain() == 1
+
+
+def test_malformed_records_are_skipped_during_drain():
+    mode = shadow_mode()
+    malformed = [
+        dict(FALCO, output_fields=["k8s.ns.name"]),
+        {"status": "firing", "alerts": ["HighLatency"]},
+        {"status": "firing", "alerts": {"labels": {}}},
+        {"status": "firing", "labels": ["alertname"]},
+    ]
+    for record in malformed:
+        mode.offer("falco" if "rule" in record else "prometheus", record)
+    mode.offer("falco", FALCO)
+    mode.offer("prometheus", {"status": "firing", "labels": {"alertname": "PodCrashLooping"}})
+
+    assert mode.drain() == 2
+    assert mode.evaluator.report()["events"] == 2
+    assert mode.stats()["errors"] == 0
+
+
+def test_normalize_failure_skips_only_that_record(monkeypatch):
+    import shadow
+
+    def flaky(source, record):
+        if record.get("boom"):
+            raise TypeError("unexpected record shape")
+        return normalize(source, record)
+
+    monkeypatch.setattr(shadow, "normalize", flaky)
+    mode = shadow_mode()
+    mode.offer("falco", dict(FALCO, boom=True))
+    mode.offer("falco", FALCO)
+
+    assert mode.drain() == 1
+    assert mode.stats()["invalid"] == 1
+    assert mode.stats()["pending"] == 0
+
+
+def test_bulk_webhook_offers_only_json_objects(monkeypatch):
+    monkeypatch.setenv("SHADOW_RULES_PATH", RULES)
+    sys.modules.pop("auto_heal_webhook", None)
+    w = importlib.import_module("auto_heal_webhook")
+    body = "\n".join(['5', '"falco"', '[1, 2]', '{"rule": "No such rule", "priority": "Notice"}']) + "\n"
+
+    async def send():
+        transport = httpx.ASGITransport(app=w.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await c.post("/webhook/falco/bulk", content=body)
+
+    try:
+        response = asyncio.run(send())
+        assert response.status_code == 202
+        assert w.shadow_mode.stats()["offered"] == 1
+        assert w.shadow_mode.stats()["invalid"] == 0
+    finally:
+        sys.modules.pop("auto_heal_webhook", None)
+
+
+def test_batch_decisions_match_single_events():
+    engine = RemediationEngine(rules_config=[
+        {"name": "Shell", "source": "falco", "action": "restart_pod", "priority_threshold": "WARNING"},
+        {"pattern": "Write *", "source": "falco", "action": "delete_pod", "priority_threshold": "ERROR", "namespaces": ["prod-*"]},
+        {"pattern": "Write *", "source": "falco", "action": "restart_pod", "priority_threshold": "NOTICE"},
+        {"name": "Tagged", "source": "falco", "action": "delete_pod", "priority_threshold": "INFO", "tags": ["container"]},
+    ])
+    events = [
+        (rule, priority, {"k8s.ns.name": namespace, "k8s.pod.name": "api-0"}, tags)
+        for rule in ("Shell", "Write etc", "Tagged", "Unknown")
+        for priority in ("Critical", "Error", "Notice", "Debug")
+        for namespace in ("prod-a", "dev")
+        for tags in (["container"], None)
+    ]
+
+    batch = engine.decide_actions("falco", events)
+
+    assert batch == [engine.decide_action("falco", *event) for event in events]
+    assert {a["type"] for a in batch if a} == {"restart_pod", "delete_pod"}
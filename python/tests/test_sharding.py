@@ -0,0 +1,272 @@
+"""
+Testy shardingu: uwierzytelnianie i walidacja POST /internal/actions,
+zgłaszanie błędów rejestracji Lease oraz przejmowanie akcji niedostępnego właściciela.
+"""
+import asyncio
+import importlib
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from sharding import PEER_TOKEN_HEADER, FakeLeaseStore, HashRing, ShardCoordinator
+
+TOKEN = "peer-secret"
+
+ACTION = {
+    "type": "restart_pod",
+    "source": "falco",
+    "rule": "Terminal shell in container",
+    "priority": "high",
+    "namespace": "shop",
+    "pod_name": "api-0",
+}
+
+
+class BrokenStore:
+    """Magazyn Lease, który zawsze zgłasza błąd"""
+
+    def renew(self, identity, address, duration, now):
+        raise ConnectionError("lease store unavailable")
+
+    def list(self):
+        raise ConnectionError("lease store unavailable")
+
+    def release(self, identity):
+        pass
+
+
+@pytest.fixture
+def webhook(monkeypatch, tmp_path):
+    """Świeży moduł webhooka z włączonym shardingiem (Lease w pliku) i wykonawcą zapisującym akcje"""
+    monkeypatch.setenv("SHARDING_ENABLED", "true")
+    monkeypatch.setenv("SHARD_PEER_TOKEN", TOKEN)
+    monkeypatch.setenv("SHARD_IDENTITY", "replica-a")
+    monkeypatch.setenv("SHARD_ADVERTISE_ADDRESS", "http://127.0.0.1:1")
+    monkeypatch.setenv("SHARD_LEASE_FILE", str(tmp_path / "leases.json"))
+    sys.modules.pop("auto_heal_webhook", None)
+    w = importlib.import_module("auto_heal_webhook")
+    w.executed = []
+
+    async def run(action):
+        w.executed.append(action)
+        return {"status": "success", "action": action}
+
+    monkeypatch.setattr(w.action_executor, "run", run)
+    yield w
+    sys.modules.pop("auto_heal_webhook", None)
+
+
+def with_queue(w, coro_fn):
+    """Wykonuje korutynę przy działającej kolejce akcji i czeka na jej opróżnienie"""
+    async def main():
+        w.action_queue.start()
+        try:
+            return await coro_fn()
+        finally:
+            await w.action_queue.shutdown()
+    return asyncio.run(main())
+
+
+def post(w, body, token=TOKEN):
+    async def send():
+        headers = {PEER_TOKEN_HEADER: token} if token is not None else {}
+        transport = httpx.ASGITransport(app=w.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await c.post("/internal/actions", json=body, headers=headers)
+    return with_queue(w, send)
+
+
+class PeerServer:
+    """Replika-właściciel: zapisuje przyjęte akcje, odpowiada po `delay` sekundach statusem `code`"""
+
+    def __init__(self, code=200, delay=0.0):
+        self.received = []
+        self.client_ports = set()
+        self.released = threading.Event()
+        peer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                peer.client_ports.add(self.client_address[1])
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                peer.received.extend(body["actions"])
+                peer.released.wait(delay)
+                payload = json.dumps({"results": [{"status": "success"} for _ in body["actions"]]}).encode()
+                self.send_response(code)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.released.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def remote_action(coordinator, address):
+    """Akcja należąca do replica-b osiągalnej pod `address`"""
+    coordinator._ring = HashRing(["replica-a", "replica-b"])
+    coordinator._addresses["replica-b"] = address
+    return next(
+        action for action in (dict(ACTION, namespace=f"ns-{i}") for i in range(100))
+        if not coordinator.is_owner(action)
+    )
+
+
+def test_peer_token_required(monkeypatch):
+    monkeypatch.delenv("SHARD_PEER_TOKEN", raising=False)
+    with pytest.raises(ValueError, match="SHARD_PEER_TOKEN"):
+        ShardCoordinator(FakeLeaseStore(), "a", "http://a:8000")
+
+
+def test_authorized_compares_token():
+    coordinator = ShardCoordinator(FakeLeaseStore(), "a", "http://a:8000", peer_token=TOKEN)
+    assert coordinator.authorized(TOKEN)
+    assert not coordinator.authorized("other")
+    assert not coordinator.authorized(None)
+    assert not coordinator.authorized("")
+
+
+def test_start_raises_when_lease_store_fails():
+    coordinator = ShardCoordinator(BrokenStore(), "a", "http://a:8000", peer_token=TOKEN)
+    with pytest.raises(ConnectionError):
+        coordinator.start()
+    assert coordinator.heartbeat_failures == 1
+    assert coordinator._thread is None
+    # Wątek w tle nie zgłasza błędu - obowiązuje ostatni pierścień
+    assert coordinator.heartbeat() is False
+
+
+def test_internal_actions_not_registered_without_sharding(monkeypatch):
+    monkeypatch.delenv("SHARDING_ENABLED", raising=False)
+    sys.modules.pop("auto_heal_webhook", None)
+    w = importlib.import_module("auto_heal_webhook")
+    assert w.shard_coordinator is None
+
+    async def send():
+        transport = httpx.ASGITransport(app=w.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await c.post("/internal/actions", json={"actions": [ACTION]})
+    try:
+        assert asyncio.run(send()).status_code == 404
+    finally:
+        sys.modules.pop("auto_heal_webhook", None)
+
+
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_internal_actions_rejects_bad_token(webhook, token):
+    response = post(webhook, {"actions": [ACTION]}, token=token)
+    assert response.status_code == 401
+    assert webhook.executed == []
+
+
+@pytest.mark.parametrize("change", [
+    {"type": "exec_shell"},
+    {"pod_name": None},
+    {"namespace": None},
+    {"command": "rm -rf /"},
+])
+def test_internal_actions_validates_actions(webhook, change):
+    action = {k: v for k, v in dict(ACTION, **change).items() if v is not None}
+    response = post(webhook, {"actions": [action]})
+    assert response.status_code == 422
+    assert webhook.executed == []
+
+
+def test_internal_actions_scale_requires_target(webhook):
+    action = dict(ACTION, type="scale_up")
+    del action["pod_name"]
+    assert post(webhook, {"actions": [action]}).status_code == 422
+
+
+def test_internal_actions_accepts_valid_actions(webhook):
+    scale = dict(ACTION, type="scale_up", deployment_name="api", metadata={"alert": "HighLatency"})
+    del scale["pod_name"]
+    response = post(webhook, {"actions": [ACTION, scale]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["accepted", "accepted"]
+    # Puste pola opcjonalne nie trafiają do akcji
+    assert "deployment_name" not in results[0]["action"]
+    assert sorted(a["type"] for a in webhook.executed) == ["restart_pod", "scale_up"]
+
+
+def test_failed_forward_is_taken_over_locally(webhook):
+    coordinator = webhook.shard_coordinator
+    result = with_queue(webhook, lambda: webhook._forward("replica-b", "http://127.0.0.1:1", [dict(ACTION)]))
+    assert result["status"] == "taken_over"
+    assert [r["status"] for r in result["results"]] == ["accepted"]
+    assert coordinator.taken_over == 1
+    assert coordinator.forwarded == 0
+    assert webhook.executed == [ACTION]
+
+
+def test_failed_forward_with_wait_runs_locally(webhook):
+    coordinator = webhook.shard_coordinator
+    remote = remote_action(coordinator, "http://127.0.0.1:1")
+    result = with_queue(webhook, lambda: webhook._execute_routed(remote))
+    assert result["status"] == "success"
+    assert coordinator.taken_over == 1
+    assert webhook.executed == [remote]
+
+
+def test_forward_timeout_after_owner_accepted_runs_action_once(webhook):
+    coordinator = webhook.shard_coordinator
+    coordinator.forward_timeout = 0.3
+    peer = PeerServer(delay=5.0)
+    try:
+        remote = remote_action(coordinator, peer.url)
+        result = with_queue(webhook, lambda: webhook._execute_routed(remote))
+    finally:
+        peer.stop()
+
+    # Właściciel przyjął akcję i nie odpowiedział w czasie - bez wykonania lokalnego
+    assert result["status"] == "unconfirmed"
+    assert len(peer.received) == 1
+    assert webhook.executed == []
+    assert coordinator.taken_over == 0
+    assert coordinator.forward_unconfirmed == 1
+
+
+@pytest.mark.parametrize("code", [401, 422])
+def test_forward_rejected_by_owner_is_not_taken_over(webhook, code):
+    coordinator = webhook.shard_coordinator
+    peer = PeerServer(code=code)
+    try:
+        result = with_queue(webhook, lambda: webhook._forward("replica-b", peer.url, [dict(ACTION)]))
+    finally:
+        peer.stop()
+
+    assert result["status"] == "rejected"
+    assert result["code"] == code
+    assert webhook.executed == []
+    assert coordinator.taken_over == 0
+    assert coordinator.forward_rejected == 1
+
+
+def test_forward_reuses_pooled_connection(webhook):
+    coordinator = webhook.shard_coordinator
+    peer = PeerServer()
+    try:
+        for _ in range(3):
+            coordinator.forward(peer.url, [dict(ACTION)])
+    finally:
+        peer.stop()
+
+    assert len(peer.received) == 3
+    assert coordinator.forwarded == 3
+    # Jedno połączenie keep-alive dla wszystkich przekazań
+    assert len(peer.client_ports) == 1
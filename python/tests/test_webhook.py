@@ -0,0 +1,62 @@
+"""Testy endpointu Prometheus: wynik alertu odpowiada statusowi wykonanej akcji"""
+import asyncio
+import importlib
+import sys
+
+import httpx
+
+
+def alert(deployment, fingerprint=None):
+    return {
+        "status": "firing",
+        "labels": {"alertname": "PodCrashLooping", "severity": "critical", "namespace": "shop", "deployment": deployment},
+        "annotations": {},
+        "startsAt": "2024-01-01T00:00:00Z",
+        "fingerprint": fingerprint or deployment,
+    }
+
+
+def post_alerts(monkeypatch, payloads, statuses):
+    """Wysyła żądania do webhooka; executor zwraca status przypisany do deploymentu"""
+    sys.modules.pop("auto_heal_webhook", None)
+    w = importlib.import_module("auto_heal_webhook")
+
+    async def run(action):
+        return {"status": statuses[action["deployment_name"]]}
+
+    monkeypatch.setattr(w.action_executor, "run", run)
+
+    async def main():
+        w.action_queue.start()
+        try:
+            transport = httpx.ASGITransport(app=w.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+                return [await c.post("/webhook/prometheus", json=payload) for payload in payloads]
+        finally:
+            await w.action_queue.shutdown()
+
+    try:
+        return asyncio.run(main())
+    finally:
+        sys.modules.pop("auto_heal_webhook", None)
+
+
+def test_group_counts_only_successful_actions_as_executed(monkeypatch):
+    group = {
+        "groupKey": "g",
+        "status": "firing",
+        "alerts": [alert("a", "a-1"), alert("a", "a-2"), alert("b"), alert("c"), alert("d")],
+    }
+    statuses = {"a": "success", "b": "error", "c": "suppressed", "d": "rate_limited"}
+
+    response = post_alerts(monkeypatch, [group], statuses)[0].json()
+
+    assert [o["status"] for o in response["outcomes"]] == ["executed", "collapsed", "error", "suppressed", "rate_limited"]
+    assert response["actions_executed"] == 1
+
+
+def test_single_alert_reports_action_status(monkeypatch):
+    responses = post_alerts(monkeypatch, [alert("a"), alert("b")], {"a": "success", "b": "error"})
+
+    assert [r.json()["status"] for r in responses] == ["success", "error"]
+    assert responses[1].json()["result"] == {"status": "error"}